@@ -1,13 +1,24 @@
 import streamlit as st
 import requests
+import xml.etree.ElementTree as ET
 import pandas as pd
-import numpy as np
 import plotly.express as px
-import xml.etree.ElementTree as ET
-from datetime import datetime
-import os
 from dotenv import load_dotenv
 
+from timestamps import combinar_data_hora_vetorizado, hora_desde_meia_noite
+from cache_dados import carregar_planilha_com_snapshot
+from codigos_situacao import codigos_desconhecidos
+from resiliencia import CircuitoAberto
+from agendador import AgendadorPreCarga, datas_pre_carga, fontes_pre_carga, pre_carga_ativa
+from consultas_duckdb import motor_duckdb_ativo, status_etapas_duckdb
+from fatos_pedidos import ENTRADAS_DERIVADAS, IndiceFiliais, montar_fatos_pedidos, pedidos_das_filiais
+from derivacoes import CacheDerivacoes, impressao_digital
+from etapas import REGISTRO_ETAPAS
+from senior import (
+    ErroStatusTimeline, carregar_timeline_dia, carregar_timeline_periodo, datas_do_periodo,
+    ler_e_processar_timeline, obter_credenciais_webservice
+)
+
 # Carregar variáveis de ambiente
 load_dotenv()
 
@@ -60,354 +71,243 @@ st.markdown("""
 # --- INICIALIZAÇÃO E FUNÇÃO DE CARREGAMENTO DE DADOS ---
 if 'df' not in st.session_state:
     st.session_state.df = pd.DataFrame()
+# Tabela de fatos (uma linha por FILIAL/PEDIDO) montada junto com a consulta
+if 'fatos' not in st.session_state:
+    st.session_state.fatos = pd.DataFrame()
+    st.session_state.impressao_fatos = None
+    st.session_state.indice_filiais = IndiceFiliais(st.session_state.fatos)
+    st.session_state.codigos_desconhecidos = {}
+
+# Cálculos de cada visão por (dados, filiais, etapa), compartilhados entre as sessões
+@st.cache_resource
+def obter_cache_derivacoes():
+    return CacheDerivacoes()
+# (fonte, data inicial, data final) quando os dados vieram da consulta por período
+if 'consulta_periodo' not in st.session_state:
+    st.session_state.consulta_periodo = None
+
+@st.cache_resource
+def iniciar_pre_carga():
+    """Inicia um único agendador de pré-carga por processo, compartilhado entre as sessões"""
+    return AgendadorPreCarga(fontes_pre_carga()).iniciar()
+
+# Mantém o dia atual e o dia útil anterior aquecidos no cache (PRE_CARGA_ATIVA no .env)
+agendador_pre_carga = iniciar_pre_carga() if pre_carga_ativa() else None
+
+# Maior período aceito na consulta por intervalo de datas
+MAX_DIAS_PERIODO = 92
+
+# Mensagens exibidas para cada fonte de dados do webservice
+mensagens_fonte = {
+    "senior": {
+        "sucesso": "Dados carregados do webservice Senior com sucesso!",
+        "erro_status": "Erro ao buscar os dados do webservice Senior: Código de status {}",
+        "erro_conexao": "Erro de conexão com webservice Senior: {}",
+        "erro_resposta": "Resposta inválida do webservice Senior (XML não reconhecido): {}",
+        "indisponivel": "Webservice Senior indisponível após falhas repetidas. Tente novamente em alguns instantes."
+    },
+    "principal": {
+        "sucesso": "Dados carregados do webservice com sucesso!",
+        "erro_status": "Erro ao buscar os dados: Código de status {}",
+        "erro_conexao": "Erro de conexão: {}",
+        "erro_resposta": "Resposta inválida do webservice (XML não reconhecido): {}",
+        "indisponivel": "Webservice indisponível após falhas repetidas. Tente novamente em alguns instantes."
+    }
+}
+
+def descrever_atualizacao(atualizado_em):
+    """Texto com o momento em que os dados exibidos foram obtidos do webservice"""
+    if atualizado_em is None:
+        return "data desconhecida"
+    return atualizado_em.strftime('%d/%m/%Y %H:%M')
 
 @st.cache_data(show_spinner="Buscando dados...")
-def fetch_data(data, usar_arquivo_local=False, usar_xls_local=False, usar_webservice_wmw=False):
+def fetch_data_local(usar_arquivo_local=False, usar_xls_local=False):
+    """Dados dos arquivos locais (dados.xlsx ou response.xml)"""
     if usar_xls_local:
         try:
-            # Usar o arquivo Excel local
-            df = pd.read_excel("dados.xlsx")
-            
-            # Criar as colunas TIMESTAMP combinando data e hora
-            # Mapeamento correto para arquivo Excel (note os espaços extras nas colunas)
-            timestamp_map = {
-                ('DATA GERACAO', 'HORA GERACAO DO PEDIDO'): 'TIMESTAMP PEDIDO',
-                ('DATA DE EMISSAO DA NOTA FISCAL', 'HORA GERACAO DA NOTA FISCAL'): 'TIMESTAMP REMESSA',
-                ('DATA DA SAÍDA DAS MERCADORIAS ', 'HORA DA SAÍDA DAS MERCADORIAS '): 'TIMESTAMP ITEM',
-                ('DATA GERACAO DA NOTA FISCAL', 'HORA GERACAO DA NOTA FISCAL'): 'TIMESTAMP NF',
-                ('DATA ENTRADA DO TITULO', 'HORA GERACAO DO REGISTRO'): 'TIMESTAMP TITULO'
-            }
-            
-            # Converter colunas de data para datetime
-            colunas_data = [
-                'DATA GERACAO', 'DATA DE EMISSAO DA NOTA FISCAL', 'DATA DA SAÍDA DAS MERCADORIAS ', 
-                'DATA GERACAO DA NOTA FISCAL', 'DATA ENTRADA DO TITULO'
-            ]
-            
-            for col in colunas_data:
-                if col in df.columns:
-                    # Substituir datas problemáticas por NaN antes da conversão
-                    df[col] = df[col].replace(['31/12/1900', '1900-12-31', '', ' '], pd.NaT)
-                    # Remover espaços em branco
-                    df[col] = df[col].astype(str).str.strip()
-                    # Substituir 'nan' string por NaT
-                    df[col] = df[col].replace('nan', pd.NaT)
-                    df[col] = pd.to_datetime(df[col], errors='coerce', dayfirst=True)
-                    # Substituir datas de 1900 por NaT
-                    df.loc[df[col].dt.year == 1900, col] = pd.NaT
-            
-            # Converter colunas de hora para time
-            colunas_hora = [
-                'HORA GERACAO DO PEDIDO', 'HORA GERACAO DA NOTA FISCAL', 'HORA DA SAÍDA DAS MERCADORIAS ',
-                'HORA GERACAO DO REGISTRO'
-            ]
+            # Usar o arquivo Excel local (snapshot Parquet reaproveitado enquanto a planilha não mudar)
+            df, do_snapshot = carregar_planilha_com_snapshot("dados.xlsx", processar_planilha_excel)
             
-            for col in colunas_hora:
-                if col in df.columns:
-                    # Substituir valores problemáticos por NaN antes da conversão
-                    df[col] = df[col].replace([':', '00:00', '00:00:00', '', ' '], pd.NaT)
-                    # Remover espaços em branco
-                    df[col] = df[col].astype(str).str.strip()
-                    # Substituir 'nan' string por NaT
-                    df[col] = df[col].replace('nan', pd.NaT)
-                    df[col] = pd.to_datetime(df[col], format='%H:%M:%S', errors='coerce').dt.time
-            
-            # Criar timestamps combinando data e hora
-            for (data_col, hora_col), ts_col in timestamp_map.items():
-                if data_col in df.columns and hora_col in df.columns:
-                    df[ts_col] = df.apply(
-                        lambda row: combinar_data_hora(row[data_col], row[hora_col]),
-                        axis=1
-                    )
-            
-            st.success("Dados carregados do arquivo Excel local com sucesso!")
-            return df
+            if do_snapshot:
+                st.success("Dados carregados do arquivo Excel local com sucesso! (snapshot Parquet)")
+            else:
+                st.success("Dados carregados do arquivo Excel local com sucesso!")
+            return df, montar_fatos_pedidos(df)
         except Exception as e:
             st.error(f"Erro ao ler o arquivo Excel local: {e}")
-            return pd.DataFrame()
+            return pd.DataFrame(), pd.DataFrame()
     elif usar_arquivo_local:
         try:
-            # Usar o arquivo XML local
-            with open("response.xml", "r", encoding="utf-8") as file:
-                xml_content = file.read()
+            # Usar o arquivo XML local, lido de forma incremental
+            with open("response.xml", "rb") as file:
+                df = ler_e_processar_timeline(file)
             st.success("Dados carregados do arquivo XML local com sucesso!")
-            root = ET.fromstring(xml_content)
         except Exception as e:
             st.error(f"Erro ao ler o arquivo XML local: {e}")
-            return pd.DataFrame()
-    elif usar_webservice_wmw:
-        # Usar o webservice Senior (Timeline.py)
-        url = os.getenv('WEBSERVICE_URL')
-        user = os.getenv('WEBSERVICE_USER')
-        password = os.getenv('WEBSERVICE_PASSWORD')
-        
-        # Verificar se as variáveis de ambiente foram carregadas
-        if not all([url, user, password]):
-            st.error("Erro: Credenciais do webservice não encontradas. Verifique o arquivo .env")
-            return pd.DataFrame()
-        
-        headers = {
-            "SOAPAction": "#POST",
-            "Content-type": "text/xml",
-            "Accept": "application/xml"
-        }
-        body = f"""<?xml.xml version="1.0" encoding="ISO-8859-1"?>
-        <soapenv:Envelope xmlns:soapenv="http://schemas.xmlsoap.org/soap/envelope/" xmlns:ser="http://services.senior.com.br">
-            <soapenv:Header/>
-            <soapenv:Body>
-                <ser:timeline>
-                    <user>{user}</user>
-                    <password>{password}</password>
-                    <encryption>0</encryption>
-                    <parameters>
-                        <data>'{data}'</data>
-                    </parameters>
-                </ser:timeline>
-            </soapenv:Body>
-        </soapenv:Envelope>"""
+            return pd.DataFrame(), pd.DataFrame()
+    return fatos_da_consulta(df)
+
+def fatos_da_consulta(df):
+    """Retorna (df, tabela de fatos), com aviso quando a consulta não trouxe linhas"""
+    # As colunas já chegam renomeadas e com os timestamps criados (senior.processar_timeline)
+    if df.empty:
+        st.warning("Nenhum dado encontrado na resposta do XML. Verifique se o caminho da busca está correto.")
+        return pd.DataFrame(), pd.DataFrame()
+    return df, montar_fatos_pedidos(df)
 
+# O webservice não passa pelo st.cache_data: as respostas já ficam gravadas em disco (dias
+# fechados sem expiração, o dia atual por TIMELINE_CACHE_TTL_MINUTOS), e guardá-las também na
+# memória do processo manteria o primeiro retorno do dia atual enquanto o app estiver no ar
+def fetch_data(data, usar_arquivo_local=False, usar_xls_local=False, usar_webservice_wmw=False):
+    if usar_arquivo_local or usar_xls_local:
+        return fetch_data_local(usar_arquivo_local, usar_xls_local)
+    
+    credenciais = obter_credenciais_webservice(usar_webservice_wmw)
+    if credenciais is None:
+        st.error("Erro: Credenciais do webservice não encontradas. Verifique o arquivo .env")
+        return pd.DataFrame(), pd.DataFrame()
+    fonte, url, user, password = credenciais
+    mensagens = mensagens_fonte[fonte]
+    
+    with st.spinner("Buscando dados..."):
         try:
-            response = requests.post(url, headers=headers, data=body)
-            
-            if response.status_code == 200:
-                st.success("Dados carregados do webservice Senior com sucesso!")
-                root = ET.fromstring(response.text)
-            else:
-                st.error(f"Erro ao buscar os dados do webservice Senior: Código de status {response.status_code}")
-                return pd.DataFrame()
+            # Datas já consultadas ficam gravadas em disco (dias fechados não mudam mais).
+            # Falhas transitórias são repetidas e, com o webservice fora, vale a última resposta guardada
+            df, info = carregar_timeline_dia(fonte, url, user, password, data)
+        except ErroStatusTimeline as e:
+            st.error(mensagens['erro_status'].format(e.status_code))
+            return pd.DataFrame(), pd.DataFrame()
+        except CircuitoAberto:
+            st.error(mensagens['indisponivel'])
+            return pd.DataFrame(), pd.DataFrame()
         except requests.exceptions.RequestException as e:
-            st.error(f"Erro de conexão com webservice Senior: {e}")
-            return pd.DataFrame()
+            st.error(mensagens['erro_conexao'].format(e))
+            return pd.DataFrame(), pd.DataFrame()
+        except ET.ParseError as e:
+            st.error(mensagens['erro_resposta'].format(e))
+            return pd.DataFrame(), pd.DataFrame()
+    
+    if info['origem'] == 'cache_desatualizado':
+        st.warning(
+            f"Webservice indisponível ({info['erro']}). Exibindo os últimos dados obtidos, "
+            f"de {descrever_atualizacao(info['atualizado_em'])}."
+        )
+    elif info['origem'] == 'cache':
+        st.success(f"{mensagens['sucesso']} (cache local)")
+    elif info.get('alteracoes'):
+        alteracoes = info['alteracoes']
+        st.success(
+            f"{mensagens['sucesso']} ({alteracoes['itens_alterados']} itens alterados desde a última consulta: "
+            f"{alteracoes['linhas_alteradas']} linhas novas ou alteradas, {alteracoes['linhas_removidas']} removidas)"
+        )
     else:
-        # Usar o webservice principal
-        url = "https://ocweb02s1p.seniorcloud.com.br:31201/g5-senior-services/sapiens_Synccom_frescatto_bi"
-        user = "felipe.martins"
-        password = "Canetaazul03"
-        
-        headers = {
-            "SOAPAction": "#POST",
-            "Content-type": "text/xml",
-            "Accept": "application/xml"
-        }
-        body = f"""<?xml.xml version="1.0" encoding="ISO-8859-1"?>
-        <soapenv:Envelope xmlns:soapenv="http://schemas.xmlsoap.org/soap/envelope/" xmlns:ser="http://services.senior.com.br">
-            <soapenv:Header/>
-            <soapenv:Body>
-                <ser:timeline>
-                    <user>{user}</user>
-                    <password>{password}</password>
-                    <encryption>0</encryption>
-                    <parameters>
-                        <data>'{data}'</data>
-                    </parameters>
-                </ser:timeline>
-            </soapenv:Body>
-        </soapenv:Envelope>"""
+        st.success(mensagens['sucesso'])
 
-        try:
-            response = requests.post(url, headers=headers, data=body)
-            
-            if response.status_code == 200:
-                st.success("Dados carregados do webservice com sucesso!")
-                root = ET.fromstring(response.text)
-            else:
-                st.error(f"Erro ao buscar os dados: Código de status {response.status_code}")
-                return pd.DataFrame()
-        except requests.exceptions.RequestException as e:
-            st.error(f"Erro de conexão: {e}")
-            return pd.DataFrame()
+    return fatos_da_consulta(df)
+
+# Também fora do st.cache_data: dias vindos da última resposta guardada ou com falha não
+# podem ficar memorizados depois que o webservice voltar
+# Retorna (df, fatos, consulta): consulta é (fonte, datas efetivamente carregadas), ou None
+# quando nenhum dado foi obtido
+def fetch_data_periodo(data_inicial, data_final, usar_webservice_wmw=False):
+    try:
+        datas = datas_do_periodo(data_inicial, data_final)
+    except ValueError:
+        st.error("Datas inválidas. Use o formato DD/MM/AAAA.")
+        return pd.DataFrame(), pd.DataFrame(), None
     
-    # Processamento do XML para ambos os casos (local ou webservice)
-    namespaces = {
-        'S': "http://schemas.xmlsoap.org/soap/envelope/",
-        'ns2': "http://services.senior.com.br",
-        'xsi': "http://www.w3.org/2001/XMLSchema-instance"
-    }
+    if not datas:
+        st.warning("A data final deve ser igual ou posterior à data inicial.")
+        return pd.DataFrame(), pd.DataFrame(), None
+    if len(datas) > MAX_DIAS_PERIODO:
+        st.warning(f"O período máximo de consulta é de {MAX_DIAS_PERIODO} dias.")
+        return pd.DataFrame(), pd.DataFrame(), None
     
-    retorno_elements = root.findall('.//ns2:timelineResponse/result/retorno', namespaces)
+    credenciais = obter_credenciais_webservice(usar_webservice_wmw)
+    if credenciais is None:
+        st.error("Erro: Credenciais do webservice não encontradas. Verifique o arquivo .env")
+        return pd.DataFrame(), pd.DataFrame(), None
+    fonte, url, user, password = credenciais
     
-    if retorno_elements:
-        all_data = []
-        for retorno_item in retorno_elements:
-            data_dict = {}
-            for child in retorno_item:
-                tag_name = child.tag.split('}')[-1]
-                is_nil = child.attrib.get(f"{{{namespaces['xsi']}}}nil") == 'true'
-                data_dict[tag_name] = None if is_nil else child.text
-            all_data.append(data_dict)
-        
-        df = pd.DataFrame(all_data) 
-        
-        mapeamento_nomes = {
-                    'CFilial': 'FILIAL',
-                    'CPedido': 'PEDIDO',
-                    'CDataEmissaoPedido': 'DATA EMISSAO PEDIDO',
-                    'CHoraEmissaoPedido': 'HORA EMISSAO PEDIDO',
-                    'CDataAssRemessa': 'DATA ASS REMESSA',
-                    'CHoraAssRemessa': 'HORA ASS REMESSA',
-                    'CDataPrepItem': 'DATA PREPARACAO DO ITEM',
-                    'CHoraPrepItem': 'HORA PREPARACAO DO ITEM',
-                    'CDataGerNF': 'DATA GERACAO NF',
-                    'CHoraGerNF': 'HORA GERACAO NF',
-                    'CDataGerTCR': 'DATA GERACAO DO REGISTRO',
-                    'CHoraGerTCR': 'HORA GERACAO DO REGISTRO',
-                    'CSituacaoPedido': 'SITUACAO DO PEDIDO',
-                    'CPedidoBloqueado': 'PEDIDO BLOQUEADO',
-                    'CUsuarioBloqPedido': 'USUARIO BLOQ PEDIDO',
-                    'CDataBloqueio': 'DATA DO BLOQUEIO',
-                    'CObservacaoPedido': 'OBSERVACAO DO PEDIDO',
-                    'CNumeroNF': 'N° NOTA FISCAL',
-                    'CInicioFaturamento': 'INICIO FATURAMENTO',
-                    'CFimFaturamento': 'FIM FATURAMENTO',
-                    'CCodigoProduto': 'CODIGO PRODUTO',
-                    'CSituacaoPFA': 'SITUACAO PFA',
-                    'CBloqPFA': 'BLOQUEIO PFA',
-                    'CSituacaoFAT': 'SITUACAO FAT',
-                    'CSituacaoCarga': 'SITUACAO CARGA',
-                    'CSituacaoNFV': 'SITUACAO NFV',
-                    'CNFVBloqueio': 'NFV BLOQUEIO',
-                    'CDataGeracaoNF': 'DATA GERACAO DA NOTA FISCAL',
-                    'CHoraGeracaoNF': 'HORA GERACAO DA NOTA FISCAL',
-                    'CNumeroTitulo': 'N° TITULO',
-                    'CVencOrigTitulo': 'VENCIMENTO ORIGINAL DO TITULO',
-                    'CSituacaoTitulo': 'SITUACAO DO TITULO'
-                }
-                
-        df = df.rename(columns=mapeamento_nomes)
-        
-        # Criar timestamps combinando data e hora usando a abordagem do Timeline.py
-        timestamp_map = {
-            ('DATA EMISSAO PEDIDO', 'HORA EMISSAO PEDIDO'): 'TIMESTAMP PEDIDO',
-            ('DATA ASS REMESSA', 'HORA ASS REMESSA'): 'TIMESTAMP REMESSA',
-            ('DATA PREPARACAO DO ITEM', 'HORA PREPARACAO DO ITEM'): 'TIMESTAMP ITEM',
-            ('DATA GERACAO NF', 'HORA GERACAO NF'): 'TIMESTAMP NF',
-            ('DATA GERACAO DA NOTA FISCAL', 'HORA GERACAO DA NOTA FISCAL'): 'TIMESTAMP NF2',
-            ('DATA GERACAO DO REGISTRO', 'HORA GERACAO DO REGISTRO'): 'TIMESTAMP TITULO'
-        }
-        
-        for (data_col, hora_col), ts_col in timestamp_map.items():
-            if data_col in df.columns and hora_col in df.columns:
-                # Substituir valores problemáticos nas strings
-                df[data_col] = df[data_col].replace(['31/12/1900', '', ' ', 'nan'], np.nan)
-                df[hora_col] = df[hora_col].replace([':', '00:00', '00:00:00', '', ' ', 'nan'], np.nan)
-                
-                # Combinar data e hora como string, tratando valores nulos
-                def combinar_strings(row):
-                    data_str = row[data_col]
-                    hora_str = row[hora_col]
-                    
-                    # Se qualquer um for nulo, retornar NaT
-                    if pd.isna(data_str) or pd.isna(hora_str):
-                        return pd.NaT
-                    
-                    # Se hora for apenas ":", retornar NaT
-                    if str(hora_str).strip() == ":":
-                        return pd.NaT
-                    
-                    # Combinar as strings
-                    combined = f"{data_str} {hora_str}"
-                    
-                    # Tentar converter com formato %d/%m/%Y %H:%M:%S
-                    try:
-                        return pd.to_datetime(combined, format='%d/%m/%Y %H:%M:%S')
-                    except:
-                        # Tentar formato %d/%m/%Y %H:%M
-                        try:
-                            return pd.to_datetime(combined, format='%d/%m/%Y %H:%M')
-                        except:
-                            return pd.NaT
-                
-                df[ts_col] = df.apply(combinar_strings, axis=1)
-                
-                # Substituir datas de 1900 por NaT
-                df.loc[df[ts_col].dt.year == 1900, ts_col] = pd.NaT
-        
-        # Aplicar mapeamentos para códigos
-        mapeamento_situacao_pfa = {
-            '1': 'Em Analise Credito',
-            '2': 'Em Preparação',
-            '3': 'Para Faturar',
-            '4': 'Faturada',
-            '5': 'Em Conferencia',
-            '6': 'Aguardando Integração WMS',
-            '8': 'Sem Estoque',
-            '9': 'Cancelada'
-        }
-
-        mapeamento_situacao_carga = {
-            'A': 'Aberto',
-            'F': 'Fechado'
-        }
-
-        mapeamento_situacao_nfv = {
-            '1': 'Digitada',
-            '2': 'Fechada',
-            '3': 'Cancelada',
-            '4': 'Documento Fiscal Emitido (Saida)',
-            '5': 'Aguardando Fechamento (Pos Saida)',
-            '6': 'Aguardando Integração WMS',
-            '7': 'Digitada Integração',
-            '8': 'Agrupada'
-        }
-        
-        mapeamento_situacao_tcr = {
-            'AO': 'Aberto ao Órgão de Proteção ao Crédito',
-            'AN': 'Aberto Negociação',
-            'AA': 'Aberto Advogado',
-            'AB': 'Aberto Normal',
-            'AC': 'Aberto Cartório',
-            'AE': 'Aberto Encontro de Contas',
-            'AI': 'Aberto Impostos',
-            'AJ': 'Aberto Retorno Jurídico',
-            'AP': 'Aberto Protestado',
-            'AR': 'Aberto Representante',
-            'AS': 'Aberto Suspenso',
-            'AV': 'Aberto Gestão de Pessoas',
-            'AX': 'Aberto Externo',
-            'CA': 'Cancelado',
-            'CE': 'Aberto CE (Preparação Cobrança Escritural)',
-            'CO': 'Aberto Cobrança',
-            'LQ': 'Liquidado Normal',
-            'LC': 'Liquidado Cartório',
-            'LI': 'Liquidado Impostos',
-            'LM': 'Liquidado Compensado',
-            'LO': 'Liquidado Cobrança',
-            'LP': 'Liquidado Protestado',
-            'LS': 'Liquidado Substituído',
-            'LV': 'Liquidado Gestão de Pessoas',
-            'LX': 'Liquidado Externo',
-            'PE': 'Aberto PE (Pagamento Eletrônico)'
-        }
-        
-        # Aplicar mapeamentos
-        if 'SITUACAO PFA' in df.columns:
-            df['SITUACAO PFA'] = df['SITUACAO PFA'].map(mapeamento_situacao_pfa)
-        if 'SITUACAO CARGA' in df.columns:
-            df['SITUACAO CARGA'] = df['SITUACAO CARGA'].map(mapeamento_situacao_carga)
-        if 'SITUACAO NFV' in df.columns:
-            df['SITUACAO NFV'] = df['SITUACAO NFV'].map(mapeamento_situacao_nfv)
-        if 'SITUACAO DO TITULO' in df.columns:
-            df['SITUACAO TCR'] = df['SITUACAO DO TITULO'].map(mapeamento_situacao_tcr)
-        
-        return df
-    else:
-        st.warning("Nenhum dado encontrado na resposta do XML. Verifique se o caminho da busca está correto.")
-        return pd.DataFrame()
+    # Uma requisição por dia, em paralelo (limitado por host)
+    with st.spinner("Buscando dados do período..."):
+        df, erros, desatualizadas = carregar_timeline_periodo(fonte, url, user, password, datas)
+    
+    if desatualizadas:
+        st.warning(
+            f"Webservice indisponível: {len(desatualizadas)} dia(s) exibidos com os últimos dados obtidos ("
+            + ", ".join(f"{data} de {descrever_atualizacao(desatualizadas[data]['atualizado_em'])}"
+                        for data in sorted(desatualizadas, key=datas.index))
+            + ")."
+        )
+    if erros:
+        st.error(f"Falha ao buscar {len(erros)} de {len(datas)} dias: " + ", ".join(sorted(erros, key=datas.index)))
+    if df.empty:
+        st.warning("Nenhum dado encontrado para o período informado.")
+        return pd.DataFrame(), pd.DataFrame(), None
+    
+    carregadas = tuple(data for data in datas if data not in erros)
+    st.success(f"{mensagens_fonte[fonte]['sucesso']} ({len(carregadas)} de {len(datas)} dias)")
+    return df, montar_fatos_pedidos(df), (fonte, carregadas)
 
-# Função auxiliar para combinar data e hora, lidando com nulos
-def combinar_data_hora(data, hora):
-    if pd.isna(data) or pd.isna(hora): # Verifica se data OU hora são nulas
-        return pd.NaT # Retorna NaT (Not a Time) se alguma for nula
+# Pós-processamento da planilha dados.xlsx: conversão de datas/horas e criação dos timestamps
+def processar_planilha_excel(df):
+    # Criar as colunas TIMESTAMP combinando data e hora
+    # Mapeamento correto para arquivo Excel (note os espaços extras nas colunas)
+    timestamp_map = {
+        ('DATA GERACAO', 'HORA GERACAO DO PEDIDO'): 'TIMESTAMP PEDIDO',
+        ('DATA DE EMISSAO DA NOTA FISCAL', 'HORA GERACAO DA NOTA FISCAL'): 'TIMESTAMP REMESSA',
+        ('DATA DA SAÍDA DAS MERCADORIAS ', 'HORA DA SAÍDA DAS MERCADORIAS '): 'TIMESTAMP ITEM',
+        ('DATA GERACAO DA NOTA FISCAL', 'HORA GERACAO DA NOTA FISCAL'): 'TIMESTAMP NF',
+        ('DATA ENTRADA DO TITULO', 'HORA GERACAO DO REGISTRO'): 'TIMESTAMP TITULO'
+    }
     
-    # Verificar se hora é apenas ":" (dois pontos) que vem do XML
-    if isinstance(hora, str) and hora.strip() == ":":
-        return pd.NaT
+    # Converter colunas de data para datetime
+    colunas_data = [
+        'DATA GERACAO', 'DATA DE EMISSAO DA NOTA FISCAL', 'DATA DA SAÍDA DAS MERCADORIAS ', 
+        'DATA GERACAO DA NOTA FISCAL', 'DATA ENTRADA DO TITULO'
+    ]
     
-    try:
-        # Combina o ano, mês, dia da data com hora, minuto, segundo da hora
-        return pd.to_datetime(f"{data.year}-{data.month}-{data.day} {hora.hour}:{hora.minute}:{hora.second}")
-    except:
-        return pd.NaT # Retorna NaT se houver algum erro inesperado na combinação
+    for col in colunas_data:
+        if col in df.columns:
+            # Substituir datas problemáticas por NaN antes da conversão
+            df[col] = df[col].replace(['31/12/1900', '1900-12-31', '', ' '], pd.NaT)
+            # Remover espaços em branco
+            df[col] = df[col].astype(str).str.strip()
+            # Substituir 'nan' string por NaT
+            df[col] = df[col].replace('nan', pd.NaT)
+            df[col] = pd.to_datetime(df[col], errors='coerce', dayfirst=True)
+            # Substituir datas de 1900 por NaT
+            df.loc[df[col].dt.year == 1900, col] = pd.NaT
+    
+    # Converter colunas de hora para time
+    colunas_hora = [
+        'HORA GERACAO DO PEDIDO', 'HORA GERACAO DA NOTA FISCAL', 'HORA DA SAÍDA DAS MERCADORIAS ',
+        'HORA GERACAO DO REGISTRO'
+    ]
+    
+    # Horas como timedelta desde a meia-noite, usadas para montar os timestamps
+    horas_timedelta = {}
+    
+    for col in colunas_hora:
+        if col in df.columns:
+            # Substituir valores problemáticos por NaN antes da conversão
+            df[col] = df[col].replace([':', '00:00', '00:00:00', '', ' '], pd.NaT)
+            # Remover espaços em branco
+            df[col] = df[col].astype(str).str.strip()
+            # Substituir 'nan' string por NaT
+            df[col] = df[col].replace('nan', pd.NaT)
+            horas = pd.to_datetime(df[col], format='%H:%M:%S', errors='coerce')
+            horas_timedelta[col] = hora_desde_meia_noite(horas)
+            df[col] = horas.dt.time
+    
+    # Criar timestamps combinando data e hora (data + timedelta, vetorizado)
+    for (data_col, hora_col), ts_col in timestamp_map.items():
+        if data_col in df.columns and hora_col in horas_timedelta:
+            df[ts_col] = combinar_data_hora_vetorizado(df[data_col], horas_timedelta[hora_col])
+    
+    return df
 
 # --- INTERFACE DO STREAMLIT ---
 # Título da página
@@ -427,6 +327,10 @@ etapa_selecionada = st.sidebar.radio(
 # Filtros de data
 st.sidebar.subheader("📅 Filtro por Data")
 data_input = st.sidebar.text_input("Digite a data (formato DD/MM/AAAA):", value="19/06/2025")
+consultar_periodo = st.sidebar.checkbox("Consultar período", value=False,
+                                help="Busca todas as datas entre a data acima e a data final, em paralelo. Disponível apenas para o webservice.")
+if consultar_periodo:
+    data_final_input = st.sidebar.text_input("Data final (formato DD/MM/AAAA):", value=data_input)
 
 # Opções para escolher a fonte de dados
 st.sidebar.subheader("📂 Fonte de Dados")
@@ -438,26 +342,48 @@ usar_webservice_wmw = st.sidebar.checkbox("Usar webservice Senior", value=False,
                                  help="Marque esta opção para buscar dados do webservice Senior.")
 
 if st.sidebar.button("🔄 Buscar Dados", type="primary"):
+    # Só a consulta por período que trouxe dados fica registrada; os caminhos de um dia a limpam
+    consulta_periodo = None
     if usar_xls_local:
-        st.session_state.df = fetch_data(data_input, False, True, False)
+        st.session_state.df, st.session_state.fatos = fetch_data(data_input, False, True, False)
     elif usar_arquivo_local:
-        st.session_state.df = fetch_data(data_input, True, False, False)
+        st.session_state.df, st.session_state.fatos = fetch_data(data_input, True, False, False)
+    elif consultar_periodo and data_input and data_final_input:
+        st.session_state.df, st.session_state.fatos, consulta_periodo = fetch_data_periodo(
+            data_input, data_final_input, usar_webservice_wmw
+        )
     elif usar_webservice_wmw:
-        st.session_state.df = fetch_data(data_input, False, False, True)
+        st.session_state.df, st.session_state.fatos = fetch_data(data_input, False, False, True)
     elif data_input:
-        st.session_state.df = fetch_data(data_input, False, False, False)
+        st.session_state.df, st.session_state.fatos = fetch_data(data_input, False, False, False)
     else:
         st.warning("Por favor, digite uma data para buscar os dados ou selecione uma das opções de arquivo local.")
+    st.session_state.consulta_periodo = consulta_periodo
+    st.session_state.impressao_fatos = impressao_digital(st.session_state.fatos)
+    st.session_state.indice_filiais = IndiceFiliais(st.session_state.fatos)
+    st.session_state.codigos_desconhecidos = codigos_desconhecidos(st.session_state.df)
+
+# Horário da última atualização do dia atual feita pela pré-carga
+if agendador_pre_carga is not None:
+    registro = agendador_pre_carga.atualizacoes().get(("principal", datas_pre_carga()[0]))
+    if registro and registro['atualizado_em'] is not None:
+        st.sidebar.caption(f"🕒 Dados de hoje atualizados em segundo plano às {registro['atualizado_em']:%H:%M}")
 
 # --- PROCESSAMENTO DOS DADOS ---
 if 'df' in st.session_state and not st.session_state.df.empty:
-    df = st.session_state.df.copy()
+    # Pedidos, status e durações já calculados na consulta; aqui apenas se seleciona a filial
+    fatos = st.session_state.fatos
+    indice_filiais = st.session_state.indice_filiais
+    
+    # Códigos de situação que não constam dos mapeamentos (codigos_situacao)
+    for coluna, codigos in st.session_state.codigos_desconhecidos.items():
+        descricao = ", ".join(f"{codigo} ({quantidade} linhas)" for codigo, quantidade in codigos.items())
+        st.sidebar.caption(f"⚠️ {coluna} com códigos sem descrição: {descricao}")
     
     # Filtros de Filial no sidebar
     st.sidebar.header("Filtros")
     
-    filiais_brutas = df['FILIAL'].unique()
-    filiais_disponiveis = [filial for filial in filiais_brutas if pd.notna(filial)]
+    filiais_disponiveis = indice_filiais.filiais
     
     if filiais_disponiveis:
         filiais_disponiveis.insert(0, "TODOS")
@@ -474,53 +400,35 @@ if 'df' in st.session_state and not st.session_state.df.empty:
 
     if "TODOS" in filiais_selecionadas:
         filiais_para_filtrar = filiais_disponiveis[1:]
-        df_filtrado = df[df['FILIAL'].isin(filiais_para_filtrar)].copy()
     else:
-        df_filtrado = df[df['FILIAL'].isin(filiais_selecionadas)].copy()
-
-    if df_filtrado.empty:
-        st.warning("Nenhum dado para as filiais selecionadas. Por favor, ajuste os filtros.")
-        st.stop()
-    
-    # Remover duplicatas baseadas no número do pedido
-    df_trabalho = df_filtrado.drop_duplicates(subset=['PEDIDO'], keep='first').copy()
-    
-    # Os timestamps já foram criados na função fetch_data, não precisamos recriar
-    
-    # Criação das colunas de STATUS baseadas nos timestamps corretos
-    # Etapa 1 está concluída quando TIMESTAMP REMESSA está preenchido
-    # Etapa 2 está concluída quando TIMESTAMP ITEM está preenchido  
-    # Etapa 3 está concluída quando TIMESTAMP TITULO está preenchido
-    
-    # STATUS PEDIDO (sempre baseado em TIMESTAMP PEDIDO)
-    df_trabalho['STATUS PEDIDO'] = np.where(df_trabalho['TIMESTAMP PEDIDO'].notna(), 'Concluído', 'Pendente')
+        filiais_para_filtrar = filiais_selecionadas
 
-    # Etapa 1: STATUS REMESSA (baseado em TIMESTAMP REMESSA)
-    df_trabalho['STATUS REMESSA'] = np.where(
-        df_trabalho['TIMESTAMP REMESSA'].notna(),
-        'Concluído', 
-        'Pendente'
-    )
+    # Um pedido por linha, com STATUS PEDIDO/REMESSA/ITEM/NF/TITULO (concluído quando o
+    # timestamp da etapa está preenchido) e as durações entre etapas em horas
+    # Seleções de filiais e etapas já calculadas são reaproveitadas sem recalcular
+    cache_derivacoes = obter_cache_derivacoes()
+    impressao_fatos = st.session_state.impressao_fatos
 
-    # Etapa 2: STATUS ITEM (baseado em TIMESTAMP ITEM)
-    df_trabalho['STATUS ITEM'] = np.where(
-        df_trabalho['TIMESTAMP ITEM'].notna(), 
-        'Concluído', 
-        'Pendente'
+    # Apenas as colunas e entradas derivadas declaradas pela visão selecionada são materializadas
+    visao = REGISTRO_ETAPAS[etapa_selecionada]
+    derivadas = {}
+    for entrada in visao['entradas']:
+        derivadas.update(cache_derivacoes.obter(
+            CacheDerivacoes.chave(impressao_fatos, [], entrada),
+            lambda entrada=entrada: ENTRADAS_DERIVADAS[entrada](fatos)
+        ))
+    df_trabalho = cache_derivacoes.obter(
+        CacheDerivacoes.chave(impressao_fatos, filiais_para_filtrar, f'pedidos {etapa_selecionada}'),
+        lambda: pedidos_das_filiais(fatos, filiais_para_filtrar, visao['colunas'], derivadas, indice_filiais)
     )
 
-    # STATUS NF (baseado em TIMESTAMP NF)
-    df_trabalho['STATUS NF'] = np.where(
-        df_trabalho['TIMESTAMP NF'].notna(), 
-        'Concluído', 
-        'Pendente'
-    )
+    if df_trabalho.empty:
+        st.warning("Nenhum dado para as filiais selecionadas. Por favor, ajuste os filtros.")
+        st.stop()
     
-    # Etapa 3: STATUS TITULO (baseado em TIMESTAMP TITULO)
-    df_trabalho['STATUS TITULO'] = np.where(
-        df_trabalho['TIMESTAMP TITULO'].notna(), 
-        'Concluído', 
-        'Pendente'
+    derivados = cache_derivacoes.obter(
+        CacheDerivacoes.chave(impressao_fatos, filiais_para_filtrar, etapa_selecionada),
+        lambda: visao['derivar'](df_trabalho)
     )
     
     # --- VISUALIZAÇÃO BASEADA NA ETAPA SELECIONADA ---
@@ -528,13 +436,13 @@ if 'df' in st.session_state and not st.session_state.df.empty:
         st.header("Visão Geral do Processo Order to Cash")
         
         # Exibir estatísticas gerais de qualidade dos dados
-        total_registros = len(df_trabalho)
-        total_pedidos = (df_trabalho['STATUS PEDIDO'] == 'Concluído').sum()
-        concluidos_remessa = (df_trabalho['STATUS REMESSA'] == 'Concluído').sum()
-        concluidos_item = (df_trabalho['STATUS ITEM'] == 'Concluído').sum()
-        concluidos_titulo = (df_trabalho['STATUS TITULO'] == 'Concluído').sum()
-        pendentes_geral = total_registros - concluidos_titulo
-        percentual_conclusao_completa = (concluidos_titulo / total_registros * 100) if total_registros > 0 else 0
+        total_registros = derivados['total_registros']
+        total_pedidos = derivados['total_pedidos']
+        concluidos_remessa = derivados['concluidos_remessa']
+        concluidos_item = derivados['concluidos_item']
+        concluidos_titulo = derivados['concluidos_titulo']
+        pendentes_geral = derivados['pendentes_geral']
+        percentual_conclusao_completa = derivados['percentual_conclusao_completa']
         
         col1, col2, col3, col4, col5 = st.columns(5)
         
@@ -563,42 +471,28 @@ if 'df' in st.session_state and not st.session_state.df.empty:
         else:
             st.success(f"✅ Excelente! {percentual_conclusao_completa:.1f}% dos processos foram concluídos completamente.")
         
+        if derivados['pedidos_fora_de_ordem'] > 0:
+            st.caption(f"{derivados['pedidos_fora_de_ordem']:,} pedido(s) com etapa concluída após uma etapa anterior pendente.")
+        
         st.markdown("---")
         
         # Mostrar dados processados
         st.subheader("Dados Processados")
-        colunas_visao_geral = [
-            'FILIAL', 'PEDIDO', 'TIMESTAMP PEDIDO', 'STATUS PEDIDO',
-            'TIMESTAMP REMESSA', 'STATUS REMESSA',
-            'TIMESTAMP ITEM', 'STATUS ITEM',
-            'TIMESTAMP TITULO', 'STATUS TITULO'
-        ]
-        st.dataframe(df_trabalho[colunas_visao_geral])
+        st.dataframe(derivados['dados_processados'])
         
         # Gráfico de barras para status de cada etapa
         st.subheader("Status por Etapa")
         
         # Preparar dados para o gráfico
-        status_counts = {
-            'Pedido': df_trabalho['STATUS PEDIDO'].value_counts(),
-            'Etapa 1 - Remessa': df_trabalho['STATUS REMESSA'].value_counts(),
-            'Etapa 2 - Item': df_trabalho['STATUS ITEM'].value_counts(),
-            'Etapa 3 - Título': df_trabalho['STATUS TITULO'].value_counts()
-        }
-        
-        status_df = pd.DataFrame({
-            'Etapa': [],
-            'Status': [],
-            'Quantidade': []
-        })
-        
-        for etapa, counts in status_counts.items():
-            for status, count in counts.items():
-                status_df = pd.concat([status_df, pd.DataFrame({
-                    'Etapa': [etapa],
-                    'Status': [status],
-                    'Quantidade': [count]
-                })])
+        if st.session_state.consulta_periodo and motor_duckdb_ativo():
+            # MOTOR_CONSULTA=duckdb: contagem feita em SQL sobre os mesmos pedidos dos indicadores
+            # (guardada no cache de derivações, como as contagens em pandas)
+            status_df = cache_derivacoes.obter(
+                CacheDerivacoes.chave(impressao_fatos, filiais_para_filtrar, 'status por etapa (duckdb)'),
+                lambda: status_etapas_duckdb(df_trabalho)
+            )
+        else:
+            status_df = derivados['status_df']
         
         # Criar gráfico de barras
         fig = px.bar(
@@ -616,17 +510,7 @@ if 'df' in st.session_state and not st.session_state.df.empty:
         # Gráfico de funil para visualizar o fluxo do processo
         st.subheader("Funil do Processo Order to Cash")
         
-        funil_data = {
-            'Etapa': ['Pedido', 'Etapa 1 - Remessa', 'Etapa 2 - Item', 'Etapa 3 - Título'],
-            'Concluídos': [
-                (df_trabalho['STATUS PEDIDO'] == 'Concluído').sum(),
-                (df_trabalho['STATUS REMESSA'] == 'Concluído').sum(),
-                (df_trabalho['STATUS ITEM'] == 'Concluído').sum(),
-                (df_trabalho['STATUS TITULO'] == 'Concluído').sum()
-            ]
-        }
-        
-        funil_df = pd.DataFrame(funil_data)
+        funil_df = derivados['funil_df']
         
         fig_funil = px.funnel(
             funil_df,
@@ -640,193 +524,8 @@ if 'df' in st.session_state and not st.session_state.df.empty:
     elif etapa_selecionada == "Etapa 1 - Remessa":
         st.header("Etapa 1 - Remessa")
         
-        # Calcular duração entre pedido e remessa
-        df_trabalho['DURACAO_PEDIDO_REMESSA'] = df_trabalho['TIMESTAMP REMESSA'] - df_trabalho['TIMESTAMP PEDIDO']
-        df_trabalho['DURACAO_PEDIDO_REMESSA_HORAS'] = df_trabalho['DURACAO_PEDIDO_REMESSA'].dt.total_seconds() / 3600
-        
-        # Calcular média móvel
-        tamanho_janela = 3
-        df_trabalho['MEDIA_MOVEL_DURACAO_HORAS'] = df_trabalho['DURACAO_PEDIDO_REMESSA_HORAS'].rolling(window=tamanho_janela).mean()
-        
-        # Agrupamento para pedidos únicos
-        agregacoes = {
-            'TIMESTAMP PEDIDO': 'first',
-            'TIMESTAMP REMESSA': 'first',
-            'DURACAO_PEDIDO_REMESSA': 'first',
-            'DURACAO_PEDIDO_REMESSA_HORAS': 'first',
-            'MEDIA_MOVEL_DURACAO_HORAS': 'first',
-            'STATUS PEDIDO': 'first',
-            'STATUS REMESSA': 'first',
-            'SITUACAO DO PEDIDO': 'first',
-            'PEDIDO BLOQUEADO': 'first',
-            'USUARIO BLOQ PEDIDO': 'first',
-            'DATA DO BLOQUEIO': 'first',
-            'OBSERVACAO DO PEDIDO': 'first'
-        }
-        
-        # Filtrar colunas que existem no DataFrame
-        agregacoes_existentes = {k: v for k, v in agregacoes.items() if k in df_trabalho.columns}
-        df_pedidos_unicos = df_trabalho.groupby(['FILIAL', 'PEDIDO']).agg(agregacoes_existentes).reset_index()
-        
-        # Tratamento aprimorado dos dados insuficientes
-        if 'MEDIA_MOVEL_DURACAO_HORAS' in df_pedidos_unicos.columns:
-            # Primeiro, filtrar apenas registros com timestamps válidos
-            df_com_timestamps = df_pedidos_unicos[
-                df_pedidos_unicos['TIMESTAMP PEDIDO'].notna() & 
-                df_pedidos_unicos['TIMESTAMP REMESSA'].notna()
-            ].copy()
-            
-            # Calcular média móvel apenas para dados válidos
-            if not df_com_timestamps.empty:
-                # Recalcular duração para dados válidos
-                df_com_timestamps['DURACAO_PEDIDO_REMESSA_HORAS_VALIDA'] = (
-                    df_com_timestamps['TIMESTAMP REMESSA'] - df_com_timestamps['TIMESTAMP PEDIDO']
-                ).dt.total_seconds() / 3600
-                
-                # Filtrar durações positivas (remover valores negativos ou zero)
-                df_com_timestamps = df_com_timestamps[
-                    df_com_timestamps['DURACAO_PEDIDO_REMESSA_HORAS_VALIDA'] > 0
-                ]
-                
-                if not df_com_timestamps.empty:
-                    # Calcular média móvel com dados válidos
-                    df_com_timestamps['MEDIA_MOVEL_DURACAO_HORAS_VALIDA'] = (
-                        df_com_timestamps['DURACAO_PEDIDO_REMESSA_HORAS_VALIDA']
-                        .rolling(window=3, min_periods=1).mean()
-                    )
-                    
-                    # Calcular média geral para preenchimento
-                    media_geral_duracao = df_com_timestamps['DURACAO_PEDIDO_REMESSA_HORAS_VALIDA'].mean()
-                    media_geral_movel = df_com_timestamps['MEDIA_MOVEL_DURACAO_HORAS_VALIDA'].mean()
-                    
-                    # Aplicar de volta ao DataFrame principal
-                    df_pedidos_unicos = df_pedidos_unicos.merge(
-                        df_com_timestamps[['FILIAL', 'PEDIDO', 'DURACAO_PEDIDO_REMESSA_HORAS_VALIDA', 'MEDIA_MOVEL_DURACAO_HORAS_VALIDA']],
-                        on=['FILIAL', 'PEDIDO'],
-                        how='left'
-                    )
-                    
-                    # Preencher valores nulos com a média geral
-                    df_pedidos_unicos['MEDIA_MOVEL_DURACAO_HORAS_FILLNA'] = (
-                        df_pedidos_unicos['MEDIA_MOVEL_DURACAO_HORAS_VALIDA']
-                        .fillna(media_geral_movel)
-                    )
-                    
-                    df_pedidos_unicos['DURACAO_PEDIDO_REMESSA_HORAS_FILLNA'] = (
-                        df_pedidos_unicos['DURACAO_PEDIDO_REMESSA_HORAS_VALIDA']
-                        .fillna(media_geral_duracao)
-                    )
-                    
-                    media_da_media_movel = media_geral_movel
-                    
-                    # Função aprimorada para classificar status da média
-                    def classificar_status_media_aprimorado(row):
-                        # Verificar se há timestamps válidos - se ausentes, considerar como pendente
-                        if pd.isna(row.get('TIMESTAMP PEDIDO')):
-                            return 'Pendente - Pedido não Criado'
-                        
-                        if pd.isna(row.get('TIMESTAMP REMESSA')):
-                            return 'Pendente - Remessa não Associada'
-                        
-                        # Verificar se a duração é válida
-                        duracao = row.get('DURACAO_PEDIDO_REMESSA_HORAS_VALIDA')
-                        if pd.isna(duracao) or duracao <= 0:
-                            return 'Dados Insuficientes - Duração Inválida'
-                        
-                        # Verificar se há média móvel
-                        media_movel = row.get('MEDIA_MOVEL_DURACAO_HORAS_FILLNA')
-                        if pd.isna(media_movel):
-                            return 'Dados Insuficientes - Média Indisponível'
-                        
-                        # Classificar com base na comparação
-                        if duracao <= media_movel:
-                            return 'Dentro da Média'
-                        else:
-                            return 'Fora da Média'
-                    
-                    df_pedidos_unicos['CLASSIFICACAO_TEMPO'] = df_pedidos_unicos.apply(classificar_status_media_aprimorado, axis=1)
-                    
-                    # Adicionar estatísticas de qualidade dos dados
-                    total_registros = len(df_pedidos_unicos)
-                    registros_validos = len(df_com_timestamps)
-                    percentual_dados_validos = (registros_validos / total_registros * 100) if total_registros > 0 else 0
-                    
-                    # Armazenar estatísticas para exibição
-                    df_pedidos_unicos['PERCENTUAL_DADOS_VALIDOS'] = percentual_dados_validos
-                    df_pedidos_unicos['TOTAL_REGISTROS'] = total_registros
-                    df_pedidos_unicos['REGISTROS_VALIDOS'] = registros_validos
-                else:
-                    # Se não há dados válidos, aplicar classificação individual
-                    def classificar_sem_dados_validos(row):
-                        if pd.isna(row.get('TIMESTAMP PEDIDO')):
-                            return 'Pendente - Pedido não Criado'
-                        elif pd.isna(row.get('TIMESTAMP REMESSA')):
-                            return 'Pendente - Remessa não Associada'
-                        else:
-                            return 'Dados Insuficientes - Sem Dados Válidos'
-                    
-                    df_pedidos_unicos['CLASSIFICACAO_TEMPO'] = df_pedidos_unicos.apply(classificar_sem_dados_validos, axis=1)
-                    df_pedidos_unicos['MEDIA_MOVEL_DURACAO_HORAS_FILLNA'] = 0
-                    media_da_media_movel = 0
-            else:
-                # Se não há dados com timestamps, aplicar classificação individual
-                def classificar_sem_timestamps(row):
-                    if pd.isna(row.get('TIMESTAMP PEDIDO')):
-                        return 'Pendente - Pedido não Criado'
-                    elif pd.isna(row.get('TIMESTAMP REMESSA')):
-                        return 'Pendente - Remessa não Associada'
-                    else:
-                        return 'Dados Insuficientes - Timestamps Ausentes'
-                
-                df_pedidos_unicos['CLASSIFICACAO_TEMPO'] = df_pedidos_unicos.apply(classificar_sem_timestamps, axis=1)
-                df_pedidos_unicos['MEDIA_MOVEL_DURACAO_HORAS_FILLNA'] = 0
-                media_da_media_movel = 0
-        
-        # Mapeamento para situação do pedido
-        mapeamento_situacao_pedido = {
-            1: 'Aberto Total',
-            2: 'Aberto Parcial',
-            3: 'Suspenso',
-            4: 'Liquidado',
-            5: 'Cancelado',
-            6: 'Aguardando Integração WMS',
-            7: 'Em Transmissão',
-            8: 'Preparação Análise ou NF',
-            9: 'Fechado'
-        }
-        
-        if 'SITUACAO DO PEDIDO' in df_pedidos_unicos.columns:
-            # Converter para inteiro se necessário, tratando tanto string quanto numérico
-            def converter_situacao(x):
-                try:
-                    # Tenta converter para int
-                    return int(float(x)) if pd.notna(x) else None
-                except (ValueError, TypeError):
-                    return None
-            
-            df_pedidos_unicos['SITUACAO DO PEDIDO_NUM'] = df_pedidos_unicos['SITUACAO DO PEDIDO'].apply(converter_situacao)
-            
-            df_pedidos_unicos['SITUACAO DO PEDIDO_DESCRICAO'] = df_pedidos_unicos['SITUACAO DO PEDIDO_NUM'].apply(
-                lambda x: mapeamento_situacao_pedido.get(x, 'Status Desconhecido') if x is not None else 'Status Desconhecido'
-            )
-        
-        # Preparar dados para observações de pedidos bloqueados
-        if 'PEDIDO BLOQUEADO' in df_pedidos_unicos.columns and 'OBSERVACAO DO PEDIDO' in df_pedidos_unicos.columns:
-            pedidos_bloqueados_obs = df_pedidos_unicos[
-                df_pedidos_unicos['PEDIDO BLOQUEADO'].astype(str).str.strip() != ''
-            ].copy()
-            
-            if not pedidos_bloqueados_obs.empty:
-                observacoes_bloqueados_validas = pedidos_bloqueados_obs[
-                    pedidos_bloqueados_obs['OBSERVACAO DO PEDIDO'].astype(str).str.strip() != ''
-                ]
-                
-                if not observacoes_bloqueados_validas.empty:
-                    top_observacoes_bloqueados = observacoes_bloqueados_validas['OBSERVACAO DO PEDIDO'].value_counts().head(10).reset_index()
-                    top_observacoes_bloqueados.columns = ['Observação do Pedido (Bloqueado)', 'Quantidade']
-        
         # Usar dados já filtrados pela sidebar
-        df_filtrado = df_pedidos_unicos.copy()
+        df_filtrado = derivados['pedidos']
         
         if df_filtrado.empty:
             st.warning("Não há dados para as filiais selecionadas.")
@@ -835,11 +534,12 @@ if 'df' in st.session_state and not st.session_state.df.empty:
             
             # Exibir estatísticas de qualidade dos dados da Etapa 1
             # Usar df_trabalho como base para manter consistência com outras etapas
-            total_registros = len(df_trabalho)
-            concluidos = (df_trabalho['STATUS REMESSA'] == 'Concluído').sum()
-            pendentes = (df_trabalho['STATUS REMESSA'] == 'Pendente').sum()
-            dados_insuficientes = total_registros - concluidos - pendentes
-            percentual_concluidos = (concluidos / total_registros * 100) if total_registros > 0 else 0
+            indicadores = derivados['indicadores']
+            total_registros = indicadores['total_registros']
+            concluidos = indicadores['concluidos']
+            pendentes = indicadores['pendentes']
+            dados_insuficientes = indicadores['dados_insuficientes']
+            percentual_concluidos = indicadores['percentual_concluidos']
                  
             col1, col2, col3, col4, col5 = st.columns(5)
             
@@ -871,23 +571,12 @@ if 'df' in st.session_state and not st.session_state.df.empty:
             
             st.markdown("---")
             
-            colunas_etapa1 = [
-                'FILIAL', 'PEDIDO', 'TIMESTAMP PEDIDO', 'TIMESTAMP REMESSA', 
-                'STATUS PEDIDO', 'STATUS REMESSA', 'SITUACAO DO PEDIDO', 
-                'PEDIDO BLOQUEADO', 'USUARIO BLOQ PEDIDO', 'DATA DO BLOQUEIO', 'OBSERVACAO DO PEDIDO'
-            ]
-            
-            # Filtrar colunas que existem no DataFrame
-            colunas_existentes = [col for col in colunas_etapa1 if col in df_filtrado.columns]
-            
             # Gráfico de classificação de tempo
             if 'CLASSIFICACAO_TEMPO' in df_filtrado.columns:
                 st.subheader("Medição de tempo da geração do pedido até associação da remessa")
                 
-                # Filtrar apenas 'Dentro da Média' e 'Fora da Média'
-                df_tempo_filtrado = df_filtrado[df_filtrado['CLASSIFICACAO_TEMPO'].isin(['Dentro da Média', 'Fora da Média'])]
-                contagem_classificacao_tempo = df_tempo_filtrado['CLASSIFICACAO_TEMPO'].value_counts().reset_index()
-                contagem_classificacao_tempo.columns = ['Classificação', 'Quantidade de Pedidos']
+                # Apenas 'Dentro da Média' e 'Fora da Média'
+                contagem_classificacao_tempo = derivados['contagem_classificacao_tempo']
                 
                 # Mapeamento de cores para diferentes status
                 color_map = {
@@ -919,8 +608,8 @@ if 'df' in st.session_state and not st.session_state.df.empty:
                     bargap=0.15
                 )
                 
-                if 'MEDIA_MOVEL_DURACAO_HORAS_FILLNA' in df_filtrado.columns:
-                    media_filtrada = df_filtrado['MEDIA_MOVEL_DURACAO_HORAS_FILLNA'].mean()
+                media_filtrada = derivados['media_filtrada']
+                if media_filtrada is not None:
                     fig_classificacao_tempo.add_annotation(
                         text=f"Média até a associação da remessa: {media_filtrada:.2f} horas",
                         xref="paper", yref="paper",
@@ -937,9 +626,8 @@ if 'df' in st.session_state and not st.session_state.df.empty:
                 st.plotly_chart(fig_classificacao_tempo, use_container_width=True)
                 
                 # Gráfico de proporção por STATUS REMESSA (apenas Concluído/Pendente)
-                if 'STATUS REMESSA' in df_filtrado.columns:
-                    contagem_por_status_e_filial = df_filtrado.groupby(['FILIAL', 'STATUS REMESSA']).size().reset_index(name='Quantidade')
-                    
+                contagem_por_status_e_filial = derivados['contagem_por_status_e_filial']
+                if contagem_por_status_e_filial is not None:
                     fig_status = px.bar(
                         contagem_por_status_e_filial,
                         x='STATUS REMESSA',
@@ -973,10 +661,8 @@ if 'df' in st.session_state and not st.session_state.df.empty:
                     st.plotly_chart(fig_status, use_container_width=True)
             
             # Gráfico de situação do pedido
-            if 'SITUACAO DO PEDIDO_DESCRICAO' in df_filtrado.columns:
-                quantidade_situacao = df_filtrado['SITUACAO DO PEDIDO_DESCRICAO'].value_counts().reset_index()
-                quantidade_situacao.columns = ['Situação do Pedido', 'Quantidade']
-                
+            quantidade_situacao = derivados['quantidade_situacao']
+            if quantidade_situacao is not None:
                 fig_situacao_donut = px.pie(
                     quantidade_situacao,
                     values='Quantidade',
@@ -1001,7 +687,8 @@ if 'df' in st.session_state and not st.session_state.df.empty:
                 st.plotly_chart(fig_situacao_donut, use_container_width=True)
             
             # Gráfico de observações de pedidos bloqueados
-            if 'top_observacoes_bloqueados' in locals() and not top_observacoes_bloqueados.empty:
+            top_observacoes_bloqueados = derivados['top_observacoes_bloqueados']
+            if top_observacoes_bloqueados is not None and not top_observacoes_bloqueados.empty:
                 fig_obs_bloqueio = px.bar(
                     top_observacoes_bloqueados,
                     y='Observação do Pedido (Bloqueado)',
@@ -1028,72 +715,14 @@ if 'df' in st.session_state and not st.session_state.df.empty:
     elif etapa_selecionada == "Etapa 2 - Item":
         st.header("Etapa 2 - Item")
         
-        # Os mapeamentos das situações já foram aplicados na função fetch_data
-        # Não precisamos aplicar novamente aqui
-        
-        # Calcular duração e classificação de tempo
-        df_trabalho_etapa2 = df_trabalho[df_trabalho['TIMESTAMP REMESSA'].notna() & df_trabalho['TIMESTAMP ITEM'].notna()].copy()
-        
-        if not df_trabalho_etapa2.empty:
-            # Calcular duração em horas
-            df_trabalho_etapa2['DURACAO_REMESSA_ITEM'] = df_trabalho_etapa2['TIMESTAMP ITEM'] - df_trabalho_etapa2['TIMESTAMP REMESSA']
-            df_trabalho_etapa2['DURACAO_REMESSA_HORAS'] = df_trabalho_etapa2['DURACAO_REMESSA_ITEM'].dt.total_seconds() / 3600
-            
-            # Calcular média móvel
-            tamanho_janela = 3
-            df_trabalho_etapa2['MEDIA_MOVEL_DURACAO_HORAS'] = df_trabalho_etapa2['DURACAO_REMESSA_HORAS'].rolling(window=tamanho_janela, min_periods=1).mean()
-            
-            # Agrupar por pedidos únicos
-            agregacoes = {
-                'TIMESTAMP REMESSA': 'first',
-                'TIMESTAMP ITEM': 'first',
-                'DURACAO_REMESSA_ITEM': 'first',
-                'DURACAO_REMESSA_HORAS': 'first',
-                'MEDIA_MOVEL_DURACAO_HORAS': 'first',
-                'STATUS ITEM': 'first'
-            }
-            
-            # Adicionar colunas opcionais se existirem
-            if 'CODIGO PRODUTO' in df_trabalho_etapa2.columns:
-                agregacoes['CODIGO PRODUTO'] = lambda x: list(x.unique())
-            if 'N° NOTA FISCAL' in df_trabalho_etapa2.columns:
-                agregacoes['N° NOTA FISCAL'] = lambda x: list(x.unique())
-            
-            df_pedidos_unicos = df_trabalho_etapa2.groupby(['FILIAL','PEDIDO']).agg(agregacoes).reset_index()
-            df_pedidos_unicos['MEDIA_MOVEL_DURACAO_HORAS_FILLNA'] = df_pedidos_unicos['MEDIA_MOVEL_DURACAO_HORAS'].fillna(df_pedidos_unicos['MEDIA_MOVEL_DURACAO_HORAS'].mean())
-            
-            # Corrigir valores negativos
-            media_positiva_duracao = df_pedidos_unicos[df_pedidos_unicos['MEDIA_MOVEL_DURACAO_HORAS_FILLNA'] >= 0]['MEDIA_MOVEL_DURACAO_HORAS_FILLNA'].mean()
-            df_pedidos_unicos.loc[df_pedidos_unicos['MEDIA_MOVEL_DURACAO_HORAS_FILLNA'] < 0, 'MEDIA_MOVEL_DURACAO_HORAS_FILLNA'] = media_positiva_duracao
-            media_da_media_movel = df_pedidos_unicos['MEDIA_MOVEL_DURACAO_HORAS_FILLNA'].mean()
-            
-            # Classificar tempo
-            def classificar_status_media(row):
-                if pd.isna(row['DURACAO_REMESSA_HORAS']) or pd.isna(row['MEDIA_MOVEL_DURACAO_HORAS_FILLNA']):
-                    return 'Dados Insuficientes'
-                elif row['DURACAO_REMESSA_HORAS'] <= row['MEDIA_MOVEL_DURACAO_HORAS_FILLNA']:
-                    return 'Dentro da Média'
-                else:
-                    return 'Fora da Média'
-            
-            df_pedidos_unicos['CLASSIFICACAO_TEMPO'] = df_pedidos_unicos.apply(classificar_status_media, axis=1)
-        
-        # Criar df_situacoes_agrupadas para os gráficos de rosca (como no arquivo original)
-        # Usar df_trabalho que já tem os mapeamentos aplicados
-        df_situacoes_agrupadas = df_trabalho.copy()
-        
-        # Usar dados já filtrados pela sidebar
-        df_filtrado = df_trabalho.copy()
-        if 'df_pedidos_unicos' in locals():
-            df_pedidos_filtrados = df_pedidos_unicos.copy()
-        
         # Exibir estatísticas de qualidade dos dados da Etapa 2
         # Usar df_trabalho como base para manter consistência
-        total_registros = len(df_trabalho)
-        concluidos = (df_trabalho['STATUS ITEM'] == 'Concluído').sum()
-        pendentes = (df_trabalho['STATUS ITEM'] == 'Pendente').sum()
-        dados_insuficientes = total_registros - concluidos - pendentes
-        percentual_concluidos = (concluidos / total_registros * 100) if total_registros > 0 else 0
+        indicadores = derivados['indicadores']
+        total_registros = indicadores['total_registros']
+        concluidos = indicadores['concluidos']
+        pendentes = indicadores['pendentes']
+        dados_insuficientes = indicadores['dados_insuficientes']
+        percentual_concluidos = indicadores['percentual_concluidos']
         
         col1, col2, col3, col4, col5 = st.columns(5)
         
@@ -1129,10 +758,8 @@ if 'df' in st.session_state and not st.session_state.df.empty:
         st.subheader("Medição de tempo da associação da remessa até a preparação do item (PFA)")
         
         # Gráfico de classificação de tempo
-        if 'df_pedidos_filtrados' in locals() and not df_pedidos_filtrados.empty:
-            contagem_classificacao_tempo = df_pedidos_filtrados['CLASSIFICACAO_TEMPO'].value_counts().reset_index()
-            contagem_classificacao_tempo.columns = ['Classificação', 'Quantidade de Pedidos']
-            
+        contagem_classificacao_tempo = derivados['contagem_classificacao_tempo']
+        if contagem_classificacao_tempo is not None:
             fig_classificacao_tempo = px.bar(
                 contagem_classificacao_tempo,
                 x='Classificação',
@@ -1161,7 +788,8 @@ if 'df' in st.session_state and not st.session_state.df.empty:
                 bargap=0.15
             )
             
-            if 'media_da_media_movel' in locals():
+            media_da_media_movel = derivados['media_da_media_movel']
+            if media_da_media_movel is not None:
                 fig_classificacao_tempo.add_annotation(
                     text=f"Média até a preparação do item (PFA): {media_da_media_movel:.2f} horas",
                     xref="paper", yref="paper",
@@ -1179,9 +807,8 @@ if 'df' in st.session_state and not st.session_state.df.empty:
         
 
         # Gráfico de proporção por STATUS ITEM (apenas Concluído/Pendente)
-        if 'STATUS ITEM' in df_trabalho.columns:
-            contagem_por_status_e_filial = df_trabalho.groupby(['FILIAL', 'STATUS ITEM']).size().reset_index(name='Quantidade')
-            
+        contagem_por_status_e_filial = derivados['contagem_por_status_e_filial']
+        if contagem_por_status_e_filial is not None:
             fig_status_item = px.bar(
                 contagem_por_status_e_filial,
                 x='STATUS ITEM',
@@ -1215,48 +842,28 @@ if 'df' in st.session_state and not st.session_state.df.empty:
             st.plotly_chart(fig_status_item, use_container_width=True)
         
         # Análise de produtos por nota fiscal
-        if not df_filtrado.empty and 'N° NOTA FISCAL' in df_filtrado.columns and 'CODIGO PRODUTO' in df_filtrado.columns:
-            quantidade_produtos_por_nota = df_filtrado.groupby('N° NOTA FISCAL')['CODIGO PRODUTO'].nunique().reset_index()
-            quantidade_produtos_por_nota.columns = ['N° NOTA FISCAL', 'Quantidade de Produtos']
-            
-            contagem_notas_por_quantidade_produtos = quantidade_produtos_por_nota.groupby('Quantidade de Produtos').size().reset_index(name='Quantidade de Notas Fiscais')
+        contagem_notas_por_quantidade_produtos = derivados['contagem_notas_por_quantidade_produtos']
+        if contagem_notas_por_quantidade_produtos is not None:
+            fig_produtos_nota = px.bar(
+                contagem_notas_por_quantidade_produtos,
+                x='Quantidade de Produtos',
+                y='Porcentagem',
+                text='Porcentagem',
+                title='Porcentagem de Notas Fiscais por Quantidade de Produtos',
+                labels={'Porcentagem': 'Porcentagem (%)', 'Quantidade de Produtos': 'Qtd. de Produtos por Nota'},
+                color='Porcentagem',
+                color_continuous_scale=px.colors.sequential.Sunset
+            )
             
-            total_notas_fiscais_analisadas = contagem_notas_por_quantidade_produtos['Quantidade de Notas Fiscais'].sum()
+            fig_produtos_nota.update_traces(texttemplate='%{text:.2f}%', textposition='outside')
+            fig_produtos_nota.update_layout(uniformtext_minsize=8, uniformtext_mode='hide')
+            fig_produtos_nota.update_yaxes(range=[0, 100])
             
-            if total_notas_fiscais_analisadas > 0:
-                contagem_notas_por_quantidade_produtos['Porcentagem'] = (
-                    contagem_notas_por_quantidade_produtos['Quantidade de Notas Fiscais'] / total_notas_fiscais_analisadas * 100
-                ).round(2)
-                
-                fig_produtos_nota = px.bar(
-                    contagem_notas_por_quantidade_produtos,
-                    x='Quantidade de Produtos',
-                    y='Porcentagem',
-                    text='Porcentagem',
-                    title='Porcentagem de Notas Fiscais por Quantidade de Produtos',
-                    labels={'Porcentagem': 'Porcentagem (%)', 'Quantidade de Produtos': 'Qtd. de Produtos por Nota'},
-                    color='Porcentagem',
-                    color_continuous_scale=px.colors.sequential.Sunset
-                )
-                
-                fig_produtos_nota.update_traces(texttemplate='%{text:.2f}%', textposition='outside')
-                fig_produtos_nota.update_layout(uniformtext_minsize=8, uniformtext_mode='hide')
-                fig_produtos_nota.update_yaxes(range=[0, 100])
-                
-                st.plotly_chart(fig_produtos_nota, use_container_width=True)
+            st.plotly_chart(fig_produtos_nota, use_container_width=True)
         
         # Gráfico de produtos mais vendidos
-        if not df_filtrado.empty and 'CODIGO PRODUTO' in df_filtrado.columns:
-            top_produtos = df_filtrado['CODIGO PRODUTO'].value_counts().reset_index()
-            top_produtos.columns = ['Codigo do Produto', 'Quantidade de Vendas (Itens)']
-            
-            if len(top_produtos) > 3:
-                df_donut = top_produtos.head(3).copy()
-                outros_soma = top_produtos['Quantidade de Vendas (Itens)'][3:].sum()
-                df_donut.loc[3] = ['Outros', outros_soma]
-            else:
-                df_donut = top_produtos.copy()
-            
+        df_donut = derivados['df_donut']
+        if df_donut is not None:
             fig_donut = px.pie(
                 df_donut,
                 values='Quantidade de Vendas (Itens)',
@@ -1272,10 +879,8 @@ if 'df' in st.session_state and not st.session_state.df.empty:
         col1, col2, col3 = st.columns(3)
         
         with col1:
-            if 'SITUACAO PFA' in df_situacoes_agrupadas.columns:
-                df_pfa_counts = df_situacoes_agrupadas['SITUACAO PFA'].value_counts().reset_index()
-                df_pfa_counts.columns = ['Situacao', 'Contagem']
-                
+            df_pfa_counts = derivados['df_pfa_counts']
+            if df_pfa_counts is not None:
                 fig_pfa = px.pie(df_pfa_counts, values='Contagem', names='Situacao',
                                 title='Distribuição por Situação PFA', hole=0.4,
                                 color_discrete_sequence=px.colors.sequential.Plasma)
@@ -1283,10 +888,8 @@ if 'df' in st.session_state and not st.session_state.df.empty:
                 st.plotly_chart(fig_pfa, use_container_width=True)
         
         with col2:
-            if 'SITUACAO CARGA' in df_situacoes_agrupadas.columns:
-                df_carga_counts = df_situacoes_agrupadas['SITUACAO CARGA'].value_counts().reset_index()
-                df_carga_counts.columns = ['Situacao', 'Contagem']
-                
+            df_carga_counts = derivados['df_carga_counts']
+            if df_carga_counts is not None:
                 fig_carga = px.pie(df_carga_counts, values='Contagem', names='Situacao',
                                   title='Distribuição por Situação Carga', hole=0.4,
                                   color_discrete_sequence=px.colors.sequential.Plasma)
@@ -1294,10 +897,8 @@ if 'df' in st.session_state and not st.session_state.df.empty:
                 st.plotly_chart(fig_carga, use_container_width=True)
         
         with col3:
-            if 'SITUACAO NFV' in df_situacoes_agrupadas.columns:
-                df_nfv_counts = df_situacoes_agrupadas['SITUACAO NFV'].value_counts().reset_index()
-                df_nfv_counts.columns = ['Situacao', 'Contagem']
-                
+            df_nfv_counts = derivados['df_nfv_counts']
+            if df_nfv_counts is not None:
                 fig_nfv = px.pie(df_nfv_counts, values='Contagem', names='Situacao',
                                 title='Distribuição por Situação NFV', hole=0.4,
                                 color_discrete_sequence=px.colors.sequential.Plasma)
@@ -1305,16 +906,8 @@ if 'df' in st.session_state and not st.session_state.df.empty:
                 st.plotly_chart(fig_nfv, use_container_width=True)
         
         # Gráfico de bloqueios PFA por data
-        if 'BLOQUEIO PFA' in df_filtrado.columns:
-            df_bloqueios_pfa = df_filtrado[df_filtrado['BLOQUEIO PFA'].notna() & (df_filtrado['BLOQUEIO PFA'] != 0) & (df_filtrado['BLOQUEIO PFA'] != '')].copy()
-        else:
-            df_bloqueios_pfa = pd.DataFrame()
-        
-        if not df_bloqueios_pfa.empty:
-            bloqueios_por_data = df_bloqueios_pfa.groupby(df_bloqueios_pfa['TIMESTAMP REMESSA'].dt.date).size().reset_index(name='Quantidade de Bloqueios')
-            bloqueios_por_data.columns = ['Data do Bloqueio', 'Quantidade de Bloqueios']
-            bloqueios_por_data = bloqueios_por_data.sort_values('Data do Bloqueio')
-            
+        bloqueios_por_data = derivados['bloqueios_por_data']
+        if bloqueios_por_data is not None:
             if not bloqueios_por_data.empty:
                 fig_bloqueios_pfa_data = px.bar(
                     bloqueios_por_data,
@@ -1336,11 +929,12 @@ if 'df' in st.session_state and not st.session_state.df.empty:
         st.header("Etapa 3 - Título")
         
         # Exibir estatísticas de qualidade dos dados da Etapa 3
-        total_registros = len(df_trabalho)
-        concluidos = (df_trabalho['STATUS TITULO'] == 'Concluído').sum()
-        pendentes = (df_trabalho['STATUS TITULO'] == 'Pendente').sum()
-        dados_insuficientes = total_registros - concluidos - pendentes
-        percentual_concluidos = (concluidos / total_registros * 100) if total_registros > 0 else 0
+        indicadores = derivados['indicadores']
+        total_registros = indicadores['total_registros']
+        concluidos = indicadores['concluidos']
+        pendentes = indicadores['pendentes']
+        dados_insuficientes = indicadores['dados_insuficientes']
+        percentual_concluidos = indicadores['percentual_concluidos']
         
         col1, col2, col3, col4, col5 = st.columns(5)
         
@@ -1373,10 +967,8 @@ if 'df' in st.session_state and not st.session_state.df.empty:
         st.markdown("---")
         
         # Gráfico original de STATUS TITULO
-        if 'STATUS TITULO' in df_trabalho.columns:
-            contagem_por_status = df_trabalho['STATUS TITULO'].value_counts().reset_index()
-            contagem_por_status.columns = ['Status', 'Quantidade']
-            
+        contagem_por_status = derivados['contagem_por_status']
+        if contagem_por_status is not None:
             fig_status = px.bar(
                 contagem_por_status,
                 x='Status',
@@ -1406,9 +998,8 @@ if 'df' in st.session_state and not st.session_state.df.empty:
             st.plotly_chart(fig_status, use_container_width=True)
         
         # Gráfico de proporção por STATUS TITULO por filial
-        if 'STATUS TITULO' in df_trabalho.columns:
-            contagem_por_status_e_filial = df_trabalho.groupby(['FILIAL', 'STATUS TITULO']).size().reset_index(name='Quantidade')
-            
+        contagem_por_status_e_filial = derivados['contagem_por_status_e_filial']
+        if contagem_por_status_e_filial is not None:
             fig_status_titulo = px.bar(
                 contagem_por_status_e_filial,
                 x='STATUS TITULO',
@@ -1441,30 +1032,13 @@ if 'df' in st.session_state and not st.session_state.df.empty:
             
             st.plotly_chart(fig_status_titulo, use_container_width=True)
         
-        # Mostrar dados específicos da Etapa 3
-        colunas_etapa3 = [
-            'FILIAL', 'PEDIDO', 'N° TITULO', 'VENCIMENTO ORIGINAL DO TITULO',
-            'TIMESTAMP ITEM', 'TIMESTAMP TITULO', 'STATUS ITEM', 'STATUS TITULO',
-            'SITUACAO DO TITULO', 'SITUACAO TCR'
-        ]
-        
-        # Filtrar colunas que existem no DataFrame
-        colunas_existentes = [col for col in colunas_etapa3 if col in df_trabalho.columns]
-        
         # Gráfico de tempo médio entre Item e Título
         st.subheader("Tempo Médio entre Item e Título")
         
-        # Filtrar apenas registros com ambos timestamps disponíveis
-        df_tempo = df_trabalho[df_trabalho['TIMESTAMP ITEM'].notna() & df_trabalho['TIMESTAMP TITULO'].notna()].copy()
+        # Apenas registros com ambos timestamps disponíveis, agrupados por filial
+        tempo_medio_por_filial = derivados['tempo_medio_por_filial']
         
-        if not df_tempo.empty:
-            # Calcular a diferença em horas
-            df_tempo['Tempo (horas)'] = (df_tempo['TIMESTAMP TITULO'] - df_tempo['TIMESTAMP ITEM']).dt.total_seconds() / 3600
-            
-            # Agrupar por filial
-            tempo_medio_por_filial = df_tempo.groupby('FILIAL')['Tempo (horas)'].mean().reset_index()
-            tempo_medio_por_filial['Tempo (horas)'] = tempo_medio_por_filial['Tempo (horas)'].round(2)
-            
+        if tempo_medio_por_filial is not None:
             fig = px.bar(
                 tempo_medio_por_filial,
                 x='FILIAL',
@@ -1478,12 +1052,10 @@ if 'df' in st.session_state and not st.session_state.df.empty:
             st.warning("Não há dados suficientes para calcular o tempo médio entre Item e Título.")
         
         # Gráfico de distribuição por Situação TCR
-        if 'SITUACAO TCR' in df_trabalho.columns:
+        situacao_tcr_counts = derivados['situacao_tcr_counts']
+        if situacao_tcr_counts is not None:
             st.subheader("Distribuição por Situação TCR")
             
-            situacao_tcr_counts = df_trabalho['SITUACAO TCR'].value_counts().reset_index()
-            situacao_tcr_counts.columns = ['Situação TCR', 'Quantidade']
-            
             fig = px.pie(
                 situacao_tcr_counts,
                 values='Quantidade',
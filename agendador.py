@@ -0,0 +1,124 @@
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+from senior import carregar_timeline_dia, obter_credenciais_webservice
+
+# Intervalo entre atualizações em minutos (PRE_CARGA_INTERVALO_MINUTOS no .env).
+# Deve ser menor que TIMELINE_CACHE_TTL_MINUTOS para o dia atual nunca expirar no cache
+INTERVALO_MINUTOS_PADRAO = 10
+
+
+def pre_carga_ativa():
+    """Indica se a pré-carga em segundo plano foi habilitada (PRE_CARGA_ATIVA no .env)"""
+    return os.getenv('PRE_CARGA_ATIVA', '0').strip().lower() in ('1', 'true', 'sim')
+
+
+def dia_util_anterior(dia):
+    """Dia útil anterior a `dia` (sábados e domingos são pulados, feriados não)"""
+    anterior = dia - timedelta(days=1)
+    while anterior.weekday() >= 5:
+        anterior -= timedelta(days=1)
+    return anterior
+
+
+def datas_pre_carga(hoje=None):
+    """Datas (DD/MM/AAAA) mantidas aquecidas: o dia atual e o dia útil anterior"""
+    hoje = hoje or datetime.now().date()
+    return [dia.strftime('%d/%m/%Y') for dia in (hoje, dia_util_anterior(hoje))]
+
+
+class AgendadorPreCarga:
+    """Consulta periodicamente o timeline do dia atual e do dia útil anterior em segundo plano.
+
+    As respostas passam por `senior.carregar_timeline_dia` e ficam no cache em disco, que é o
+    mesmo lido pelo fetch_data; assim a primeira consulta do dia já encontra os dados prontos.
+    O dia atual é sempre consultado de novo a cada rodada; o dia anterior, por ser uma data
+    fechada, só é consultado enquanto não estiver no cache.
+    """
+
+    def __init__(self, fontes, intervalo_segundos=None):
+        # fontes: lista de (fonte, url, user, password)
+        self.fontes = list(fontes)
+        if intervalo_segundos is None:
+            intervalo_segundos = float(os.getenv('PRE_CARGA_INTERVALO_MINUTOS', INTERVALO_MINUTOS_PADRAO)) * 60
+        self.intervalo_segundos = max(float(intervalo_segundos), 1.0)
+        self._parar = threading.Event()
+        self._thread = None
+        self._trava = threading.Lock()
+        self._atualizacoes = {}
+
+    def executar_rodada(self, hoje=None):
+        """Atualiza as datas de pré-carga de todas as fontes uma vez"""
+        datas = datas_pre_carga(hoje)
+        for fonte, url, user, password in self.fontes:
+            for data in datas:
+                # Dia atual: ignora a validade do cache para buscar a versão mais recente
+                ttl_segundos = 0 if data == datas[0] else None
+                try:
+                    df, info = carregar_timeline_dia(fonte, url, user, password, data, ttl_segundos=ttl_segundos)
+                except Exception as e:
+                    registro = {'atualizado_em': None, 'origem': None, 'linhas': 0, 'erro': e, 'alteracoes': None}
+                else:
+                    registro = {
+                        'atualizado_em': info['atualizado_em'],
+                        'origem': info['origem'],
+                        'linhas': len(df),
+                        'erro': info['erro'],
+                        'alteracoes': info.get('alteracoes'),
+                    }
+                registro['verificado_em'] = datetime.now()
+                with self._trava:
+                    self._atualizacoes[(fonte, data)] = registro
+
+    def atualizacoes(self):
+        """Último resultado de cada (fonte, data): atualizado_em, verificado_em, origem, linhas, erro, alteracoes"""
+        with self._trava:
+            return dict(self._atualizacoes)
+
+    def _laco(self):
+        while not self._parar.is_set():
+            self.executar_rodada()
+            self._parar.wait(self.intervalo_segundos)
+
+    def iniciar(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._parar.clear()
+            self._thread = threading.Thread(target=self._laco, name='pre-carga-timeline', daemon=True)
+            self._thread.start()
+        return self
+
+    def parar(self, aguardar=True):
+        self._parar.set()
+        if aguardar and self._thread is not None:
+            self._thread.join()
+
+
+def fontes_pre_carga():
+    """Credenciais das fontes aquecidas: o webservice principal e, se configurado, o Senior do .env"""
+    fontes = [obter_credenciais_webservice(False)]
+    senior = obter_credenciais_webservice(True)
+    if senior is not None:
+        fontes.append(senior)
+    return fontes
+
+
+if __name__ == "__main__":
+    # Execução como processo separado: python agendador.py
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    agendador = AgendadorPreCarga(fontes_pre_carga())
+    print(f"Pré-carga do timeline a cada {agendador.intervalo_segundos / 60:.0f} minutos")
+    try:
+        while True:
+            agendador.executar_rodada()
+            for (fonte, data), registro in sorted(agendador.atualizacoes().items()):
+                situacao = registro['erro'] or f"{registro['linhas']} linhas ({registro['origem']})"
+                if registro['alteracoes']:
+                    situacao += f", {registro['alteracoes']['itens_alterados']} itens alterados"
+                print(f"[{registro['verificado_em']:%d/%m/%Y %H:%M:%S}] {fonte} {data}: {situacao}")
+            time.sleep(agendador.intervalo_segundos)
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,155 @@
+import json
+import os
+import shutil
+import threading
+import uuid
+
+import pandas as pd
+
+from cache_dados import PARQUET_DISPONIVEL, VERSAO_TIMELINE, _data_consulta
+
+# Histórico do timeline em Parquet particionado por data e filial (ARMAZEM_DIR no .env):
+# <diretório>/v<VERSAO_TIMELINE>/<fonte>/DATA=AAAA-MM-DD/FILIAL=<filial>/<arquivo>.parquet
+DIRETORIO_ARMAZEM_PADRAO = '.armazem_timeline'
+
+COLUNA_DATA = 'DATA'
+COLUNA_FILIAL = 'FILIAL'
+# Posição da linha no retorno original, para devolver as linhas na mesma ordem
+COLUNA_ORDEM = '__ordem'
+
+# Diretórios não são substituídos de uma vez: entre os dois os.replace da troca a data fica
+# ausente. A trava impede que leituras do mesmo processo caiam nesse intervalo
+_trava_armazem = threading.Lock()
+
+
+def _diretorio_fonte(fonte, diretorio=None):
+    diretorio = diretorio or os.getenv('ARMAZEM_DIR', DIRETORIO_ARMAZEM_PADRAO)
+    # Arquivos de outra versão do processamento ficam fora da leitura
+    return os.path.join(diretorio, f"v{VERSAO_TIMELINE}", fonte)
+
+
+def _diretorio_dia(fonte, dia, diretorio=None):
+    return os.path.join(_diretorio_fonte(fonte, diretorio), f"{COLUNA_DATA}={dia.isoformat()}")
+
+
+def _particionamento():
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    return ds.partitioning(
+        pa.schema([(COLUNA_DATA, pa.date32()), (COLUNA_FILIAL, pa.string())]), flavor='hive'
+    )
+
+
+def dia_no_armazem(fonte, data, diretorio=None):
+    """Indica se a data (DD/MM/AAAA) já foi gravada no armazém"""
+    dia = _data_consulta(data)
+    return dia is not None and os.path.isdir(_diretorio_dia(fonte, dia, diretorio))
+
+
+def gravar_dia_armazem(fonte, data, df, diretorio=None):
+    """Grava o DataFrame processado de uma data no armazém, substituindo a gravação anterior.
+
+    As linhas são separadas por filial e as colunas TIMESTAMP ficam com tipo timestamp no
+    Parquet. A data é gravada em um diretório temporário e só então trocada pela anterior.
+    """
+    dia = _data_consulta(data)
+    if not PARQUET_DISPONIVEL or dia is None or df.empty or COLUNA_FILIAL not in df.columns:
+        return
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    df = df.drop(columns=['DATA CONSULTA'], errors='ignore')
+    colunas = list(df.columns)
+    df = df.assign(**{COLUNA_ORDEM: range(len(df))})
+    for col in colunas:
+        if col.startswith('TIMESTAMP'):
+            df[col] = pd.to_datetime(df[col], errors='coerce').astype('datetime64[ns]')
+    df[COLUNA_FILIAL] = df[COLUNA_FILIAL].astype(str).where(df[COLUNA_FILIAL].notna(), None)
+
+    tabela = pa.Table.from_pandas(df, preserve_index=False)
+    metadados = dict(tabela.schema.metadata or {})
+    metadados[b'otc_colunas'] = json.dumps(colunas).encode()
+    tabela = tabela.replace_schema_metadata(metadados)
+
+    destino = _diretorio_dia(fonte, dia, diretorio)
+    base = os.path.dirname(destino)
+    # Prefixo "." deixa os diretórios temporários fora da leitura do dataset
+    temporario = os.path.join(base, f".tmp-{uuid.uuid4().hex}")
+    antigo = os.path.join(base, f".old-{uuid.uuid4().hex}")
+    try:
+        os.makedirs(base, exist_ok=True)
+        pq.write_to_dataset(tabela, temporario, partition_cols=[COLUNA_FILIAL])
+    except Exception:
+        # Tipo não suportado ou sem permissão de escrita: a data fica fora do armazém
+        shutil.rmtree(temporario, ignore_errors=True)
+        return
+
+    with _trava_armazem:
+        try:
+            if os.path.isdir(destino):
+                os.replace(destino, antigo)
+            os.replace(temporario, destino)
+        except OSError:
+            # A versão anterior volta para o lugar; só é apagada depois que a nova estiver lá
+            if os.path.isdir(antigo) and not os.path.exists(destino):
+                try:
+                    os.replace(antigo, destino)
+                except OSError:
+                    pass
+            shutil.rmtree(temporario, ignore_errors=True)
+            return
+    shutil.rmtree(antigo, ignore_errors=True)
+
+
+def carregar_armazem(fonte, data_inicial, data_final, colunas=None, filiais=None, diretorio=None):
+    """Lê do armazém as datas entre data_inicial e data_final (DD/MM/AAAA), inclusive.
+
+    Os filtros de data e filial são aplicados sobre as partições, e apenas as `colunas`
+    pedidas são lidas dos arquivos. As linhas voltam em ordem cronológica e na ordem original
+    de cada retorno, com a coluna DATA CONSULTA como em `senior.carregar_timeline_periodo`.
+    Retorna um DataFrame vazio quando não há dados no período.
+    """
+    inicio, fim = _data_consulta(data_inicial), _data_consulta(data_final)
+    base = _diretorio_fonte(fonte, diretorio)
+    if not PARQUET_DISPONIVEL or inicio is None or fim is None or not os.path.isdir(base):
+        return pd.DataFrame()
+    with _trava_armazem:
+        return _ler_armazem(base, inicio, fim, colunas, filiais)
+
+
+def _ler_armazem(base, inicio, fim, colunas, filiais):
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    particionamento = _particionamento()
+    filtro = (ds.field(COLUNA_DATA) >= inicio) & (ds.field(COLUNA_DATA) <= fim)
+    if filiais is not None:
+        filtro &= ds.field(COLUNA_FILIAL).isin([str(filial) for filial in filiais])
+
+    dataset = ds.dataset(base, format='parquet', partitioning=particionamento)
+    # Caminhos em ordem cronológica (DATA=AAAA-MM-DD)
+    fragmentos = sorted(dataset.get_fragments(filter=filtro), key=lambda fragmento: fragmento.path)
+    if not fragmentos:
+        return pd.DataFrame()
+
+    # Datas diferentes podem ter colunas diferentes: ler com a união dos esquemas e manter
+    # a ordem de colunas de um pd.concat dos dias (DATA CONSULTA após as colunas do primeiro dia)
+    esquemas = [fragmento.physical_schema for fragmento in fragmentos]
+    esquema = pa.unify_schemas(esquemas + [particionamento.schema])
+    ordem_colunas = []
+    for esquema_fragmento in esquemas:
+        for col in json.loads((esquema_fragmento.metadata or {}).get(b'otc_colunas', b'[]')):
+            if col not in ordem_colunas:
+                ordem_colunas.append(col)
+        if 'DATA CONSULTA' not in ordem_colunas:
+            ordem_colunas.append('DATA CONSULTA')
+    if colunas is not None:
+        ordem_colunas = [col for col in ordem_colunas if col in colunas or col == 'DATA CONSULTA']
+    leitura = [col for col in ordem_colunas if col in esquema.names and col != COLUNA_DATA]
+
+    dataset = ds.dataset(base, schema=esquema, format='parquet', partitioning=particionamento)
+    df = dataset.to_table(columns=leitura + [COLUNA_DATA, COLUNA_ORDEM], filter=filtro).to_pandas()
+    df = df.sort_values([COLUNA_DATA, COLUNA_ORDEM], kind='stable', ignore_index=True)
+    df['DATA CONSULTA'] = pd.to_datetime(df[COLUNA_DATA]).dt.strftime('%d/%m/%Y')
+    return df[ordem_colunas]
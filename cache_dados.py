@@ -0,0 +1,334 @@
+import gzip
+import hashlib
+import importlib.util
+import os
+import tempfile
+import time
+from datetime import datetime
+
+import pandas as pd
+
+# pyarrow: motor usado por DataFrame.to_parquet/read_parquet, importado onde é usado
+PARQUET_DISPONIVEL = importlib.util.find_spec('pyarrow') is not None
+
+# Incrementar quando o pós-processamento da planilha mudar, invalidando snapshots antigos
+VERSAO_SNAPSHOT = '1'
+
+SUFIXO_SNAPSHOT = '.snapshot.parquet'
+
+# Incrementar quando senior.processar_timeline mudar, para reprocessar o XML guardado
+VERSAO_TIMELINE = '3'
+
+DIRETORIO_CACHE_TIMELINE_PADRAO = '.cache_timeline'
+TTL_DIA_ATUAL_MINUTOS_PADRAO = 15
+
+
+def caminho_snapshot(caminho_planilha):
+    """Caminho do snapshot Parquet, gravado ao lado da planilha."""
+    return f"{caminho_planilha}{SUFIXO_SNAPSHOT}"
+
+
+def hash_arquivo(caminho, tamanho_bloco=1024 * 1024):
+    """Calcula o SHA-256 do arquivo em blocos."""
+    sha = hashlib.sha256()
+    with open(caminho, 'rb') as arquivo:
+        for bloco in iter(lambda: arquivo.read(tamanho_bloco), b''):
+            sha.update(bloco)
+    return sha.hexdigest()
+
+
+def assinatura_arquivo(caminho):
+    """Retorna mtime (ns) e tamanho do arquivo, usados como chave rápida do snapshot."""
+    info = os.stat(caminho)
+    return {'mtime_ns': str(info.st_mtime_ns), 'tamanho': str(info.st_size)}
+
+
+def normalizar_para_parquet(df):
+    """Prepara o DataFrame para ser gravado em Parquet.
+
+    Colunas object com tipos Python misturados (ex.: datas e textos vindos da planilha)
+    são convertidas para texto, e nulos em colunas object passam a ser None.
+    A mesma normalização é aplicada com ou sem snapshot, para que o resultado seja igual.
+    """
+    for col in df.columns:
+        if df[col].dtype != object:
+            continue
+        nulos = df[col].isna()
+        tipos = {type(valor) for valor in df[col][~nulos]}
+        if nulos.any():
+            df[col] = df[col].astype(object).where(~nulos, None)
+        if len(tipos) > 1:
+            # infer_objects devolve o mesmo dtype de texto que a leitura do Parquet
+            df[col] = df[col].map(str, na_action='ignore').infer_objects()
+    return df
+
+
+def _ler_metadados_parquet(caminho):
+    import pyarrow.parquet as pq
+
+    metadados = pq.read_schema(caminho).metadata or {}
+    return {
+        chave.decode(): valor.decode()
+        for chave, valor in metadados.items()
+        if chave.startswith(b'otc_')
+    }
+
+
+def snapshot_valido(caminho_planilha, caminho_parquet=None):
+    """Verifica se o snapshot corresponde à versão atual da planilha.
+
+    Tamanho diferente invalida o snapshot. Com mtime igual ele é aceito direto;
+    com mtime diferente (arquivo copiado ou salvo sem alterações) compara o hash e, se for o
+    mesmo conteúdo, passa a guardar o novo mtime no snapshot.
+    """
+    caminho_parquet = caminho_parquet or caminho_snapshot(caminho_planilha)
+    if not PARQUET_DISPONIVEL or not os.path.exists(caminho_parquet):
+        return False
+    try:
+        metadados = _ler_metadados_parquet(caminho_parquet)
+    except Exception:
+        return False
+
+    assinatura = assinatura_arquivo(caminho_planilha)
+    if metadados.get('otc_versao') != VERSAO_SNAPSHOT:
+        return False
+    if metadados.get('otc_tamanho') != assinatura['tamanho']:
+        return False
+    if metadados.get('otc_mtime_ns') == assinatura['mtime_ns']:
+        return True
+    if metadados.get('otc_sha256') != hash_arquivo(caminho_planilha):
+        return False
+    # Mesmo conteúdo: guarda o novo mtime para que as próximas leituras não recalculem o hash
+    try:
+        _atualizar_metadados_parquet(caminho_parquet, {'otc_mtime_ns': assinatura['mtime_ns']})
+    except Exception:
+        pass
+    return True
+
+
+def _gravar_parquet(df, caminho_parquet, metadados_extras):
+    """Grava o DataFrame em Parquet de forma atômica, com metadados próprios no esquema."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    tabela = pa.Table.from_pandas(df)
+    metadados = dict(tabela.schema.metadata or {})
+    metadados.update({chave.encode(): valor.encode() for chave, valor in metadados_extras.items()})
+    tabela = tabela.replace_schema_metadata(metadados)
+
+    _gravar_tabela_atomica(tabela, caminho_parquet)
+
+
+def _temporario_ao_lado(caminho):
+    """Cria um arquivo temporário exclusivo na pasta de `caminho` (o os.replace final fica
+    atômico), sem colidir com outra gravação simultânea do mesmo arquivo."""
+    descritor, temporario = tempfile.mkstemp(
+        prefix=f".{os.path.basename(caminho)}.", suffix='.tmp', dir=os.path.dirname(caminho) or None
+    )
+    os.close(descritor)
+    return temporario
+
+
+def _gravar_tabela_atomica(tabela, caminho_parquet):
+    """Grava a tabela em arquivo temporário e substitui o Parquet de uma vez."""
+    import pyarrow.parquet as pq
+
+    temporario = _temporario_ao_lado(caminho_parquet)
+    try:
+        pq.write_table(tabela, temporario)
+        os.replace(temporario, caminho_parquet)
+    except BaseException:
+        _remover(temporario)
+        raise
+
+
+def _atualizar_metadados_parquet(caminho_parquet, metadados_extras):
+    """Regrava o Parquet com os metadados próprios atualizados, mantendo os dados."""
+    import pyarrow.parquet as pq
+
+    tabela = pq.read_table(caminho_parquet)
+    metadados = dict(tabela.schema.metadata or {})
+    metadados.update({chave.encode(): valor.encode() for chave, valor in metadados_extras.items()})
+    _gravar_tabela_atomica(tabela.replace_schema_metadata(metadados), caminho_parquet)
+
+
+def gravar_snapshot(df, caminho_planilha, caminho_parquet=None):
+    """Grava o DataFrame processado em Parquet com a assinatura da planilha nos metadados."""
+    caminho_parquet = caminho_parquet or caminho_snapshot(caminho_planilha)
+    assinatura = assinatura_arquivo(caminho_planilha)
+    _gravar_parquet(df, caminho_parquet, {
+        'otc_versao': VERSAO_SNAPSHOT,
+        'otc_mtime_ns': assinatura['mtime_ns'],
+        'otc_tamanho': assinatura['tamanho'],
+        'otc_sha256': hash_arquivo(caminho_planilha),
+    })
+
+
+def carregar_planilha_com_snapshot(caminho_planilha, processar):
+    """Carrega a planilha já pós-processada, usando o snapshot Parquet quando válido.
+
+    `processar` recebe o DataFrame lido com `pd.read_excel` e devolve o DataFrame final.
+    Retorna uma tupla (DataFrame, veio_do_snapshot).
+    """
+    caminho_parquet = caminho_snapshot(caminho_planilha)
+    if snapshot_valido(caminho_planilha, caminho_parquet):
+        try:
+            return pd.read_parquet(caminho_parquet), True
+        except Exception:
+            pass
+
+    df = normalizar_para_parquet(processar(pd.read_excel(caminho_planilha)))
+
+    if PARQUET_DISPONIVEL:
+        try:
+            gravar_snapshot(df, caminho_planilha, caminho_parquet)
+        except Exception:
+            # Sem permissão de escrita ou tipo não suportado: segue sem snapshot
+            pass
+    return df, False
+
+
+# --- CACHE PERSISTENTE DAS RESPOSTAS DO TIMELINE ---
+
+def _data_consulta(data):
+    """Converte a data da consulta (DD/MM/AAAA) em date; None se o formato for inválido."""
+    try:
+        return datetime.strptime(str(data).strip().strip("'"), '%d/%m/%Y').date()
+    except ValueError:
+        return None
+
+
+def data_fechada(data, hoje=None):
+    """Indica se a data já passou: respostas de dias fechados são tratadas como imutáveis."""
+    dia = _data_consulta(data)
+    hoje = hoje or datetime.now().date()
+    return dia is not None and dia < hoje
+
+
+def _caminhos_timeline(fonte, data, diretorio=None):
+    diretorio = diretorio or os.getenv('TIMELINE_CACHE_DIR', DIRETORIO_CACHE_TIMELINE_PADRAO)
+    dia = _data_consulta(data)
+    base = os.path.join(diretorio, fonte, dia.isoformat())
+    return f"{base}.xml.gz", f"{base}.parquet"
+
+
+def _ttl_dia_atual_segundos():
+    return float(os.getenv('TIMELINE_CACHE_TTL_MINUTOS', TTL_DIA_ATUAL_MINUTOS_PADRAO)) * 60
+
+
+def ler_timeline_em_cache(fonte, data, processar=None, diretorio=None, ttl_segundos=None, hoje=None):
+    """Busca no disco a resposta do timeline já consultada para (fonte, data).
+
+    Dias fechados nunca expiram; o dia atual (ou futuro) expira após o TTL configurado em
+    TIMELINE_CACHE_TTL_MINUTOS (`ttl_segundos=float('inf')` aceita qualquer idade). Usa o DataFrame processado em Parquet quando disponível e,
+    se ele estiver ausente ou for de outra versão, reprocessa o XML comprimido com `processar`.
+    Retorna None quando não há resposta válida em cache.
+    """
+    if _data_consulta(data) is None:
+        return None
+    caminho_xml, caminho_parquet = _caminhos_timeline(fonte, data, diretorio)
+    if not os.path.exists(caminho_xml):
+        return None
+
+    if not data_fechada(data, hoje):
+        ttl_segundos = _ttl_dia_atual_segundos() if ttl_segundos is None else ttl_segundos
+        if time.time() - os.path.getmtime(caminho_xml) > ttl_segundos:
+            return None
+
+    if PARQUET_DISPONIVEL and os.path.exists(caminho_parquet):
+        try:
+            if _ler_metadados_parquet(caminho_parquet).get('otc_versao') == VERSAO_TIMELINE:
+                return pd.read_parquet(caminho_parquet)
+        except Exception:
+            pass
+
+    if processar is None:
+        return None
+    try:
+        with gzip.open(caminho_xml, 'rb') as arquivo:
+            df = processar(arquivo)
+    except (OSError, EOFError):
+        return None
+    if df.empty:
+        return None
+    _gravar_frame_timeline(df, caminho_parquet)
+    return df
+
+
+def momento_timeline_em_cache(fonte, data, diretorio=None):
+    """Data/hora em que a resposta guardada de (fonte, data) foi obtida; None se não houver."""
+    if _data_consulta(data) is None:
+        return None
+    caminho_xml, _ = _caminhos_timeline(fonte, data, diretorio)
+    try:
+        return datetime.fromtimestamp(os.path.getmtime(caminho_xml))
+    except OSError:
+        return None
+
+
+def _gravar_frame_timeline(df, caminho_parquet):
+    if not PARQUET_DISPONIVEL:
+        return
+    try:
+        _gravar_parquet(df, caminho_parquet, {'otc_versao': VERSAO_TIMELINE})
+    except Exception:
+        # Tipo não suportado ou sem permissão de escrita: fica apenas o XML comprimido
+        pass
+
+
+def arquivo_download_timeline(fonte, data, diretorio=None):
+    """Arquivo temporário no diretório do cache de (fonte, data) para a cópia em gzip feita
+    durante o download, depois movido para o cache por `gravar_timeline_em_cache`.
+
+    Cada chamada recebe um arquivo próprio (tentativas e consultas simultâneas não se misturam).
+    """
+    pasta = None
+    if _data_consulta(data) is not None:
+        pasta = os.path.dirname(_caminhos_timeline(fonte, data, diretorio)[0])
+        try:
+            os.makedirs(pasta, exist_ok=True)
+        except OSError:
+            pasta = None
+    descritor, caminho = tempfile.mkstemp(suffix='.xml.gz.download', dir=pasta)
+    os.close(descritor)
+    return caminho
+
+
+def gravar_timeline_em_cache(fonte, data, conteudo_xml, df, diretorio=None, comprimido=False, arquivo_gzip=None):
+    """Grava a resposta bruta (XML com gzip) e o DataFrame processado de (fonte, data).
+
+    Com `comprimido=True`, `conteudo_xml` já está em gzip e é gravado como está. Com
+    `arquivo_gzip` (ver `arquivo_download_timeline`), a resposta já comprimida em disco é
+    movida para o cache no lugar de `conteudo_xml`; o arquivo nunca fica para trás.
+    """
+    if _data_consulta(data) is None or df.empty:
+        if arquivo_gzip is not None:
+            _remover(arquivo_gzip)
+        return
+    caminho_xml, caminho_parquet = _caminhos_timeline(fonte, data, diretorio)
+    try:
+        os.makedirs(os.path.dirname(caminho_xml), exist_ok=True)
+        # O DataFrame anterior deixa de corresponder ao novo XML
+        if os.path.exists(caminho_parquet):
+            os.remove(caminho_parquet)
+        if arquivo_gzip is None:
+            arquivo_gzip = _temporario_ao_lado(caminho_xml)
+            if comprimido:
+                with open(arquivo_gzip, 'wb') as arquivo:
+                    arquivo.write(conteudo_xml)
+            else:
+                with gzip.open(arquivo_gzip, 'wb') as arquivo:
+                    arquivo.write(conteudo_xml)
+        os.replace(arquivo_gzip, caminho_xml)
+    except OSError:
+        if arquivo_gzip is not None:
+            _remover(arquivo_gzip)
+        return
+    _gravar_frame_timeline(df, caminho_parquet)
+
+
+def _remover(caminho):
+    try:
+        os.remove(caminho)
+    except OSError:
+        pass
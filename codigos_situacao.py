@@ -0,0 +1,177 @@
+import numpy as np
+import pandas as pd
+
+# Tabelas de códigos das colunas de situação do timeline. Cada coluna é decodificada uma vez,
+# na leitura (senior.processar_timeline), em uma categoria com as descrições do mapeamento; a
+# conversão percorre apenas os valores distintos da coluna, e não cada linha.
+
+# Mapeamentos dos códigos de situação do Sapiens
+mapeamento_situacao_pedido = {
+    1: 'Aberto Total',
+    2: 'Aberto Parcial',
+    3: 'Suspenso',
+    4: 'Liquidado',
+    5: 'Cancelado',
+    6: 'Aguardando Integração WMS',
+    7: 'Em Transmissão',
+    8: 'Preparação Análise ou NF',
+    9: 'Fechado'
+}
+
+mapeamento_situacao_pfa = {
+    '1': 'Em Analise Credito',
+    '2': 'Em Preparação',
+    '3': 'Para Faturar',
+    '4': 'Faturada',
+    '5': 'Em Conferencia',
+    '6': 'Aguardando Integração WMS',
+    '8': 'Sem Estoque',
+    '9': 'Cancelada'
+}
+
+mapeamento_situacao_carga = {
+    'A': 'Aberto',
+    'F': 'Fechado'
+}
+
+mapeamento_situacao_nfv = {
+    '1': 'Digitada',
+    '2': 'Fechada',
+    '3': 'Cancelada',
+    '4': 'Documento Fiscal Emitido (Saida)',
+    '5': 'Aguardando Fechamento (Pos Saida)',
+    '6': 'Aguardando Integração WMS',
+    '7': 'Digitada Integração',
+    '8': 'Agrupada'
+}
+
+mapeamento_situacao_tcr = {
+    'AO': 'Aberto ao Órgão de Proteção ao Crédito',
+    'AN': 'Aberto Negociação',
+    'AA': 'Aberto Advogado',
+    'AB': 'Aberto Normal',
+    'AC': 'Aberto Cartório',
+    'AE': 'Aberto Encontro de Contas',
+    'AI': 'Aberto Impostos',
+    'AJ': 'Aberto Retorno Jurídico',
+    'AP': 'Aberto Protestado',
+    'AR': 'Aberto Representante',
+    'AS': 'Aberto Suspenso',
+    'AV': 'Aberto Gestão de Pessoas',
+    'AX': 'Aberto Externo',
+    'CA': 'Cancelado',
+    'CE': 'Aberto CE (Preparação Cobrança Escritural)',
+    'CO': 'Aberto Cobrança',
+    'LQ': 'Liquidado Normal',
+    'LC': 'Liquidado Cartório',
+    'LI': 'Liquidado Impostos',
+    'LM': 'Liquidado Compensado',
+    'LO': 'Liquidado Cobrança',
+    'LP': 'Liquidado Protestado',
+    'LS': 'Liquidado Substituído',
+    'LV': 'Liquidado Gestão de Pessoas',
+    'LX': 'Liquidado Externo',
+    'PE': 'Aberto PE (Pagamento Eletrônico)'
+}
+
+# Colunas decodificadas: coluna de destino -> (coluna com o código, mapeamento)
+TABELAS_SITUACAO = {
+    'SITUACAO DO PEDIDO_DESCRICAO': ('SITUACAO DO PEDIDO', mapeamento_situacao_pedido),
+    'SITUACAO PFA': ('SITUACAO PFA', mapeamento_situacao_pfa),
+    'SITUACAO CARGA': ('SITUACAO CARGA', mapeamento_situacao_carga),
+    'SITUACAO NFV': ('SITUACAO NFV', mapeamento_situacao_nfv),
+    'SITUACAO TCR': ('SITUACAO DO TITULO', mapeamento_situacao_tcr),
+}
+
+# Descrição das linhas sem código, quando não devem ficar nulas
+ROTULOS_VAZIOS = {'SITUACAO DO PEDIDO_DESCRICAO': 'Status Desconhecido'}
+
+# Códigos fora do mapeamento viram a categoria "<ROTULO_DESCONHECIDO> (<código>)"
+ROTULO_DESCONHECIDO = 'Status Desconhecido'
+
+
+def _chaves(valores, mapeamento):
+    """Chave do mapeamento de cada valor distinto: inteiros (ex.: '4', '4.0') ou textos sem espaços"""
+    if all(isinstance(codigo, int) for codigo in mapeamento):
+        numeros = np.trunc(pd.to_numeric(pd.Series(valores, dtype=object), errors='coerce'))
+        return [int(numero) if pd.notna(numero) else None for numero in numeros]
+    return [str(valor).strip() for valor in valores]
+
+
+def _rotulo_desconhecido(valor, chave):
+    return f'{ROTULO_DESCONHECIDO} ({valor if chave is None else chave})'
+
+
+def decodificar(serie, mapeamento, rotulo_vazio=None):
+    """Descrições dos códigos de `serie` como categoria, na ordem do mapeamento.
+
+    Linhas sem código ficam com `rotulo_vazio` (nulas por padrão); códigos que não estão no
+    mapeamento ficam com "<ROTULO_DESCONHECIDO> (<código>)", contados em `codigos_desconhecidos`.
+    """
+    codigos, valores = pd.factorize(serie)
+    # Textos em branco contam como linhas sem código
+    valores = [valor if str(valor).strip() else None for valor in valores]
+    chaves = _chaves(valores, mapeamento)
+    descricoes = list(dict.fromkeys(mapeamento.values()))
+    if rotulo_vazio is not None and rotulo_vazio not in descricoes:
+        descricoes.append(rotulo_vazio)
+    desconhecidos = sorted({
+        _rotulo_desconhecido(valor, chave)
+        for valor, chave in zip(valores, chaves) if valor is not None and chave not in mapeamento
+    })
+    categorias = descricoes + desconhecidos
+    posicao = {categoria: i for i, categoria in enumerate(categorias)}
+    posicao_vazio = posicao[rotulo_vazio] if rotulo_vazio is not None else -1
+
+    # Posição de cada valor distinto na categoria; a última entrada atende as linhas nulas
+    tabela = [
+        posicao_vazio if valor is None
+        else posicao[mapeamento[chave]] if chave in mapeamento
+        else posicao[_rotulo_desconhecido(valor, chave)]
+        for valor, chave in zip(valores, chaves)
+    ]
+    tabela.append(posicao_vazio)
+    novos_codigos = np.asarray(tabela, dtype=np.int32)[codigos]
+    return pd.Series(
+        pd.Categorical.from_codes(novos_codigos, dtype=pd.CategoricalDtype(categorias)), index=serie.index, name=serie.name
+    )
+
+
+def decodificar_situacoes(df):
+    """Aplica as TABELAS_SITUACAO às colunas presentes em `df` (no próprio DataFrame)"""
+    for destino, (origem, mapeamento) in TABELAS_SITUACAO.items():
+        if origem in df.columns:
+            df[destino] = decodificar(df[origem], mapeamento, ROTULOS_VAZIOS.get(destino))
+    return df
+
+
+def codigos_desconhecidos(df):
+    """Códigos sem descrição nos mapeamentos: {coluna: {código: quantidade de linhas}}"""
+    prefixo = f'{ROTULO_DESCONHECIDO} ('
+    resultado = {}
+    for coluna in TABELAS_SITUACAO:
+        if coluna not in df.columns or not isinstance(df[coluna].dtype, pd.CategoricalDtype):
+            continue
+        categorias = df[coluna].cat.categories
+        codigos = df[coluna].cat.codes.to_numpy()
+        quantidades = np.bincount(codigos[codigos >= 0], minlength=len(categorias))
+        for categoria, quantidade in zip(categorias, quantidades):
+            if quantidade and isinstance(categoria, str) and categoria.startswith(prefixo):
+                resultado.setdefault(coluna, {})[categoria[len(prefixo):-1]] = int(quantidade)
+    return resultado
+
+
+def _categorias_conhecidas():
+    categorias = {}
+    for destino, (origem, mapeamento) in TABELAS_SITUACAO.items():
+        if origem != destino:
+            categorias[origem] = [str(codigo) for codigo in mapeamento]
+        categorias[destino] = list(mapeamento.values()) + [
+            rotulo for rotulo in [ROTULOS_VAZIOS.get(destino)] if rotulo is not None
+        ]
+    return categorias
+
+
+# Categorias conhecidas das colunas de situação (esquema_timeline.aplicar_esquema): códigos
+# brutos e descrições dos mapeamentos, para que todos os dias tenham o mesmo tipo
+categorias_situacao = _categorias_conhecidas()
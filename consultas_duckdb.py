@@ -0,0 +1,72 @@
+import os
+
+import pandas as pd
+
+try:
+    import duckdb
+    DUCKDB_DISPONIVEL = True
+except ImportError:
+    DUCKDB_DISPONIVEL = False
+
+# Etapas exibidas nos gráficos e o timestamp que marca cada uma como concluída
+ETAPAS = {
+    'Pedido': 'TIMESTAMP PEDIDO',
+    'Etapa 1 - Remessa': 'TIMESTAMP REMESSA',
+    'Etapa 2 - Item': 'TIMESTAMP ITEM',
+    'Etapa 3 - Título': 'TIMESTAMP TITULO',
+}
+
+# Coluna com a posição de cada pedido em df_trabalho, para reproduzir a ordem de `value_counts`
+COLUNA_ORDEM = '__ordem'
+
+
+def motor_duckdb_ativo():
+    """Indica se as agregações do período devem usar o DuckDB (MOTOR_CONSULTA=duckdb no .env)"""
+    return DUCKDB_DISPONIVEL and os.getenv('MOTOR_CONSULTA', 'pandas').strip().lower() == 'duckdb'
+
+
+def _coluna(nome):
+    return '"' + nome.replace('"', '""') + '"'
+
+
+def _consultar(sql, pedidos):
+    """Executa a consulta com o DataFrame `pedidos` registrado como a tabela `pedidos`"""
+    with duckdb.connect() as conexao:
+        conexao.register('pedidos', pedidos)
+        return conexao.execute(sql).df()
+
+
+def status_etapas_duckdb(df_trabalho):
+    """Pedidos concluídos e pendentes em cada etapa (colunas Etapa, Status, Quantidade).
+
+    Mesmo conteúdo de `etapas.contagem_status_etapas` para o gráfico "Status por Etapa",
+    calculado em SQL pelo DuckDB sobre os mesmos pedidos (df_trabalho) usados nos indicadores:
+    para cada etapa, os status em ordem decrescente de quantidade e, no empate, primeiro o
+    status do primeiro pedido, como em `value_counts`.
+    """
+    if not DUCKDB_DISPONIVEL:
+        raise RuntimeError("DuckDB não está instalado (pip install duckdb)")
+    if df_trabalho.empty:
+        return pd.DataFrame(columns=['Etapa', 'Status', 'Quantidade'])
+    colunas = [ts for ts in ETAPAS.values() if ts in df_trabalho.columns]
+    pedidos = df_trabalho[colunas].reset_index(drop=True)
+    pedidos[COLUNA_ORDEM] = range(len(pedidos))
+
+    # Uma única varredura: total de pedidos, timestamps preenchidos e status do primeiro pedido
+    selecao = []
+    for i, ts in enumerate(ETAPAS.values()):
+        valor = _coluna(ts) if ts in colunas else 'NULL'
+        selecao.append(
+            f"count({valor}) AS etapa_{i}, first({valor} IS NOT NULL ORDER BY {COLUNA_ORDEM}) AS primeiro_{i}"
+        )
+    contagens = _consultar(f"SELECT count(*) AS total, {', '.join(selecao)} FROM pedidos", pedidos).iloc[0]
+
+    linhas = []
+    for i, etapa in enumerate(ETAPAS):
+        concluidos = int(contagens[f"etapa_{i}"])
+        status = [('Concluído', concluidos), ('Pendente', int(contagens['total']) - concluidos)]
+        if concluidos and not contagens[f"primeiro_{i}"]:
+            status.reverse()
+        status.sort(key=lambda item: item[1], reverse=True)
+        linhas += [(etapa, nome, float(quantidade)) for nome, quantidade in status if quantidade]
+    return pd.DataFrame(linhas, columns=['Etapa', 'Status', 'Quantidade']).astype({'Etapa': object, 'Status': object})
@@ -4,6 +4,8 @@ import json
 import pandas as pd
 import numpy as np
 
+import transporte
+
 webservice_base_url = "http://atacama:8081/frescattows"
 api_version = "v1" 
 
@@ -43,7 +45,7 @@ try:
     auth_full_url = f"{webservice_base_url}/{authentication_url}"
     print(f"URL de autenticação: {auth_full_url}")
 
-    response_auth = requests.post(auth_full_url, data=payload_auth, headers=headers_auth)
+    response_auth = transporte.post(auth_full_url, data=payload_auth, headers=headers_auth)
     response_auth.raise_for_status() 
 
     auth_data = response_auth.json()
@@ -80,7 +82,7 @@ try:
     }
     #print(f"URL de busca de produto: {fetch_product_url}")
 
-    response_fetch_product = requests.post(
+    response_fetch_product = transporte.post(
         fetch_product_url,
         json=json_fetch_product,
         headers=headers_with_token
@@ -0,0 +1,99 @@
+import hashlib
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+# Quantidade de resultados mantidos em memória (DERIVACOES_MAXIMO no .env).
+# Ao passar do limite, o resultado usado há mais tempo é descartado
+MAXIMO_PADRAO = 64
+
+# Memória total dos resultados guardados, em MB (DERIVACOES_MAXIMO_MB no .env). Os resultados
+# incluem recortes de linhas da tabela de fatos, então o limite por quantidade não basta
+MAXIMO_MB_PADRAO = 256
+
+
+def tamanho_em_bytes(valor):
+    """Memória aproximada de um resultado: DataFrames e Series com o conteúdo dos textos,
+    dicionários, listas e tuplas somando os itens"""
+    if isinstance(valor, pd.DataFrame):
+        return int(valor.memory_usage(deep=True).sum())
+    if isinstance(valor, (pd.Series, pd.Index)):
+        return int(valor.memory_usage(deep=True))
+    if isinstance(valor, dict):
+        return sys.getsizeof(valor) + sum(tamanho_em_bytes(item) for item in valor.values())
+    if isinstance(valor, (list, tuple)):
+        return sys.getsizeof(valor) + sum(tamanho_em_bytes(item) for item in valor)
+    if hasattr(valor, 'nbytes'):
+        return int(valor.nbytes)
+    return sys.getsizeof(valor)
+
+
+def impressao_digital(df):
+    """Identificador do conteúdo do DataFrame (valores, índice e nomes das colunas).
+
+    Calculado uma vez por consulta; DataFrames com o mesmo conteúdo têm a mesma impressão.
+    """
+    sha = hashlib.sha256(repr(list(df.columns)).encode())
+    sha.update(pd.util.hash_pandas_object(df, index=True).values.tobytes())
+    return sha.hexdigest()
+
+
+class CacheDerivacoes:
+    """Guarda os cálculos de cada visão por (impressão dos dados, filiais, etapa), com descarte LRU.
+
+    O descarte acontece ao passar da quantidade máxima de resultados ou da memória máxima.
+
+    Alternar entre etapas e combinações de filiais já vistas devolve o resultado guardado em vez
+    de recalcular. Os valores guardados são compartilhados entre as sessões e não devem ser alterados.
+    """
+
+    def __init__(self, maximo=None, maximo_bytes=None):
+        if maximo is None:
+            maximo = int(os.getenv('DERIVACOES_MAXIMO', MAXIMO_PADRAO))
+        if maximo_bytes is None:
+            maximo_bytes = float(os.getenv('DERIVACOES_MAXIMO_MB', MAXIMO_MB_PADRAO)) * 1024 * 1024
+        self.maximo = max(int(maximo), 1)
+        self.maximo_bytes = max(int(maximo_bytes), 0)
+        self._trava = threading.Lock()
+        # chave -> (valor, bytes)
+        self._itens = OrderedDict()
+        self.bytes = 0
+
+    @staticmethod
+    def chave(impressao, filiais, etapa):
+        """Chave de um cálculo: a ordem de seleção das filiais não altera o resultado"""
+        return impressao, tuple(sorted(str(filial) for filial in filiais)), etapa
+
+    def obter(self, chave, calcular):
+        """Resultado guardado para `chave` ou, se ausente, o valor de `calcular()`, que passa a ser guardado"""
+        with self._trava:
+            if chave in self._itens:
+                self._itens.move_to_end(chave)
+                return self._itens[chave][0]
+
+        # Cálculo fora da trava: outras sessões não esperam por ele
+        valor = calcular()
+        tamanho = tamanho_em_bytes(valor)
+        if tamanho > self.maximo_bytes:
+            # Maior que o cache inteiro: devolvido sem guardar
+            return valor
+        with self._trava:
+            if chave in self._itens:
+                self.bytes -= self._itens.pop(chave)[1]
+            self._itens[chave] = (valor, tamanho)
+            self.bytes += tamanho
+            while len(self._itens) > self.maximo or self.bytes > self.maximo_bytes:
+                self.bytes -= self._itens.popitem(last=False)[1][1]
+        return valor
+
+    def limpar(self):
+        with self._trava:
+            self._itens.clear()
+            self.bytes = 0
+
+    def __len__(self):
+        with self._trava:
+            return len(self._itens)
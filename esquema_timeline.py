@@ -0,0 +1,104 @@
+import pandas as pd
+
+# Tipos aplicados ao DataFrame do timeline logo após a leitura do XML (senior.processar_timeline).
+# Os textos repetidos viram categorias, os números inteiros ficam com tipo inteiro que aceita
+# nulos, os indicadores S/N viram booleanos e as colunas TIMESTAMP ficam em datetime64.
+
+# Identificadores numéricos: convertidos apenas se todos os valores forem inteiros sem zeros
+# à esquerda, para que o texto original possa ser reconstruído
+COLUNAS_INTEIRAS = ['FILIAL', 'PEDIDO', 'N° NOTA FISCAL']
+
+# Códigos e situações com poucos valores distintos
+COLUNAS_CATEGORICAS = [
+    'SITUACAO DO PEDIDO', 'SITUACAO DO PEDIDO_DESCRICAO', 'SITUACAO PFA', 'SITUACAO FAT', 'SITUACAO CARGA',
+    'SITUACAO NFV', 'SITUACAO DO TITULO', 'SITUACAO TCR',
+]
+
+# Indicadores de bloqueio (S/N)
+COLUNAS_BOOLEANAS = {'PEDIDO BLOQUEADO': {'S': True, 'N': False}, 'NFV BLOQUEIO': {'S': True, 'N': False}}
+
+_INTEIRO = r'0|-?[1-9][0-9]*'
+
+
+def _inteiros(serie):
+    if isinstance(serie.dtype, pd.Int64Dtype):
+        return serie
+    texto = serie.astype('string')
+    valores = texto.dropna()
+    if not valores.str.fullmatch(_INTEIRO).all():
+        return serie
+    try:
+        return pd.to_numeric(texto).astype('Int64')
+    except (ValueError, OverflowError):
+        return serie
+
+
+def _categoria(serie, categorias=None):
+    """Categoria com as `categorias` conhecidas (se houver) mais os valores encontrados na coluna"""
+    valores = serie.dropna().unique()
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        valores = valores.astype(object)
+    conhecidas = list(dict.fromkeys(categorias or []))
+    extras = sorted(set(valores) - set(conhecidas), key=str)
+    return serie.astype(pd.CategoricalDtype(conhecidas + extras))
+
+
+def _booleano(serie, valores):
+    if isinstance(serie.dtype, pd.BooleanDtype):
+        return serie
+    if not serie.dropna().isin(list(valores)).all():
+        return serie
+    return serie.map(valores).astype('boolean')
+
+
+def aplicar_esquema(df, categorias=None):
+    """Aplica os tipos compactos às colunas do timeline presentes em `df` (no próprio DataFrame).
+
+    `categorias` informa, por coluna, as categorias conhecidas de antemão (ex.: as descrições
+    dos mapeamentos de situação), para que dias diferentes tenham o mesmo tipo. Pode ser
+    aplicado de novo sobre um DataFrame já tipado ou sobre a concatenação de vários dias.
+    """
+    categorias = categorias or {}
+    for col in COLUNAS_INTEIRAS:
+        if col in df.columns:
+            df[col] = _inteiros(df[col])
+    for col in COLUNAS_CATEGORICAS:
+        if col in df.columns:
+            df[col] = _categoria(df[col], categorias.get(col))
+    for col, valores in COLUNAS_BOOLEANAS.items():
+        if col in df.columns:
+            df[col] = _booleano(df[col], valores)
+    for col in df.columns:
+        if col.startswith('TIMESTAMP') and not pd.api.types.is_datetime64_any_dtype(df[col]):
+            df[col] = pd.to_datetime(df[col], errors='coerce')
+    return df
+
+
+def relatorio_memoria(antes, depois):
+    """Memória por coluna (bytes, incluindo o conteúdo dos textos) antes e depois da tipagem"""
+    bytes_antes = antes.memory_usage(deep=True, index=False)
+    bytes_depois = depois.memory_usage(deep=True, index=False)
+    relatorio = pd.DataFrame({
+        'tipo_antes': antes.dtypes.astype(str),
+        'tipo_depois': depois.dtypes.reindex(antes.columns).astype(str),
+        'bytes_antes': bytes_antes,
+        'bytes_depois': bytes_depois.reindex(antes.columns),
+    })
+    relatorio.loc['TOTAL'] = ['', '', bytes_antes.sum(), bytes_depois.sum()]
+    relatorio['reducao_%'] = (100 * (1 - relatorio['bytes_depois'] / relatorio['bytes_antes'])).round(1)
+    return relatorio
+
+
+if __name__ == "__main__":
+    # Relatório de memória de um retorno salvo: python esquema_timeline.py [response.xml]
+    import sys
+
+    from senior import processar_timeline
+    from timeline_xml import ler_timeline_xml
+
+    with open(sys.argv[1] if len(sys.argv) > 1 else 'response.xml', 'rb') as arquivo:
+        bruto = ler_timeline_xml(arquivo)
+    sem_esquema = processar_timeline(bruto.copy(), tipar=False)
+    tipado = processar_timeline(bruto)
+    with pd.option_context('display.max_rows', None, 'display.max_columns', None, 'display.width', 200):
+        print(relatorio_memoria(sem_esquema, tipado))
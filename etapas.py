@@ -0,0 +1,515 @@
+import numpy as np
+import pandas as pd
+
+from fatos_pedidos import TIPO_STATUS
+from mascara_etapas import BITS_ETAPAS, contar_etapas, etapa_concluida, fora_de_ordem, mascaras_de
+
+# Cálculos de cada visão do dashboard a partir dos pedidos das filiais selecionadas
+# (df_trabalho). Cada função devolve um dicionário com os indicadores e os DataFrames usados
+# nos gráficos, sem chamadas ao Streamlit, para que o resultado possa ser reaproveitado
+# (ver derivacoes.CacheDerivacoes). Os DataFrames devolvidos não devem ser alterados.
+
+COLUNAS_VISAO_GERAL = [
+    'FILIAL', 'PEDIDO', 'TIMESTAMP PEDIDO', 'STATUS PEDIDO',
+    'TIMESTAMP REMESSA', 'STATUS REMESSA',
+    'TIMESTAMP ITEM', 'STATUS ITEM',
+    'TIMESTAMP TITULO', 'STATUS TITULO'
+]
+
+# Etapas da Visão Geral: rótulo -> coluna de status
+ETAPAS_VISAO_GERAL = {
+    'Pedido': 'STATUS PEDIDO',
+    'Etapa 1 - Remessa': 'STATUS REMESSA',
+    'Etapa 2 - Item': 'STATUS ITEM',
+    'Etapa 3 - Título': 'STATUS TITULO',
+}
+
+# Etapa 1: pedidos pendentes, na ordem em que são verificados na classificação de tempo
+PENDENCIAS_ETAPA1 = {
+    'TIMESTAMP PEDIDO': 'Pendente - Pedido não Criado',
+    'TIMESTAMP REMESSA': 'Pendente - Remessa não Associada',
+}
+
+
+def classificar_tempo(condicoes, padrao, indice):
+    """Classificação de tempo vetorizada, compartilhada pelas etapas.
+
+    `condicoes` é uma lista de (máscara, rótulo) avaliada em ordem, como uma cadeia de
+    if/elif: cada linha recebe o rótulo da primeira máscara verdadeira ou `padrao`.
+    """
+    mascaras = [np.asarray(mascara, dtype=bool) for mascara, _ in condicoes]
+    rotulos = [rotulo for _, rotulo in condicoes]
+    return pd.Series(np.select(mascaras, rotulos, default=padrao), index=indice).astype(object)
+
+
+def condicoes_pendencia(df, rotulos_timestamps):
+    """Condições de etapa pendente: timestamp ausente -> rótulo, na ordem de `rotulos_timestamps`"""
+    return [(df[coluna].isna(), rotulo) for coluna, rotulo in rotulos_timestamps.items()]
+
+
+def contagem_status_etapas(df_trabalho, etapas=None):
+    """Concluídos e pendentes de cada etapa ({rótulo: coluna de status}) no formato do gráfico
+    "Status por Etapa" (Etapa, Status, Quantidade).
+
+    As contagens saem das máscaras de etapas (mascara_etapas.contar_etapas). Em cada etapa, o
+    status mais frequente vem primeiro; no empate, o que aparece primeiro nos pedidos, como em
+    `value_counts`. Status sem pedidos ficam de fora.
+    Retorna (DataFrame, concluídos por etapa, total de pedidos).
+    """
+    etapas = etapas or ETAPAS_VISAO_GERAL
+    mascaras = mascaras_de(df_trabalho)
+    concluidos, totais = contar_etapas(mascaras)
+    concluidos = concluidos[0, [BITS_ETAPAS[coluna] for coluna in etapas.values()]]
+    total = int(totais[0])
+    pendentes = total - concluidos
+
+    linhas = []
+    for etapa, coluna, concluidos_etapa, pendentes_etapa in zip(etapas, etapas.values(), concluidos, pendentes):
+        ordem = [('Concluído', concluidos_etapa), ('Pendente', pendentes_etapa)]
+        if concluidos_etapa < pendentes_etapa or (
+            concluidos_etapa == pendentes_etapa and not etapa_concluida(mascaras[:1], coluna).all()
+        ):
+            ordem.reverse()
+        linhas.extend((etapa, status, float(quantidade)) for status, quantidade in ordem if quantidade > 0)
+    status_df = pd.DataFrame(linhas, columns=['Etapa', 'Status', 'Quantidade']).astype({'Etapa': object, 'Status': object})
+    return status_df, concluidos, total
+
+
+def contagem_status_por_filial(df_trabalho, coluna_status):
+    """Pedidos por FILIAL e status (Concluído/Pendente) de uma etapa, no formato de
+    `groupby(['FILIAL', coluna_status]).size()`: filiais em ordem crescente, sem contagens zero.
+    """
+    codigos, filiais = pd.factorize(df_trabalho['FILIAL'], sort=True)
+    validos = codigos >= 0
+    concluidos, totais = contar_etapas(mascaras_de(df_trabalho)[validos], codigos[validos], len(filiais))
+    concluidos = concluidos[:, BITS_ETAPAS[coluna_status]]
+    quantidades = np.column_stack([concluidos, totais - concluidos])
+    linha, coluna = np.nonzero(quantidades)
+    return pd.DataFrame({
+        'FILIAL': filiais.take(linha),
+        coluna_status: pd.Categorical.from_codes(coluna, dtype=TIPO_STATUS),
+        'Quantidade': quantidades[linha, coluna],
+    })
+
+
+def contar_valores(serie):
+    """`value_counts` que também atende colunas categóricas com o resultado das colunas de texto.
+
+    Nas categóricas, as categorias sem ocorrências ficam de fora e os empates seguem a ordem
+    de primeira aparição, como no `value_counts` de texto; a contagem usa os códigos inteiros.
+    """
+    if not isinstance(serie.dtype, pd.CategoricalDtype):
+        return serie.value_counts()
+    codigos = serie.cat.codes.to_numpy()
+    codigos = codigos[codigos >= 0]
+    contagens = np.bincount(codigos, minlength=len(serie.cat.categories))
+    vistos = pd.unique(codigos)
+    vistos = vistos[np.argsort(-contagens[vistos], kind='stable')]
+    indice = pd.Index(serie.cat.categories[vistos].astype(object), name=serie.name)
+    return pd.Series(contagens[vistos], index=indice, name='count')
+
+
+def indicadores_status(df_trabalho, coluna_status):
+    """Total de registros, concluídos, pendentes, dados insuficientes e % concluídos de uma etapa"""
+    total_registros = len(df_trabalho)
+    concluidos = contar_etapas(mascaras_de(df_trabalho))[0][0, BITS_ETAPAS[coluna_status]]
+    pendentes = total_registros - concluidos
+    return {
+        'total_registros': total_registros,
+        'concluidos': concluidos,
+        'pendentes': pendentes,
+        'dados_insuficientes': total_registros - concluidos - pendentes,
+        'percentual_concluidos': (concluidos / total_registros * 100) if total_registros > 0 else 0,
+    }
+
+
+def derivar_visao_geral(df_trabalho):
+    """Indicadores gerais, tabela de dados processados, status por etapa e funil"""
+    # Uma contagem alimenta o gráfico de status, o funil e os indicadores
+    status_df, concluidos, total_registros = contagem_status_etapas(df_trabalho, ETAPAS_VISAO_GERAL)
+    total_pedidos, concluidos_remessa, concluidos_item, concluidos_titulo = concluidos
+    percentual_conclusao_completa = (concluidos_titulo / total_registros * 100) if total_registros > 0 else 0
+
+    funil_data = {
+        'Etapa': list(ETAPAS_VISAO_GERAL),
+        'Concluídos': concluidos,
+    }
+
+    return {
+        'total_registros': total_registros,
+        'total_pedidos': total_pedidos,
+        'concluidos_remessa': concluidos_remessa,
+        'concluidos_item': concluidos_item,
+        'concluidos_titulo': concluidos_titulo,
+        'pendentes_geral': total_registros - concluidos_titulo,
+        'percentual_conclusao_completa': percentual_conclusao_completa,
+        'pedidos_fora_de_ordem': int(fora_de_ordem(mascaras_de(df_trabalho)).sum()),
+        'dados_processados': df_trabalho[COLUNAS_VISAO_GERAL],
+        'status_df': status_df,
+        'funil_df': pd.DataFrame(funil_data),
+    }
+
+
+def derivar_etapa1(df_trabalho):
+    """Classificação de tempo pedido -> remessa, status por filial, situação e bloqueios"""
+    # A duração entre pedido e remessa (DURACAO_PEDIDO_REMESSA_HORAS) e a média de referência
+    # (DURACAO_PEDIDO_REMESSA_HORAS_MEDIA_MOVEL) vêm da tabela de fatos
+
+    # Agrupamento para pedidos únicos
+    agregacoes = {
+        'TIMESTAMP PEDIDO': 'first',
+        'TIMESTAMP REMESSA': 'first',
+        'DURACAO_PEDIDO_REMESSA_HORAS': 'first',
+        'DURACAO_PEDIDO_REMESSA_HORAS_MEDIA_MOVEL': 'first',
+        'STATUS PEDIDO': 'first',
+        'STATUS REMESSA': 'first',
+        'SITUACAO DO PEDIDO': 'first',
+        'SITUACAO DO PEDIDO_DESCRICAO': 'first',
+        'PEDIDO BLOQUEADO': 'first',
+        'USUARIO BLOQ PEDIDO': 'first',
+        'DATA DO BLOQUEIO': 'first',
+        'OBSERVACAO DO PEDIDO': 'first'
+    }
+
+    # Filtrar colunas que existem no DataFrame
+    agregacoes_existentes = {k: v for k, v in agregacoes.items() if k in df_trabalho.columns}
+    df_pedidos_unicos = df_trabalho.groupby(['FILIAL', 'PEDIDO']).agg(agregacoes_existentes).reset_index()
+
+    # Tratamento aprimorado dos dados insuficientes
+    if 'DURACAO_PEDIDO_REMESSA_HORAS_MEDIA_MOVEL' in df_pedidos_unicos.columns:
+        # Primeiro, filtrar apenas registros com timestamps válidos
+        df_com_timestamps = df_pedidos_unicos[
+            df_pedidos_unicos['TIMESTAMP PEDIDO'].notna() &
+            df_pedidos_unicos['TIMESTAMP REMESSA'].notna()
+        ].copy()
+
+        # Calcular média móvel apenas para dados válidos
+        if not df_com_timestamps.empty:
+            # Recalcular duração para dados válidos
+            df_com_timestamps['DURACAO_PEDIDO_REMESSA_HORAS_VALIDA'] = (
+                df_com_timestamps['TIMESTAMP REMESSA'] - df_com_timestamps['TIMESTAMP PEDIDO']
+            ).dt.total_seconds() / 3600
+
+            # Filtrar durações positivas (remover valores negativos ou zero)
+            df_com_timestamps = df_com_timestamps[
+                df_com_timestamps['DURACAO_PEDIDO_REMESSA_HORAS_VALIDA'] > 0
+            ]
+
+            if not df_com_timestamps.empty:
+                # Média móvel da filial, na ordem de criação dos pedidos (tabela de fatos)
+                df_com_timestamps['MEDIA_MOVEL_DURACAO_HORAS_VALIDA'] = (
+                    df_com_timestamps['DURACAO_PEDIDO_REMESSA_HORAS_MEDIA_MOVEL']
+                )
+
+                # Calcular média geral para preenchimento
+                media_geral_duracao = df_com_timestamps['DURACAO_PEDIDO_REMESSA_HORAS_VALIDA'].mean()
+                media_geral_movel = df_com_timestamps['MEDIA_MOVEL_DURACAO_HORAS_VALIDA'].mean()
+
+                # Aplicar de volta ao DataFrame principal
+                df_pedidos_unicos = df_pedidos_unicos.merge(
+                    df_com_timestamps[['FILIAL', 'PEDIDO', 'DURACAO_PEDIDO_REMESSA_HORAS_VALIDA', 'MEDIA_MOVEL_DURACAO_HORAS_VALIDA']],
+                    on=['FILIAL', 'PEDIDO'],
+                    how='left'
+                )
+
+                # Preencher valores nulos com a média geral
+                df_pedidos_unicos['MEDIA_MOVEL_DURACAO_HORAS_FILLNA'] = (
+                    df_pedidos_unicos['MEDIA_MOVEL_DURACAO_HORAS_VALIDA']
+                    .fillna(media_geral_movel)
+                )
+
+                df_pedidos_unicos['DURACAO_PEDIDO_REMESSA_HORAS_FILLNA'] = (
+                    df_pedidos_unicos['DURACAO_PEDIDO_REMESSA_HORAS_VALIDA']
+                    .fillna(media_geral_duracao)
+                )
+
+                # Pendências primeiro, depois duração e média móvel disponíveis
+                duracao = df_pedidos_unicos['DURACAO_PEDIDO_REMESSA_HORAS_VALIDA']
+                media_movel = df_pedidos_unicos['MEDIA_MOVEL_DURACAO_HORAS_FILLNA']
+                df_pedidos_unicos['CLASSIFICACAO_TEMPO'] = classificar_tempo(
+                    condicoes_pendencia(df_pedidos_unicos, PENDENCIAS_ETAPA1) + [
+                        (duracao.isna() | (duracao <= 0), 'Dados Insuficientes - Duração Inválida'),
+                        (media_movel.isna(), 'Dados Insuficientes - Média Indisponível'),
+                        (duracao <= media_movel, 'Dentro da Média'),
+                    ],
+                    'Fora da Média',
+                    df_pedidos_unicos.index
+                )
+
+                # Adicionar estatísticas de qualidade dos dados
+                total_registros = len(df_pedidos_unicos)
+                registros_validos = len(df_com_timestamps)
+                percentual_dados_validos = (registros_validos / total_registros * 100) if total_registros > 0 else 0
+
+                # Armazenar estatísticas para exibição
+                df_pedidos_unicos['PERCENTUAL_DADOS_VALIDOS'] = percentual_dados_validos
+                df_pedidos_unicos['TOTAL_REGISTROS'] = total_registros
+                df_pedidos_unicos['REGISTROS_VALIDOS'] = registros_validos
+            else:
+                # Se não há dados válidos, apenas as pendências são identificadas
+                df_pedidos_unicos['CLASSIFICACAO_TEMPO'] = classificar_tempo(
+                    condicoes_pendencia(df_pedidos_unicos, PENDENCIAS_ETAPA1),
+                    'Dados Insuficientes - Sem Dados Válidos',
+                    df_pedidos_unicos.index
+                )
+                df_pedidos_unicos['MEDIA_MOVEL_DURACAO_HORAS_FILLNA'] = 0
+        else:
+            # Se não há dados com timestamps, apenas as pendências são identificadas
+            df_pedidos_unicos['CLASSIFICACAO_TEMPO'] = classificar_tempo(
+                condicoes_pendencia(df_pedidos_unicos, PENDENCIAS_ETAPA1),
+                'Dados Insuficientes - Timestamps Ausentes',
+                df_pedidos_unicos.index
+            )
+            df_pedidos_unicos['MEDIA_MOVEL_DURACAO_HORAS_FILLNA'] = 0
+
+    # A descrição da situação do pedido (SITUACAO DO PEDIDO_DESCRICAO) vem da tabela de fatos
+
+    # Preparar dados para observações de pedidos bloqueados
+    top_observacoes_bloqueados = None
+    if 'PEDIDO BLOQUEADO' in df_pedidos_unicos.columns and 'OBSERVACAO DO PEDIDO' in df_pedidos_unicos.columns:
+        pedidos_bloqueados_obs = df_pedidos_unicos[
+            df_pedidos_unicos['PEDIDO BLOQUEADO'].astype(str).str.strip() != ''
+        ].copy()
+
+        if not pedidos_bloqueados_obs.empty:
+            observacoes_bloqueados_validas = pedidos_bloqueados_obs[
+                pedidos_bloqueados_obs['OBSERVACAO DO PEDIDO'].astype(str).str.strip() != ''
+            ]
+
+            if not observacoes_bloqueados_validas.empty:
+                top_observacoes_bloqueados = observacoes_bloqueados_validas['OBSERVACAO DO PEDIDO'].value_counts().head(10).reset_index()
+                top_observacoes_bloqueados.columns = ['Observação do Pedido (Bloqueado)', 'Quantidade']
+
+    # Usar dados já filtrados pela sidebar
+    df_filtrado = df_pedidos_unicos
+
+    resultado = {
+        'pedidos': df_filtrado,
+        # Usar df_trabalho como base para manter consistência com outras etapas
+        'indicadores': indicadores_status(df_trabalho, 'STATUS REMESSA'),
+        'contagem_classificacao_tempo': None,
+        'media_filtrada': None,
+        'contagem_por_status_e_filial': None,
+        'quantidade_situacao': None,
+        'top_observacoes_bloqueados': top_observacoes_bloqueados,
+    }
+
+    if 'CLASSIFICACAO_TEMPO' in df_filtrado.columns:
+        # Filtrar apenas 'Dentro da Média' e 'Fora da Média'
+        df_tempo_filtrado = df_filtrado[df_filtrado['CLASSIFICACAO_TEMPO'].isin(['Dentro da Média', 'Fora da Média'])]
+        contagem_classificacao_tempo = df_tempo_filtrado['CLASSIFICACAO_TEMPO'].value_counts().reset_index()
+        contagem_classificacao_tempo.columns = ['Classificação', 'Quantidade de Pedidos']
+        resultado['contagem_classificacao_tempo'] = contagem_classificacao_tempo
+
+        if 'MEDIA_MOVEL_DURACAO_HORAS_FILLNA' in df_filtrado.columns:
+            resultado['media_filtrada'] = df_filtrado['MEDIA_MOVEL_DURACAO_HORAS_FILLNA'].mean()
+
+        # Proporção por STATUS REMESSA (apenas Concluído/Pendente)
+        if 'STATUS REMESSA' in df_filtrado.columns:
+            resultado['contagem_por_status_e_filial'] = contagem_status_por_filial(df_trabalho, 'STATUS REMESSA')
+
+    # Situação do pedido
+    if 'SITUACAO DO PEDIDO_DESCRICAO' in df_filtrado.columns:
+        quantidade_situacao = contar_valores(df_filtrado['SITUACAO DO PEDIDO_DESCRICAO']).reset_index()
+        quantidade_situacao.columns = ['Situação do Pedido', 'Quantidade']
+        resultado['quantidade_situacao'] = quantidade_situacao
+
+    return resultado
+
+
+def derivar_etapa2(df_trabalho):
+    """Classificação de tempo remessa -> item, status por filial, produtos, situações e bloqueios PFA"""
+    resultado = {
+        'pedidos': None,
+        'media_da_media_movel': None,
+        'indicadores': indicadores_status(df_trabalho, 'STATUS ITEM'),
+        'contagem_classificacao_tempo': None,
+        'contagem_por_status_e_filial': None,
+        'contagem_notas_por_quantidade_produtos': None,
+        'df_donut': None,
+        'df_pfa_counts': None,
+        'df_carga_counts': None,
+        'df_nfv_counts': None,
+        'bloqueios_por_data': None,
+    }
+
+    # Calcular duração e classificação de tempo
+    df_trabalho_etapa2 = df_trabalho[df_trabalho['TIMESTAMP REMESSA'].notna() & df_trabalho['TIMESTAMP ITEM'].notna()].copy()
+
+    if not df_trabalho_etapa2.empty:
+        # A duração entre remessa e item (DURACAO_REMESSA_ITEM_HORAS) vem da tabela de fatos
+
+        # Média móvel da filial, na ordem de associação das remessas (tabela de fatos)
+        df_trabalho_etapa2['MEDIA_MOVEL_DURACAO_HORAS'] = df_trabalho_etapa2['DURACAO_REMESSA_ITEM_HORAS_MEDIA_MOVEL']
+
+        # Agrupar por pedidos únicos
+        agregacoes = {
+            'TIMESTAMP REMESSA': 'first',
+            'TIMESTAMP ITEM': 'first',
+            'DURACAO_REMESSA_ITEM_HORAS': 'first',
+            'MEDIA_MOVEL_DURACAO_HORAS': 'first',
+            'STATUS ITEM': 'first'
+        }
+
+        # Adicionar colunas opcionais se existirem
+        if 'CODIGO PRODUTO' in df_trabalho_etapa2.columns:
+            agregacoes['CODIGO PRODUTO'] = lambda x: list(x.unique())
+        if 'N° NOTA FISCAL' in df_trabalho_etapa2.columns:
+            agregacoes['N° NOTA FISCAL'] = lambda x: list(x.unique())
+
+        df_pedidos_unicos = df_trabalho_etapa2.groupby(['FILIAL','PEDIDO']).agg(agregacoes).reset_index()
+        df_pedidos_unicos['MEDIA_MOVEL_DURACAO_HORAS_FILLNA'] = df_pedidos_unicos['MEDIA_MOVEL_DURACAO_HORAS'].fillna(df_pedidos_unicos['MEDIA_MOVEL_DURACAO_HORAS'].mean())
+
+        # Corrigir valores negativos
+        media_positiva_duracao = df_pedidos_unicos[df_pedidos_unicos['MEDIA_MOVEL_DURACAO_HORAS_FILLNA'] >= 0]['MEDIA_MOVEL_DURACAO_HORAS_FILLNA'].mean()
+        df_pedidos_unicos.loc[df_pedidos_unicos['MEDIA_MOVEL_DURACAO_HORAS_FILLNA'] < 0, 'MEDIA_MOVEL_DURACAO_HORAS_FILLNA'] = media_positiva_duracao
+        resultado['media_da_media_movel'] = df_pedidos_unicos['MEDIA_MOVEL_DURACAO_HORAS_FILLNA'].mean()
+
+        # Classificar tempo
+        duracao = df_pedidos_unicos['DURACAO_REMESSA_ITEM_HORAS']
+        media_movel = df_pedidos_unicos['MEDIA_MOVEL_DURACAO_HORAS_FILLNA']
+        df_pedidos_unicos['CLASSIFICACAO_TEMPO'] = classificar_tempo(
+            [
+                (duracao.isna() | media_movel.isna(), 'Dados Insuficientes'),
+                (duracao <= media_movel, 'Dentro da Média'),
+            ],
+            'Fora da Média',
+            df_pedidos_unicos.index
+        )
+        resultado['pedidos'] = df_pedidos_unicos
+
+        contagem_classificacao_tempo = df_pedidos_unicos['CLASSIFICACAO_TEMPO'].value_counts().reset_index()
+        contagem_classificacao_tempo.columns = ['Classificação', 'Quantidade de Pedidos']
+        resultado['contagem_classificacao_tempo'] = contagem_classificacao_tempo
+
+    # Usar dados já filtrados pela sidebar (já com os mapeamentos das situações aplicados)
+    df_filtrado = df_trabalho
+
+    # Proporção por STATUS ITEM (apenas Concluído/Pendente)
+    if 'STATUS ITEM' in df_trabalho.columns:
+        resultado['contagem_por_status_e_filial'] = contagem_status_por_filial(df_trabalho, 'STATUS ITEM')
+
+    # Análise de produtos por nota fiscal
+    if not df_filtrado.empty and 'N° NOTA FISCAL' in df_filtrado.columns and 'CODIGO PRODUTO' in df_filtrado.columns:
+        quantidade_produtos_por_nota = df_filtrado.groupby('N° NOTA FISCAL')['CODIGO PRODUTO'].nunique().reset_index()
+        quantidade_produtos_por_nota.columns = ['N° NOTA FISCAL', 'Quantidade de Produtos']
+
+        contagem_notas_por_quantidade_produtos = quantidade_produtos_por_nota.groupby('Quantidade de Produtos').size().reset_index(name='Quantidade de Notas Fiscais')
+
+        total_notas_fiscais_analisadas = contagem_notas_por_quantidade_produtos['Quantidade de Notas Fiscais'].sum()
+
+        if total_notas_fiscais_analisadas > 0:
+            contagem_notas_por_quantidade_produtos['Porcentagem'] = (
+                contagem_notas_por_quantidade_produtos['Quantidade de Notas Fiscais'] / total_notas_fiscais_analisadas * 100
+            ).round(2)
+            resultado['contagem_notas_por_quantidade_produtos'] = contagem_notas_por_quantidade_produtos
+
+    # Produtos mais vendidos
+    if not df_filtrado.empty and 'CODIGO PRODUTO' in df_filtrado.columns:
+        top_produtos = df_filtrado['CODIGO PRODUTO'].value_counts().reset_index()
+        top_produtos.columns = ['Codigo do Produto', 'Quantidade de Vendas (Itens)']
+
+        if len(top_produtos) > 3:
+            df_donut = top_produtos.head(3).copy()
+            outros_soma = top_produtos['Quantidade de Vendas (Itens)'][3:].sum()
+            df_donut.loc[3] = ['Outros', outros_soma]
+        else:
+            df_donut = top_produtos.copy()
+        resultado['df_donut'] = df_donut
+
+    # Distribuição por situação PFA, carga e NFV
+    for coluna, chave in (('SITUACAO PFA', 'df_pfa_counts'), ('SITUACAO CARGA', 'df_carga_counts'), ('SITUACAO NFV', 'df_nfv_counts')):
+        if coluna in df_trabalho.columns:
+            contagem = contar_valores(df_trabalho[coluna]).reset_index()
+            contagem.columns = ['Situacao', 'Contagem']
+            resultado[chave] = contagem
+
+    # Bloqueios PFA por data (None quando não há bloqueios)
+    if 'BLOQUEIO PFA' in df_filtrado.columns:
+        df_bloqueios_pfa = df_filtrado[df_filtrado['BLOQUEIO PFA'].notna() & (df_filtrado['BLOQUEIO PFA'] != 0) & (df_filtrado['BLOQUEIO PFA'] != '')].copy()
+    else:
+        df_bloqueios_pfa = pd.DataFrame()
+
+    if not df_bloqueios_pfa.empty:
+        bloqueios_por_data = df_bloqueios_pfa.groupby(df_bloqueios_pfa['TIMESTAMP REMESSA'].dt.date).size().reset_index(name='Quantidade de Bloqueios')
+        bloqueios_por_data.columns = ['Data do Bloqueio', 'Quantidade de Bloqueios']
+        resultado['bloqueios_por_data'] = bloqueios_por_data.sort_values('Data do Bloqueio')
+
+    return resultado
+
+
+def derivar_etapa3(df_trabalho):
+    """Status do título (geral e por filial), tempo médio item -> título e situação TCR"""
+    resultado = {
+        'indicadores': indicadores_status(df_trabalho, 'STATUS TITULO'),
+        'contagem_por_status': None,
+        'contagem_por_status_e_filial': None,
+        'tempo_medio_por_filial': None,
+        'situacao_tcr_counts': None,
+    }
+
+    if 'STATUS TITULO' in df_trabalho.columns:
+        contagem_por_status = contar_valores(df_trabalho['STATUS TITULO']).reset_index()
+        contagem_por_status.columns = ['Status', 'Quantidade']
+        resultado['contagem_por_status'] = contagem_por_status
+
+        resultado['contagem_por_status_e_filial'] = contagem_status_por_filial(df_trabalho, 'STATUS TITULO')
+
+    # Filtrar apenas registros com ambos timestamps disponíveis
+    df_tempo = df_trabalho[df_trabalho['TIMESTAMP ITEM'].notna() & df_trabalho['TIMESTAMP TITULO'].notna()].copy()
+
+    if not df_tempo.empty:
+        # Diferença em horas já calculada na tabela de fatos
+        df_tempo['Tempo (horas)'] = df_tempo['DURACAO_ITEM_TITULO_HORAS']
+
+        # Agrupar por filial
+        tempo_medio_por_filial = df_tempo.groupby('FILIAL')['Tempo (horas)'].mean().reset_index()
+        tempo_medio_por_filial['Tempo (horas)'] = tempo_medio_por_filial['Tempo (horas)'].round(2)
+        # Filial como texto: cada filial é uma categoria no gráfico, não uma escala de cores
+        tempo_medio_por_filial['FILIAL'] = tempo_medio_por_filial['FILIAL'].astype(str)
+        resultado['tempo_medio_por_filial'] = tempo_medio_por_filial
+
+    if 'SITUACAO TCR' in df_trabalho.columns:
+        situacao_tcr_counts = contar_valores(df_trabalho['SITUACAO TCR']).reset_index()
+        situacao_tcr_counts.columns = ['Situação TCR', 'Quantidade']
+        resultado['situacao_tcr_counts'] = situacao_tcr_counts
+
+    return resultado
+
+
+# Registro das visões do dashboard: colunas da tabela de fatos usadas no cálculo, entradas
+# derivadas calculadas sob demanda (fatos_pedidos.ENTRADAS_DERIVADAS) e função de cálculo.
+# Apenas as colunas e entradas da visão selecionada são materializadas
+REGISTRO_ETAPAS = {
+    'Visão Geral': {
+        'colunas': COLUNAS_VISAO_GERAL + ['ETAPAS'],
+        'entradas': [],
+        'derivar': derivar_visao_geral,
+    },
+    'Etapa 1 - Remessa': {
+        'colunas': [
+            'FILIAL', 'PEDIDO', 'ETAPAS', 'TIMESTAMP PEDIDO', 'TIMESTAMP REMESSA', 'DURACAO_PEDIDO_REMESSA_HORAS',
+            'STATUS PEDIDO', 'STATUS REMESSA', 'SITUACAO DO PEDIDO', 'SITUACAO DO PEDIDO_DESCRICAO',
+            'PEDIDO BLOQUEADO', 'USUARIO BLOQ PEDIDO', 'DATA DO BLOQUEIO', 'OBSERVACAO DO PEDIDO',
+        ],
+        'entradas': ['LINHA_BASE DURACAO_PEDIDO_REMESSA_HORAS'],
+        'derivar': derivar_etapa1,
+    },
+    'Etapa 2 - Item': {
+        'colunas': [
+            'FILIAL', 'PEDIDO', 'ETAPAS', 'TIMESTAMP REMESSA', 'TIMESTAMP ITEM', 'DURACAO_REMESSA_ITEM_HORAS',
+            'STATUS ITEM', 'CODIGO PRODUTO', 'N° NOTA FISCAL', 'SITUACAO PFA', 'SITUACAO CARGA',
+            'SITUACAO NFV', 'BLOQUEIO PFA',
+        ],
+        'entradas': ['LINHA_BASE DURACAO_REMESSA_ITEM_HORAS'],
+        'derivar': derivar_etapa2,
+    },
+    'Etapa 3 - Título': {
+        'colunas': [
+            'FILIAL', 'PEDIDO', 'ETAPAS', 'TIMESTAMP ITEM', 'TIMESTAMP TITULO', 'DURACAO_ITEM_TITULO_HORAS',
+            'STATUS TITULO', 'SITUACAO TCR',
+        ],
+        'entradas': [],
+        'derivar': derivar_etapa3,
+    },
+}
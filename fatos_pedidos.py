@@ -0,0 +1,136 @@
+from functools import partial
+
+import numpy as np
+import pandas as pd
+
+from codigos_situacao import ROTULOS_VAZIOS, TABELAS_SITUACAO, decodificar
+from linhas_base import calcular_linhas_base
+from mascara_etapas import montar_mascaras
+
+# Status de cada etapa: coluna de status -> timestamp que marca a etapa como concluída
+STATUS_ETAPAS = {
+    'STATUS PEDIDO': 'TIMESTAMP PEDIDO',
+    'STATUS REMESSA': 'TIMESTAMP REMESSA',
+    'STATUS ITEM': 'TIMESTAMP ITEM',
+    'STATUS NF': 'TIMESTAMP NF',
+    'STATUS TITULO': 'TIMESTAMP TITULO',
+}
+
+# Tipo das colunas de status
+TIPO_STATUS = pd.CategoricalDtype(['Concluído', 'Pendente'])
+
+# Duração em horas entre etapas consecutivas: coluna -> (timestamp inicial, timestamp final)
+DURACOES_ETAPAS = {
+    'DURACAO_PEDIDO_REMESSA_HORAS': ('TIMESTAMP PEDIDO', 'TIMESTAMP REMESSA'),
+    'DURACAO_REMESSA_ITEM_HORAS': ('TIMESTAMP REMESSA', 'TIMESTAMP ITEM'),
+    'DURACAO_ITEM_TITULO_HORAS': ('TIMESTAMP ITEM', 'TIMESTAMP TITULO'),
+}
+
+# Colunas calculadas sob demanda sobre a tabela de fatos inteira: nome -> função(fatos) que
+# devolve {coluna: Series}. Médias de referência de cada duração por filial (linhas_base)
+ENTRADAS_DERIVADAS = {
+    f'LINHA_BASE {coluna}': partial(calcular_linhas_base, duracoes={coluna: intervalo})
+    for coluna, intervalo in DURACOES_ETAPAS.items()
+}
+
+
+def montar_fatos_pedidos(df):
+    """Monta a tabela de fatos com uma linha por FILIAL/PEDIDO, calculada uma vez por consulta.
+
+    Cada linha é a primeira ocorrência do pedido na filial, com todas as colunas do retorno
+    mais os status de cada etapa (STATUS_ETAPAS), a máscara das etapas concluídas (ETAPAS, ver
+    mascara_etapas), as durações entre etapas em horas (DURACOES_ETAPAS) e a descrição
+    da situação do pedido. Cálculos mais caros ficam
+    em ENTRADAS_DERIVADAS, feitos apenas quando uma visão precisa deles. Linhas sem filial ficam
+    de fora. A ordem e o índice das linhas originais são preservados, de modo que
+    `pedidos_das_filiais` equivale a filtrar as linhas brutas e remover os pedidos repetidos.
+    """
+    if df.empty or 'FILIAL' not in df.columns or 'PEDIDO' not in df.columns:
+        return pd.DataFrame()
+
+    fatos = df[df['FILIAL'].notna()].drop_duplicates(subset=['FILIAL', 'PEDIDO'], keep='first')
+
+    # Etapa concluída quando o timestamp correspondente está preenchido
+    status = {
+        coluna: pd.Categorical.from_codes(fatos[timestamp].isna().to_numpy().astype('int8'), dtype=TIPO_STATUS)
+        for coluna, timestamp in STATUS_ETAPAS.items() if timestamp in fatos.columns
+    }
+    duracoes = {
+        coluna: (fatos[fim] - fatos[inicio]).dt.total_seconds() / 3600
+        for coluna, (inicio, fim) in DURACOES_ETAPAS.items()
+        if inicio in fatos.columns and fim in fatos.columns
+    }
+    fatos = fatos.assign(**status, **duracoes, ETAPAS=montar_mascaras(fatos, STATUS_ETAPAS))
+
+    # O timeline já chega com a descrição (senior.processar_timeline); a planilha Excel não
+    if 'SITUACAO DO PEDIDO' in fatos.columns and 'SITUACAO DO PEDIDO_DESCRICAO' not in fatos.columns:
+        origem, mapeamento = TABELAS_SITUACAO['SITUACAO DO PEDIDO_DESCRICAO']
+        fatos['SITUACAO DO PEDIDO_DESCRICAO'] = decodificar(
+            fatos[origem], mapeamento, ROTULOS_VAZIOS['SITUACAO DO PEDIDO_DESCRICAO']
+        )
+    return fatos
+
+
+class IndiceFiliais:
+    """Posições das linhas de cada FILIAL na tabela de fatos, calculadas uma vez por consulta.
+
+    A seleção de filiais passa a ser a união das posições guardadas, sem percorrer a coluna
+    FILIAL a cada interação. As filiais ficam na ordem em que aparecem no retorno.
+    """
+
+    def __init__(self, fatos):
+        self.total_linhas = len(fatos)
+        self.posicoes = {}
+        self.pedidos_unicos = True
+        if 'FILIAL' not in fatos.columns or fatos.empty:
+            return
+        codigos, filiais = pd.factorize(fatos['FILIAL'])
+        ordem = np.argsort(codigos, kind='stable')
+        limites = np.cumsum(np.bincount(codigos[codigos >= 0], minlength=len(filiais)))[:-1]
+        # Linhas sem filial (código -1) ficam no início da ordenação e não pertencem a nenhuma
+        ordem = ordem[np.count_nonzero(codigos < 0):]
+        self.posicoes = dict(zip(filiais.tolist(), np.split(ordem, limites)))
+        # Sem pedidos repetidos entre filiais, nenhuma seleção precisa remover duplicados
+        self.pedidos_unicos = fatos['PEDIDO'].is_unique
+
+    @property
+    def filiais(self):
+        return list(self.posicoes)
+
+    def selecao(self, filiais):
+        """Posições das linhas das `filiais`, em ordem crescente; None quando todas as linhas são selecionadas"""
+        filiais = [filial for filial in dict.fromkeys(filiais) if filial in self.posicoes]
+        if len(filiais) == len(self.posicoes) and sum(len(p) for p in self.posicoes.values()) == self.total_linhas:
+            return None
+        if not filiais:
+            return np.zeros(0, dtype=np.intp)
+        return np.sort(np.concatenate([self.posicoes[filial] for filial in filiais]))
+
+
+def pedidos_das_filiais(fatos, filiais, colunas=None, derivadas=None, indice=None):
+    """Pedidos únicos das filiais selecionadas, a partir da tabela de fatos.
+
+    Equivale a filtrar as linhas brutas por filial e aplicar
+    `drop_duplicates(subset=['PEDIDO'], keep='first')`: um pedido presente em mais de uma
+    filial fica com a linha da primeira filial (na ordem do retorno) entre as selecionadas.
+    Com `colunas`, apenas as existentes entre elas são copiadas; `derivadas` ({coluna: Series}
+    alinhadas à tabela de fatos) são acrescentadas à seleção. Com o `indice` (IndiceFiliais) da
+    tabela, as linhas vêm das posições guardadas e, com todas as filiais, a tabela é usada
+    sem cópia.
+    """
+    if colunas is not None:
+        colunas = list(dict.fromkeys(['FILIAL', 'PEDIDO'] + [col for col in colunas if col in fatos.columns]))
+    tabela = fatos if colunas is None else fatos[colunas]
+    if derivadas:
+        tabela = tabela.assign(**derivadas)
+
+    if indice is None:
+        selecao = tabela[fatos['FILIAL'].isin(filiais)]
+    else:
+        posicoes = indice.selecao(filiais)
+        selecao = tabela if posicoes is None else tabela.take(posicoes)
+        if indice.pedidos_unicos:
+            return selecao
+    if selecao['PEDIDO'].is_unique:
+        return selecao
+    return selecao.drop_duplicates(subset=['PEDIDO'], keep='first')
@@ -0,0 +1,47 @@
+import os
+
+import pandas as pd
+
+# Referências de duração usadas na classificação de tempo das etapas ("Dentro/Fora da Média").
+# As durações válidas (> 0) de cada FILIAL são ordenadas pelo timestamp de início da etapa e
+# cada pedido recebe a média móvel dos últimos pedidos da filial, incluindo o próprio.
+
+# Pedidos na média móvel, incluindo o próprio (LINHA_BASE_JANELA no .env)
+JANELA_PADRAO = 3
+
+# Sufixo da coluna calculada para cada duração: <coluna da duração>_MEDIA_MOVEL
+SUFIXO = 'MEDIA_MOVEL'
+
+
+def media_movel_por_filial(fatos, inicio, duracao, janela=None):
+    """Média móvel de `duracao` entre os pedidos da mesma FILIAL, na ordem de `inicio`.
+
+    Durações nulas ou <= 0 e linhas sem filial ficam fora das janelas e recebem NaN. No empate
+    de `inicio`, vale a ordem das linhas em `fatos`.
+    Retorna uma Series com o índice de `fatos`.
+    """
+    if janela is None:
+        janela = int(os.getenv('LINHA_BASE_JANELA', JANELA_PADRAO))
+    janela = max(int(janela), 1)
+
+    validos = fatos[duracao].notna() & (fatos[duracao] > 0) & fatos['FILIAL'].notna()
+    ordenados = fatos.loc[validos, ['FILIAL', inicio, duracao]].sort_values(inicio, kind='stable')
+    medias = (
+        ordenados.groupby('FILIAL', sort=False, observed=True)[duracao]
+        .rolling(janela, min_periods=1)
+        .mean()
+    )
+    return pd.Series(medias.to_numpy(), index=medias.index.get_level_values(-1), dtype=float).reindex(fatos.index)
+
+
+def calcular_linhas_base(fatos, duracoes, janela=None):
+    """Média móvel de referência de cada duração de `duracoes` ({coluna: (início, fim)}).
+
+    Na consulta por período todas as datas entram juntas, ordenadas pelo início da etapa.
+    Retorna {<coluna>_MEDIA_MOVEL: Series} para ser adicionado à tabela de fatos.
+    """
+    colunas = {}
+    for coluna, (inicio, _) in duracoes.items():
+        if coluna in fatos.columns and inicio in fatos.columns and 'FILIAL' in fatos.columns:
+            colunas[f'{coluna}_{SUFIXO}'] = media_movel_por_filial(fatos, inicio, coluna, janela)
+    return colunas
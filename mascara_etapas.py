@@ -0,0 +1,79 @@
+import numpy as np
+
+# Etapas alcançadas por pedido em um uint8: bit i ligado quando a etapa i foi concluída
+# (timestamp preenchido). A ordem dos bits é a ordem do processo Order to Cash.
+BITS_ETAPAS = {
+    'STATUS PEDIDO': 0,
+    'STATUS REMESSA': 1,
+    'STATUS ITEM': 2,
+    'STATUS NF': 3,
+    'STATUS TITULO': 4,
+}
+
+TOTAL_ETAPAS = len(BITS_ETAPAS)
+TOTAL_MASCARAS = 1 << TOTAL_ETAPAS
+
+# Bits de cada valor possível da máscara: TABELA_BITS[mascara, etapa] é 1 quando a etapa foi concluída
+TABELA_BITS = ((np.arange(TOTAL_MASCARAS)[:, None] >> np.arange(TOTAL_ETAPAS)) & 1).astype(np.int64)
+
+# Primeira etapa não concluída de cada valor da máscara (TOTAL_ETAPAS quando todas foram)
+_PRIMEIRA_FALTANTE = np.array(
+    [next((etapa for etapa in range(TOTAL_ETAPAS) if not mascara >> etapa & 1), TOTAL_ETAPAS)
+     for mascara in range(TOTAL_MASCARAS)],
+    dtype=np.int8,
+)
+
+
+def montar_mascaras(df, timestamps):
+    """Máscara de etapas de cada linha a partir de {coluna de status: coluna de timestamp}"""
+    mascaras = np.zeros(len(df), dtype=np.uint8)
+    for coluna, timestamp in timestamps.items():
+        if timestamp in df.columns:
+            mascaras |= df[timestamp].notna().to_numpy().astype(np.uint8) << BITS_ETAPAS[coluna]
+    return mascaras
+
+
+def contar_etapas(mascaras, grupos=None, total_grupos=1):
+    """Concluídos por grupo e etapa e total de pedidos por grupo, com um único `np.bincount`.
+
+    `grupos` traz o código (0 a total_grupos - 1) do grupo de cada pedido, ex.: a filial; sem
+    ele todos os pedidos formam um grupo. Conta quantos pedidos têm cada valor de máscara e
+    multiplica pela TABELA_BITS. Retorna (concluídos, totais) com formas
+    (total_grupos, TOTAL_ETAPAS) e (total_grupos,).
+    """
+    mascaras = np.asarray(mascaras, dtype=np.intp)
+    if grupos is not None:
+        mascaras = np.asarray(grupos, dtype=np.intp) * TOTAL_MASCARAS + mascaras
+    por_mascara = np.bincount(mascaras, minlength=total_grupos * TOTAL_MASCARAS).reshape(total_grupos, TOTAL_MASCARAS)
+    return por_mascara @ TABELA_BITS, por_mascara.sum(axis=1)
+
+
+def etapa_concluida(mascaras, coluna):
+    """Booleano por pedido: etapa da coluna de status concluída"""
+    return (np.asarray(mascaras) >> BITS_ETAPAS[coluna] & 1).astype(bool)
+
+
+def primeira_etapa_faltante(mascaras):
+    """Índice (em BITS_ETAPAS) da primeira etapa não concluída; TOTAL_ETAPAS quando todas foram"""
+    return _PRIMEIRA_FALTANTE[np.asarray(mascaras)]
+
+
+def fora_de_ordem(mascaras):
+    """Pedidos com alguma etapa concluída depois de uma etapa anterior pendente.
+
+    Em ordem, as etapas concluídas formam um prefixo (0b00111): somar 1 não compartilha bits.
+    """
+    mascaras = np.asarray(mascaras, dtype=np.uint8)
+    return (mascaras & (mascaras + np.uint8(1))) != 0
+
+
+def mascaras_de(df_trabalho):
+    """Máscaras do DataFrame: a coluna ETAPAS da tabela de fatos ou, sem ela, as colunas de status"""
+    if 'ETAPAS' in df_trabalho.columns:
+        return df_trabalho['ETAPAS'].to_numpy()
+    mascaras = np.zeros(len(df_trabalho), dtype=np.uint8)
+    for coluna, bit in BITS_ETAPAS.items():
+        if coluna in df_trabalho.columns:
+            mascaras |= (df_trabalho[coluna] == 'Concluído').to_numpy(dtype=bool).astype(np.uint8) << bit
+    return mascaras
+
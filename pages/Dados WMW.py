@@ -9,6 +9,8 @@ from datetime import datetime
 import os
 from dotenv import load_dotenv
 
+import transporte
+
 # Carregar variáveis de ambiente
 load_dotenv()
 
@@ -55,7 +57,7 @@ def authenticate_wmw():
         }
         
         auth_full_url = f"{webservice_base_url}/{authentication_url}"
-        response_auth = requests.post(auth_full_url, data=payload_auth, headers=headers_auth)
+        response_auth = transporte.post(auth_full_url, data=payload_auth, headers=headers_auth)
         response_auth.raise_for_status()
         
         auth_data = response_auth.json()
@@ -100,7 +102,7 @@ def fetch_wmw_data(access_token, empresa="1-1", data_filtro=None):
             "filters": filters
         }
         
-        response_fetch_product = requests.post(
+        response_fetch_product = transporte.post(
             fetch_product_url,
             json=json_fetch_product,
             headers=headers_with_token
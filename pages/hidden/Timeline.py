@@ -5,6 +5,10 @@ import xml.etree.ElementTree as ET
 import plotly.express as px
 import numpy as np
 
+# Como em pages/Dados WMW.py, transporte.py vem da raiz do projeto: executar a partir da raiz
+# com `python -m streamlit run "pages/hidden/Timeline.py"` (o -m inclui a pasta atual na busca)
+import transporte
+
 # --- INICIALIZAÇÃO E FUNÇÃO DE CARREGAMENTO DE DADOS ---
 if 'df' not in st.session_state:
     st.session_state.df = pd.DataFrame()
@@ -36,7 +40,7 @@ def fetch_data(data):
     </soapenv:Envelope>"""
 
     try:
-        response = requests.post(url, headers=headers, data=body)
+        response = transporte.post(url, headers=headers, data=body)
         
         if response.status_code == 200:
             st.success("Dados carregados com sucesso!")
@@ -0,0 +1,139 @@
+import random
+import threading
+import time
+from concurrent.futures import Future
+
+# Retentativas padrão em falhas transitórias e limites do espaçamento entre elas (segundos)
+TENTATIVAS_PADRAO = 3
+ESPERA_BASE_PADRAO = 0.5
+ESPERA_MAXIMA_PADRAO = 8.0
+
+# Falhas consecutivas que abrem o circuito e tempo até uma nova tentativa (segundos)
+LIMITE_FALHAS_PADRAO = 5
+TEMPO_RECUPERACAO_PADRAO = 60.0
+
+
+class CircuitoAberto(Exception):
+    """O serviço está marcado como indisponível e a chamada não foi feita"""
+
+    def __init__(self, segundos_restantes):
+        super().__init__(f"Serviço indisponível, nova tentativa em {segundos_restantes:.0f}s")
+        self.segundos_restantes = segundos_restantes
+
+
+def espera_com_jitter(tentativa, base=ESPERA_BASE_PADRAO, maximo=ESPERA_MAXIMA_PADRAO):
+    """Tempo de espera antes da próxima tentativa: backoff exponencial com jitter completo.
+
+    O sorteio entre 0 e o limite da tentativa evita que várias sessões que falharam
+    juntas voltem a chamar o serviço ao mesmo tempo.
+    """
+    return random.uniform(0, min(maximo, base * (2 ** tentativa)))
+
+
+def executar_com_retentativas(funcao, transitorio, tentativas=TENTATIVAS_PADRAO,
+                              base=ESPERA_BASE_PADRAO, maximo=ESPERA_MAXIMA_PADRAO, dormir=time.sleep):
+    """Executa `funcao()` repetindo em falhas transitórias.
+
+    `transitorio(erro)` decide se a exceção justifica nova tentativa; as demais são
+    propagadas na hora. Depois da última tentativa a exceção original é propagada.
+    """
+    tentativas = max(int(tentativas), 1)
+    for tentativa in range(tentativas):
+        try:
+            return funcao()
+        except Exception as e:
+            if not transitorio(e) or tentativa == tentativas - 1:
+                raise
+        dormir(espera_com_jitter(tentativa, base, maximo))
+
+
+class Disjuntor:
+    """Circuit breaker: após falhas consecutivas deixa de chamar o serviço por um tempo.
+
+    Fechado: as chamadas passam normalmente. Aberto: as chamadas são recusadas até o fim
+    do tempo de recuperação. Meio-aberto: uma única chamada de teste é liberada; o sucesso
+    fecha o circuito e a falha o abre novamente.
+    """
+
+    def __init__(self, limite_falhas=LIMITE_FALHAS_PADRAO, tempo_recuperacao=TEMPO_RECUPERACAO_PADRAO,
+                 relogio=time.monotonic):
+        self.limite_falhas = max(int(limite_falhas), 1)
+        self.tempo_recuperacao = float(tempo_recuperacao)
+        self._relogio = relogio
+        self._trava = threading.Lock()
+        self.falhas = 0
+        self._aberto_ate = None
+        self._teste_em_andamento = False
+
+    @property
+    def estado(self):
+        with self._trava:
+            if self._aberto_ate is None:
+                return 'fechado'
+            if self._relogio() < self._aberto_ate:
+                return 'aberto'
+            return 'meio-aberto'
+
+    def liberar(self):
+        """Reserva a chamada; lança CircuitoAberto se o serviço ainda estiver indisponível."""
+        with self._trava:
+            if self._aberto_ate is None:
+                return
+            restante = self._aberto_ate - self._relogio()
+            if restante > 0:
+                raise CircuitoAberto(restante)
+            if self._teste_em_andamento:
+                # Outra sessão já está fazendo a chamada de teste
+                raise CircuitoAberto(0)
+            self._teste_em_andamento = True
+
+    def registrar_sucesso(self):
+        with self._trava:
+            self.falhas = 0
+            self._aberto_ate = None
+            self._teste_em_andamento = False
+
+    def registrar_falha(self):
+        with self._trava:
+            self.falhas += 1
+            if self._teste_em_andamento or self.falhas >= self.limite_falhas:
+                self._aberto_ate = self._relogio() + self.tempo_recuperacao
+            self._teste_em_andamento = False
+
+
+class ChamadaUnica:
+    """Coalescência de chamadas concorrentes (single-flight).
+
+    Enquanto uma chamada para uma chave está em andamento, as demais chamadas com a mesma
+    chave não executam nada: aguardam o mesmo Future e recebem o mesmo resultado (ou exceção).
+    """
+
+    def __init__(self):
+        self._trava = threading.Lock()
+        self._em_andamento = {}
+
+    def executar(self, chave, funcao):
+        with self._trava:
+            futuro = self._em_andamento.get(chave)
+            primeiro = futuro is None
+            if primeiro:
+                futuro = self._em_andamento[chave] = Future()
+        if not primeiro:
+            return futuro.result()
+
+        try:
+            resultado = funcao()
+        except BaseException as e:
+            futuro.set_exception(e)
+            raise
+        else:
+            futuro.set_result(resultado)
+            return resultado
+        finally:
+            with self._trava:
+                del self._em_andamento[chave]
+
+    def em_andamento(self):
+        """Chaves com chamada em andamento no momento"""
+        with self._trava:
+            return list(self._em_andamento)
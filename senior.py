@@ -0,0 +1,379 @@
+import gzip
+import os
+import threading
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from urllib.parse import urlparse
+
+import numpy as np
+import requests
+import pandas as pd
+
+import transporte
+from armazem import carregar_armazem, dia_no_armazem, gravar_dia_armazem
+from cache_dados import (
+    arquivo_download_timeline, data_fechada, ler_timeline_em_cache, gravar_timeline_em_cache,
+    momento_timeline_em_cache
+)
+from codigos_situacao import categorias_situacao, decodificar_situacoes
+from resiliencia import (
+    LIMITE_FALHAS_PADRAO, TEMPO_RECUPERACAO_PADRAO, TENTATIVAS_PADRAO,
+    ChamadaUnica, CircuitoAberto, Disjuntor, executar_com_retentativas
+)
+from esquema_timeline import aplicar_esquema
+from timeline_xml import ler_timeline_xml
+from timestamps import criar_timestamps
+
+# Webservice principal do timeline (Sapiens)
+URL_TIMELINE = "https://ocweb02s1p.seniorcloud.com.br:31201/g5-senior-services/sapiens_Synccom_frescatto_bi"
+
+# Máximo de requisições simultâneas por host (SENIOR_MAX_CONEXOES no .env)
+MAX_CONEXOES_POR_HOST_PADRAO = 4
+
+# Respostas HTTP que indicam sobrecarga ou indisponibilidade temporária do webservice
+STATUS_TRANSITORIOS = {408, 429, 500, 502, 503, 504}
+
+headers_timeline = {
+    "SOAPAction": "#POST",
+    "Content-type": "text/xml",
+    "Accept": "application/xml"
+}
+
+# Criar timestamps combinando data e hora usando a abordagem do Timeline.py
+timestamp_map = {
+    ('DATA EMISSAO PEDIDO', 'HORA EMISSAO PEDIDO'): 'TIMESTAMP PEDIDO',
+    ('DATA ASS REMESSA', 'HORA ASS REMESSA'): 'TIMESTAMP REMESSA',
+    ('DATA PREPARACAO DO ITEM', 'HORA PREPARACAO DO ITEM'): 'TIMESTAMP ITEM',
+    ('DATA GERACAO NF', 'HORA GERACAO NF'): 'TIMESTAMP NF',
+    ('DATA GERACAO DA NOTA FISCAL', 'HORA GERACAO DA NOTA FISCAL'): 'TIMESTAMP NF2',
+    ('DATA GERACAO DO REGISTRO', 'HORA GERACAO DO REGISTRO'): 'TIMESTAMP TITULO'
+}
+
+# Identificação de um item do pedido no retorno, usada para contar as alterações entre consultas
+CHAVE_LINHA = ['FILIAL', 'PEDIDO', 'CODIGO PRODUTO', 'N° NOTA FISCAL']
+
+def obter_credenciais_webservice(usar_webservice_wmw=False):
+    """Retorna (fonte, url, user, password) do webservice escolhido, ou None sem credenciais"""
+    if usar_webservice_wmw:
+        # Usar o webservice Senior (Timeline.py), com credenciais do .env
+        url = os.getenv('WEBSERVICE_URL')
+        user = os.getenv('WEBSERVICE_USER')
+        password = os.getenv('WEBSERVICE_PASSWORD')
+
+        # Verificar se as variáveis de ambiente foram carregadas
+        if not all([url, user, password]):
+            return None
+        return "senior", url, user, password
+
+    # Usar o webservice principal
+    return "principal", URL_TIMELINE, "felipe.martins", "Canetaazul03"
+
+
+def montar_envelope_timeline(user, password, data):
+    """Monta o envelope SOAP da consulta timeline para a data (DD/MM/AAAA)"""
+    return f"""<?xml.xml version="1.0" encoding="ISO-8859-1"?>
+        <soapenv:Envelope xmlns:soapenv="http://schemas.xmlsoap.org/soap/envelope/" xmlns:ser="http://services.senior.com.br">
+            <soapenv:Header/>
+            <soapenv:Body>
+                <ser:timeline>
+                    <user>{user}</user>
+                    <password>{password}</password>
+                    <encryption>0</encryption>
+                    <parameters>
+                        <data>'{data}'</data>
+                    </parameters>
+                </ser:timeline>
+            </soapenv:Body>
+        </soapenv:Envelope>"""
+
+
+def requisitar_timeline(url, user, password, data, stream=False):
+    """Envia a consulta timeline ao webservice (sessão compartilhada) e retorna a resposta HTTP"""
+    return transporte.post(
+        url, headers=headers_timeline, data=montar_envelope_timeline(user, password, data), stream=stream
+    )
+
+
+def processar_timeline(df, tipar=True):
+    """Cria os timestamps e aplica os mapeamentos de situação no DataFrame do timeline.
+
+    Com `tipar`, aplica ao final os tipos compactos de `esquema_timeline.aplicar_esquema`.
+    """
+    # Conversão vetorizada (formatos com e sem segundos em passadas em lote)
+    df = criar_timestamps(df, timestamp_map)
+
+    # Códigos de situação -> descrições (codigos_situacao.TABELAS_SITUACAO)
+    decodificar_situacoes(df)
+
+    if tipar:
+        aplicar_esquema(df, categorias_situacao)
+    return df
+
+
+def resumir_alteracoes(df, anterior):
+    """Compara o retorno processado com a consulta anterior da mesma data.
+
+    São comparadas as colunas que definem o andamento de cada item no dashboard: a chave
+    (CHAVE_LINHA), os timestamps e as situações. Retorna as contagens de linhas novas ou
+    alteradas, de linhas anteriores que deixaram de existir e de itens afetados.
+    """
+    colunas = [
+        col for col in df.columns
+        if col in CHAVE_LINHA or col.startswith('TIMESTAMP') or col.startswith('SITUACAO')
+    ]
+    if anterior is None or any(col not in anterior.columns for col in colunas):
+        alteradas = np.ones(len(df), dtype=bool)
+        removidas = np.zeros(0 if anterior is None else len(anterior), dtype=bool)
+    else:
+        hashes = pd.util.hash_pandas_object(df[colunas], index=False).to_numpy()
+        hashes_anteriores = pd.util.hash_pandas_object(anterior[colunas], index=False).to_numpy()
+        alteradas = ~np.isin(hashes, hashes_anteriores)
+        removidas = ~np.isin(hashes_anteriores, hashes)
+
+    chave = [col for col in CHAVE_LINHA if col in df.columns]
+    if chave and anterior is not None and all(col in anterior.columns for col in chave):
+        itens = len(pd.concat([df.loc[alteradas, chave], anterior.loc[removidas, chave]]).drop_duplicates())
+    else:
+        itens = int(alteradas.sum())
+    return {
+        'linhas_alteradas': int(alteradas.sum()),
+        'linhas_removidas': int(removidas.sum()),
+        'itens_alterados': itens,
+    }
+
+
+def ler_e_processar_timeline(fonte):
+    """Lê a resposta XML do timeline (caminho, arquivo ou bytes) e aplica o processamento"""
+    df = ler_timeline_xml(fonte)
+    if df.empty:
+        return df
+    return processar_timeline(df)
+
+
+class ErroStatusTimeline(Exception):
+    """Resposta HTTP diferente de 200 do webservice timeline"""
+
+    def __init__(self, status_code):
+        super().__init__(f"Código de status {status_code}")
+        self.status_code = status_code
+
+
+_semaforos_host = {}
+_trava_hosts = threading.Lock()
+
+
+def semaforo_do_host(url):
+    """Semáforo que limita as requisições simultâneas a um mesmo host"""
+    host = urlparse(url).netloc
+    with _trava_hosts:
+        semaforo = _semaforos_host.get(host)
+        if semaforo is None:
+            limite = int(os.getenv('SENIOR_MAX_CONEXOES', MAX_CONEXOES_POR_HOST_PADRAO))
+            semaforo = _semaforos_host[host] = threading.BoundedSemaphore(max(limite, 1))
+    return semaforo
+
+
+def erro_transitorio(erro):
+    """Indica se a falha do webservice justifica uma nova tentativa"""
+    if isinstance(erro, ErroStatusTimeline):
+        return erro.status_code in STATUS_TRANSITORIOS
+    return isinstance(erro, (
+        requests.exceptions.ConnectionError,
+        requests.exceptions.Timeout,
+        requests.exceptions.ChunkedEncodingError,
+    ))
+
+
+_disjuntores_host = {}
+
+
+def disjuntor_do_host(url):
+    """Circuit breaker compartilhado por todas as consultas a um mesmo host"""
+    host = urlparse(url).netloc
+    with _trava_hosts:
+        disjuntor = _disjuntores_host.get(host)
+        if disjuntor is None:
+            disjuntor = _disjuntores_host[host] = Disjuntor(
+                limite_falhas=int(os.getenv('SENIOR_DISJUNTOR_FALHAS', LIMITE_FALHAS_PADRAO)),
+                tempo_recuperacao=float(os.getenv('SENIOR_DISJUNTOR_SEGUNDOS', TEMPO_RECUPERACAO_PADRAO)),
+            )
+    return disjuntor
+
+
+def _baixar_timeline(fonte, url, user, password, data):
+    """Uma tentativa de consulta: devolve (DataFrame processado, arquivo com a resposta em gzip)"""
+    # O corpo é lido em fluxo: o XML é processado durante o download e a cópia para o cache
+    # é gravada já comprimida em um arquivo ao lado da entrada do cache, sem ficar em memória
+    arquivo_gzip = arquivo_download_timeline(fonte, data)
+    try:
+        with semaforo_do_host(url):
+            response = requisitar_timeline(url, user, password, data, stream=True)
+            try:
+                if response.status_code != 200:
+                    raise ErroStatusTimeline(response.status_code)
+                with gzip.open(arquivo_gzip, 'wb') as copia:
+                    df = ler_e_processar_timeline(transporte.CorpoEmFluxo(response, copia=copia))
+            finally:
+                response.close()
+    except BaseException:
+        os.remove(arquivo_gzip)
+        raise
+    return df, arquivo_gzip
+
+
+def _ultima_resposta_guardada(fonte, data, erro):
+    """Última resposta em disco de (fonte, data), de qualquer idade; sem ela propaga `erro`"""
+    df = ler_timeline_em_cache(fonte, data, ler_e_processar_timeline, ttl_segundos=float('inf'))
+    if df is None:
+        raise erro
+    return df, {
+        'origem': 'cache_desatualizado',
+        'atualizado_em': momento_timeline_em_cache(fonte, data),
+        'erro': erro,
+    }
+
+
+# Consultas em andamento por (fonte, data, ttl_segundos), compartilhadas entre as sessões do app
+_consultas_timeline = ChamadaUnica()
+
+
+def carregar_timeline_dia(fonte, url, user, password, data, ttl_segundos=None):
+    """Carrega o timeline de uma data, usando o cache em disco antes do webservice.
+
+    Chamadas simultâneas para a mesma (fonte, data) e o mesmo `ttl_segundos` são agrupadas:
+    apenas a primeira consulta o webservice e as demais aguardam e recebem o mesmo DataFrame,
+    que deve ser tratado como somente leitura.
+
+    Falhas transitórias (conexão, timeout, 429/5xx) são repetidas com backoff exponencial e
+    jitter. Após falhas consecutivas o circuito do host abre e as consultas deixam de ir ao
+    webservice por um tempo; enquanto isso é devolvida a última resposta guardada da data.
+
+    `ttl_segundos` substitui a validade do cache do dia atual (0 força uma nova consulta).
+
+    Retorna (DataFrame processado, info), com info = {'origem', 'atualizado_em', 'erro'} e
+    origem 'cache', 'webservice' ou 'cache_desatualizado' (webservice indisponível). Ao atualizar
+    o dia em aberto, info['alteracoes'] traz o resumo de `resumir_alteracoes` em relação à
+    consulta guardada anteriormente.
+    Sem resposta guardada, lança ErroStatusTimeline, requests.exceptions.RequestException
+    ou resiliencia.CircuitoAberto.
+    """
+    # A validade faz parte da chave: uma atualização forçada (ttl 0) não pode receber o
+    # resultado de uma chamada em andamento que apenas leu o cache
+    chave = (fonte, str(data).strip(), ttl_segundos)
+    return _consultas_timeline.executar(
+        chave, lambda: _carregar_timeline_dia(fonte, url, user, password, data, ttl_segundos)
+    )
+
+
+def _carregar_timeline_dia(fonte, url, user, password, data, ttl_segundos=None):
+    df = ler_timeline_em_cache(fonte, data, ler_e_processar_timeline, ttl_segundos=ttl_segundos)
+    if df is not None:
+        # Datas consultadas antes da existência do armazém
+        if data_fechada(data) and not dia_no_armazem(fonte, data):
+            gravar_dia_armazem(fonte, data, df)
+        return df, {'origem': 'cache', 'atualizado_em': momento_timeline_em_cache(fonte, data), 'erro': None}
+
+    disjuntor = disjuntor_do_host(url)
+    try:
+        disjuntor.liberar()
+        df, arquivo_gzip = executar_com_retentativas(
+            lambda: _baixar_timeline(fonte, url, user, password, data),
+            erro_transitorio,
+            tentativas=int(os.getenv('SENIOR_TENTATIVAS', TENTATIVAS_PADRAO)),
+        )
+    except CircuitoAberto as e:
+        return _ultima_resposta_guardada(fonte, data, e)
+    except Exception as e:
+        if not erro_transitorio(e):
+            # O webservice respondeu: a falha não indica indisponibilidade do host
+            disjuntor.registrar_sucesso()
+            raise
+        disjuntor.registrar_falha()
+        return _ultima_resposta_guardada(fonte, data, e)
+    disjuntor.registrar_sucesso()
+
+    # Atualização do dia em aberto: contar o que mudou desde a consulta guardada
+    alteracoes = None
+    if not data_fechada(data):
+        try:
+            anterior = ler_timeline_em_cache(fonte, data, ttl_segundos=float('inf'))
+            if anterior is not None:
+                alteracoes = resumir_alteracoes(df, anterior)
+        except BaseException:
+            os.remove(arquivo_gzip)
+            raise
+
+    gravar_timeline_em_cache(fonte, data, None, df, arquivo_gzip=arquivo_gzip)
+    gravar_dia_armazem(fonte, data, df)
+    return df, {'origem': 'webservice', 'atualizado_em': datetime.now(), 'erro': None, 'alteracoes': alteracoes}
+
+
+def datas_do_periodo(data_inicial, data_final):
+    """Lista as datas (DD/MM/AAAA) entre data_inicial e data_final, inclusive"""
+    inicio = datetime.strptime(data_inicial.strip(), '%d/%m/%Y').date()
+    fim = datetime.strptime(data_final.strip(), '%d/%m/%Y').date()
+    return [(inicio + timedelta(days=i)).strftime('%d/%m/%Y') for i in range((fim - inicio).days + 1)]
+
+
+def carregar_timeline_periodo(fonte, url, user, password, datas, max_paralelo=None):
+    """Carrega várias datas em paralelo e concatena em um único DataFrame.
+
+    Datas fechadas já gravadas no armazém são lidas de uma vez com `armazem.carregar_armazem`.
+    As demais são requisições timeline separadas, processadas assim que chegam. O número de
+    requisições simultâneas ao host é limitado por `semaforo_do_host`. A coluna
+    DATA CONSULTA identifica a data de origem de cada linha.
+    Retorna (DataFrame, {data: erro}, {data: info}): as datas que falharam e as que vieram
+    da última resposta guardada por indisponibilidade do webservice.
+    """
+    max_paralelo = max_paralelo or int(os.getenv('SENIOR_MAX_CONEXOES', MAX_CONEXOES_POR_HOST_PADRAO))
+    partes = {}
+    erros = {}
+    desatualizadas = {}
+
+    no_armazem = [data for data in datas if data_fechada(data) and dia_no_armazem(fonte, data)]
+    historico = pd.DataFrame()
+    if no_armazem:
+        historico = carregar_armazem(fonte, no_armazem[0], no_armazem[-1])
+        if not historico.empty:
+            historico = historico[historico['DATA CONSULTA'].isin(no_armazem)].reset_index(drop=True)
+        lidas = set(historico['DATA CONSULTA'].unique()) if not historico.empty else set()
+        datas_consulta = [data for data in datas if data not in lidas]
+    else:
+        datas_consulta = datas
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_paralelo, len(datas_consulta) or 1))) as executor:
+        futuros = {
+            executor.submit(carregar_timeline_dia, fonte, url, user, password, data): data
+            for data in datas_consulta
+        }
+        for futuro in as_completed(futuros):
+            data = futuros[futuro]
+            try:
+                df, info = futuro.result()
+            except (ErroStatusTimeline, requests.exceptions.RequestException, CircuitoAberto, ET.ParseError) as e:
+                erros[data] = e
+                continue
+            if info['origem'] == 'cache_desatualizado':
+                desatualizadas[data] = info
+            if not df.empty:
+                # Cópia: o DataFrame pode ser compartilhado com outra consulta simultânea
+                partes[data] = df.assign(**{'DATA CONSULTA': data})
+
+    # Manter a ordem cronológica, independente da ordem de chegada
+    frames = [partes[data] for data in datas if data in partes]
+    if historico.empty:
+        if not frames:
+            return pd.DataFrame(), erros, desatualizadas
+        df = pd.concat(frames, ignore_index=True)
+    elif not frames:
+        df = historico
+    else:
+        df = pd.concat([historico] + frames, ignore_index=True)
+        ordem = pd.to_datetime(df['DATA CONSULTA'], format='%d/%m/%Y').to_numpy()
+        df = df.iloc[np.argsort(ordem, kind='stable')].reset_index(drop=True)
+
+    # Tipos reaplicados sobre o conjunto: categorias de dias diferentes são unificadas e o
+    # armazém devolve FILIAL como texto
+    aplicar_esquema(df, categorias_situacao)
+    return df, erros, desatualizadas
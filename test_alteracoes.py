@@ -0,0 +1,59 @@
+import pandas as pd
+
+from senior import ler_e_processar_timeline, resumir_alteracoes
+
+# Consulta anterior e nova da mesma data: itens (FILIAL, PEDIDO, produto, nota) com timestamps
+# e situações; a nova muda um timestamp, uma situação e uma coluna fora da comparação, remove
+# um item e acrescenta outro
+ts = pd.Timestamp('2025-06-19 10:00')
+anterior = pd.DataFrame({
+    'FILIAL': [1, 1, 1, 2, 2],
+    'PEDIDO': [10, 10, 11, 20, 21],
+    'CODIGO PRODUTO': ['A', 'B', 'A', 'C', 'D'],
+    'N° NOTA FISCAL': [100, 100, 101, 200, 201],
+    'TIMESTAMP PEDIDO': [ts] * 5,
+    'TIMESTAMP ITEM': [ts, pd.NaT, pd.NaT, ts, pd.NaT],
+    'SITUACAO DO PEDIDO': ['1', '1', '2', '4', '1'],
+    'OBSERVACAO DO PEDIDO': ['', '', '', '', ''],
+})
+nova = anterior.copy()
+nova.loc[1, 'TIMESTAMP ITEM'] = ts + pd.Timedelta(hours=2)
+nova.loc[2, 'SITUACAO DO PEDIDO'] = '4'
+nova.loc[3, 'OBSERVACAO DO PEDIDO'] = 'sem efeito no andamento'
+nova = pd.concat([nova.drop(index=4), pd.DataFrame([{
+    'FILIAL': 2, 'PEDIDO': 22, 'CODIGO PRODUTO': 'E', 'N° NOTA FISCAL': 202,
+    'TIMESTAMP PEDIDO': ts, 'TIMESTAMP ITEM': pd.NaT, 'SITUACAO DO PEDIDO': '1', 'OBSERVACAO DO PEDIDO': '',
+}])], ignore_index=True)
+
+casos = {
+    # linhas 1 e 2 alteradas e o item 22 novo; 10/B e 11/A (versão antiga) e 21/D deixam de existir
+    'alterações entre consultas': (
+        resumir_alteracoes(nova, anterior),
+        {'linhas_alteradas': 3, 'linhas_removidas': 3, 'itens_alterados': 4},
+    ),
+    'mesma consulta': (
+        resumir_alteracoes(anterior, anterior.copy()),
+        {'linhas_alteradas': 0, 'linhas_removidas': 0, 'itens_alterados': 0},
+    ),
+    'sem consulta anterior': (
+        resumir_alteracoes(nova, None),
+        {'linhas_alteradas': 5, 'linhas_removidas': 0, 'itens_alterados': 5},
+    ),
+    # Sem as colunas comparadas na consulta anterior, todas as linhas contam como alteradas
+    'consulta anterior sem timestamps': (
+        resumir_alteracoes(nova, anterior.drop(columns=['TIMESTAMP ITEM'])),
+        {'linhas_alteradas': 5, 'linhas_removidas': 0, 'itens_alterados': 5},
+    ),
+}
+
+# Retorno real reprocessado: nada muda
+dia = ler_e_processar_timeline('response.xml')
+casos['response.xml reprocessado'] = (
+    resumir_alteracoes(dia, ler_e_processar_timeline('response.xml')),
+    {'linhas_alteradas': 0, 'linhas_removidas': 0, 'itens_alterados': 0},
+)
+
+print("Resumo das alterações entre consultas (senior.resumir_alteracoes):")
+for nome, (obtido, esperado) in casos.items():
+    print(f"{nome}: {'OK' if obtido == esperado else 'DIVERGENTE'}")
+    assert obtido == esperado, f"{nome}: {obtido} != {esperado}"
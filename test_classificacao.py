@@ -0,0 +1,198 @@
+import pandas as pd
+import numpy as np
+
+from etapas import PENDENCIAS_ETAPA1, classificar_tempo, condicoes_pendencia
+from fatos_pedidos import STATUS_ETAPAS
+from mascara_etapas import (
+    BITS_ETAPAS, TOTAL_ETAPAS, contar_etapas, etapa_concluida, fora_de_ordem, montar_mascaras,
+    primeira_etapa_faltante,
+)
+
+# Pedidos cobrindo todos os ramos das classificações linha a linha
+ts = pd.Timestamp('2025-06-19 10:00')
+test_data = [
+    # sem pedido
+    {'TIMESTAMP PEDIDO': pd.NaT, 'TIMESTAMP REMESSA': ts, 'DURACAO': 2.0, 'MEDIA': 3.0},
+    # sem remessa
+    {'TIMESTAMP PEDIDO': ts, 'TIMESTAMP REMESSA': pd.NaT, 'DURACAO': 2.0, 'MEDIA': 3.0},
+    # duração ausente, zero e negativa
+    {'TIMESTAMP PEDIDO': ts, 'TIMESTAMP REMESSA': ts, 'DURACAO': np.nan, 'MEDIA': 3.0},
+    {'TIMESTAMP PEDIDO': ts, 'TIMESTAMP REMESSA': ts, 'DURACAO': 0.0, 'MEDIA': 3.0},
+    {'TIMESTAMP PEDIDO': ts, 'TIMESTAMP REMESSA': ts, 'DURACAO': -1.5, 'MEDIA': 3.0},
+    # média ausente
+    {'TIMESTAMP PEDIDO': ts, 'TIMESTAMP REMESSA': ts, 'DURACAO': 2.0, 'MEDIA': np.nan},
+    # dentro (inclusive igual) e fora da média
+    {'TIMESTAMP PEDIDO': ts, 'TIMESTAMP REMESSA': ts, 'DURACAO': 2.0, 'MEDIA': 3.0},
+    {'TIMESTAMP PEDIDO': ts, 'TIMESTAMP REMESSA': ts, 'DURACAO': 3.0, 'MEDIA': 3.0},
+    {'TIMESTAMP PEDIDO': ts, 'TIMESTAMP REMESSA': ts, 'DURACAO': 4.0, 'MEDIA': 3.0},
+    # sem pedido nem remessa
+    {'TIMESTAMP PEDIDO': pd.NaT, 'TIMESTAMP REMESSA': pd.NaT, 'DURACAO': np.nan, 'MEDIA': np.nan},
+]
+
+rng = np.random.default_rng(0)
+for _ in range(500):
+    test_data.append({
+        'TIMESTAMP PEDIDO': pd.NaT if rng.random() < 0.1 else ts,
+        'TIMESTAMP REMESSA': pd.NaT if rng.random() < 0.2 else ts,
+        'DURACAO': np.nan if rng.random() < 0.1 else round(rng.normal(5, 4), 1),
+        'MEDIA': np.nan if rng.random() < 0.1 else round(rng.normal(5, 2), 1),
+    })
+
+df = pd.DataFrame(test_data, index=range(100, 100 + len(test_data)))
+df = df.rename(columns={
+    'DURACAO': 'DURACAO_PEDIDO_REMESSA_HORAS_VALIDA',
+    'MEDIA': 'MEDIA_MOVEL_DURACAO_HORAS_FILLNA',
+})
+df['DURACAO_REMESSA_ITEM_HORAS'] = df['DURACAO_PEDIDO_REMESSA_HORAS_VALIDA']
+
+
+# Classificações linha a linha usadas antes nas Etapas 1 e 2
+def classificar_status_media_aprimorado(row):
+    if pd.isna(row.get('TIMESTAMP PEDIDO')):
+        return 'Pendente - Pedido não Criado'
+
+    if pd.isna(row.get('TIMESTAMP REMESSA')):
+        return 'Pendente - Remessa não Associada'
+
+    duracao = row.get('DURACAO_PEDIDO_REMESSA_HORAS_VALIDA')
+    if pd.isna(duracao) or duracao <= 0:
+        return 'Dados Insuficientes - Duração Inválida'
+
+    media_movel = row.get('MEDIA_MOVEL_DURACAO_HORAS_FILLNA')
+    if pd.isna(media_movel):
+        return 'Dados Insuficientes - Média Indisponível'
+
+    if duracao <= media_movel:
+        return 'Dentro da Média'
+    else:
+        return 'Fora da Média'
+
+
+def classificar_sem_dados_validos(row):
+    if pd.isna(row.get('TIMESTAMP PEDIDO')):
+        return 'Pendente - Pedido não Criado'
+    elif pd.isna(row.get('TIMESTAMP REMESSA')):
+        return 'Pendente - Remessa não Associada'
+    else:
+        return 'Dados Insuficientes - Sem Dados Válidos'
+
+
+def classificar_sem_timestamps(row):
+    if pd.isna(row.get('TIMESTAMP PEDIDO')):
+        return 'Pendente - Pedido não Criado'
+    elif pd.isna(row.get('TIMESTAMP REMESSA')):
+        return 'Pendente - Remessa não Associada'
+    else:
+        return 'Dados Insuficientes - Timestamps Ausentes'
+
+
+def classificar_status_media(row):
+    if pd.isna(row['DURACAO_REMESSA_ITEM_HORAS']) or pd.isna(row['MEDIA_MOVEL_DURACAO_HORAS_FILLNA']):
+        return 'Dados Insuficientes'
+    elif row['DURACAO_REMESSA_ITEM_HORAS'] <= row['MEDIA_MOVEL_DURACAO_HORAS_FILLNA']:
+        return 'Dentro da Média'
+    else:
+        return 'Fora da Média'
+
+
+# Mesmas condições montadas em etapas.derivar_etapa1 e derivar_etapa2
+duracao = df['DURACAO_PEDIDO_REMESSA_HORAS_VALIDA']
+media_movel = df['MEDIA_MOVEL_DURACAO_HORAS_FILLNA']
+duracao_item = df['DURACAO_REMESSA_ITEM_HORAS']
+
+casos = {
+    'classificar_status_media_aprimorado': (
+        classificar_status_media_aprimorado,
+        classificar_tempo(
+            condicoes_pendencia(df, PENDENCIAS_ETAPA1) + [
+                (duracao.isna() | (duracao <= 0), 'Dados Insuficientes - Duração Inválida'),
+                (media_movel.isna(), 'Dados Insuficientes - Média Indisponível'),
+                (duracao <= media_movel, 'Dentro da Média'),
+            ],
+            'Fora da Média',
+            df.index
+        ),
+    ),
+    'classificar_sem_dados_validos': (
+        classificar_sem_dados_validos,
+        classificar_tempo(
+            condicoes_pendencia(df, PENDENCIAS_ETAPA1), 'Dados Insuficientes - Sem Dados Válidos', df.index
+        ),
+    ),
+    'classificar_sem_timestamps': (
+        classificar_sem_timestamps,
+        classificar_tempo(
+            condicoes_pendencia(df, PENDENCIAS_ETAPA1), 'Dados Insuficientes - Timestamps Ausentes', df.index
+        ),
+    ),
+    'classificar_status_media': (
+        classificar_status_media,
+        classificar_tempo(
+            [
+                (duracao_item.isna() | media_movel.isna(), 'Dados Insuficientes'),
+                (duracao_item <= media_movel, 'Dentro da Média'),
+            ],
+            'Fora da Média',
+            df.index
+        ),
+    ),
+}
+
+print("Paridade com a classificação vetorizada (etapas.classificar_tempo):")
+for nome, (funcao, obtido) in casos.items():
+    esperado = df.apply(funcao, axis=1).astype(object)
+    print(f"{nome}: {'OK' if obtido.equals(esperado) else 'DIVERGENTE'}")
+    print(f"  {obtido.value_counts().to_dict()}")
+    assert obtido.equals(esperado), f"{nome} difere da versão linha a linha"
+
+
+# Máscaras de etapas (mascara_etapas) contra a leitura direta dos timestamps, pedido a pedido
+pedidos = pd.DataFrame({
+    timestamp: np.where(rng.random(len(df)) < 0.35, pd.NaT, ts)
+    for timestamp in STATUS_ETAPAS.values()
+}, index=df.index).astype('datetime64[ns]')
+filiais = rng.integers(0, 3, len(pedidos))
+mascaras = montar_mascaras(pedidos, STATUS_ETAPAS)
+ordem_etapas = sorted(STATUS_ETAPAS, key=BITS_ETAPAS.get)
+
+
+def primeira_faltante_linha_a_linha(row):
+    for posicao, coluna in enumerate(ordem_etapas):
+        if pd.isna(row[STATUS_ETAPAS[coluna]]):
+            return posicao
+    return TOTAL_ETAPAS
+
+
+def fora_de_ordem_linha_a_linha(row):
+    concluidas = [pd.notna(row[STATUS_ETAPAS[coluna]]) for coluna in ordem_etapas]
+    return any(concluidas[posicao] and not all(concluidas[:posicao]) for posicao in range(TOTAL_ETAPAS))
+
+
+concluidos_por_filial = np.array([
+    [pedidos.loc[filiais == filial, STATUS_ETAPAS[coluna]].notna().sum() for coluna in ordem_etapas]
+    for filial in range(3)
+])
+concluidos, totais = contar_etapas(mascaras, filiais, 3)
+concluidos_geral, totais_geral = contar_etapas(mascaras)
+
+casos_mascaras = {
+    'etapa_concluida': all(
+        (etapa_concluida(mascaras, coluna) == pedidos[timestamp].notna().to_numpy()).all()
+        for coluna, timestamp in STATUS_ETAPAS.items()
+    ),
+    'primeira_etapa_faltante': (
+        primeira_etapa_faltante(mascaras) == pedidos.apply(primeira_faltante_linha_a_linha, axis=1).to_numpy()
+    ).all(),
+    'fora_de_ordem': (fora_de_ordem(mascaras) == pedidos.apply(fora_de_ordem_linha_a_linha, axis=1).to_numpy()).all(),
+    'contar_etapas por filial': (
+        (concluidos == concluidos_por_filial).all() and (totais == np.bincount(filiais, minlength=3)).all()
+    ),
+    'contar_etapas geral': (
+        (concluidos_geral[0] == concluidos_por_filial.sum(axis=0)).all() and totais_geral[0] == len(pedidos)
+    ),
+}
+
+print("Máscaras de etapas (mascara_etapas):")
+for nome, igual in casos_mascaras.items():
+    print(f"{nome}: {'OK' if igual else 'DIVERGENTE'}")
+    assert igual, f"{nome} difere da leitura dos timestamps"
@@ -0,0 +1,63 @@
+import pandas as pd
+import numpy as np
+
+from codigos_situacao import (
+    codigos_desconhecidos, decodificar, decodificar_situacoes, mapeamento_situacao_pedido,
+    mapeamento_situacao_tcr,
+)
+
+# Códigos como chegam do timeline: texto, com espaços, em branco, nulos e fora do mapeamento
+df = pd.DataFrame({
+    'SITUACAO DO PEDIDO': ['1', '4', ' 2 ', '99', None, '', '4', '99', '17', 'abc'],
+    'SITUACAO DO TITULO': ['AB', 'AO', 'ZZ', None, 'AB', 'ZZ', ' AN', 'XX', '', 'AA'],
+}, index=range(10, 20))
+
+
+# Decodificação linha a linha usada antes da tabela de códigos
+def descrever_pedido(valor):
+    if pd.isna(valor) or not str(valor).strip():
+        return 'Status Desconhecido'
+    try:
+        codigo = int(float(valor))
+    except ValueError:
+        return f'Status Desconhecido ({valor})'
+    return mapeamento_situacao_pedido.get(codigo, f'Status Desconhecido ({codigo})')
+
+
+def descrever_titulo(valor):
+    if pd.isna(valor) or not str(valor).strip():
+        return None
+    return mapeamento_situacao_tcr.get(valor.strip(), f'Status Desconhecido ({valor.strip()})')
+
+
+decodificado = decodificar_situacoes(df.copy())
+casos = {
+    'SITUACAO DO PEDIDO_DESCRICAO': df['SITUACAO DO PEDIDO'].map(descrever_pedido),
+    'SITUACAO TCR': df['SITUACAO DO TITULO'].map(descrever_titulo),
+}
+
+print("Decodificação dos códigos de situação (codigos_situacao):")
+for coluna, esperado in casos.items():
+    obtido = decodificado[coluna]
+    igual = isinstance(obtido.dtype, pd.CategoricalDtype) and obtido.astype(object).where(
+        obtido.notna(), None
+    ).equals(esperado.astype(object).where(esperado.notna(), None))
+    print(f"{coluna}: {'OK' if igual else 'DIVERGENTE'}")
+    assert igual, pd.DataFrame({'obtido': obtido, 'esperado': esperado})
+
+# Códigos desconhecidos viram categorias próprias, depois das descrições do mapeamento
+categorias = list(decodificado['SITUACAO DO PEDIDO_DESCRICAO'].cat.categories)
+assert categorias[-3:] == ['Status Desconhecido (17)', 'Status Desconhecido (99)', 'Status Desconhecido (abc)'], categorias
+
+desconhecidos = codigos_desconhecidos(decodificado)
+esperado = {
+    'SITUACAO DO PEDIDO_DESCRICAO': {'17': 1, '99': 2, 'abc': 1},
+    'SITUACAO TCR': {'XX': 1, 'ZZ': 2},
+}
+print(f"codigos_desconhecidos: {'OK' if desconhecidos == esperado else 'DIVERGENTE'}")
+assert desconhecidos == esperado, desconhecidos
+
+# Série só com códigos conhecidos: nenhuma categoria desconhecida
+conhecidos = decodificar(pd.Series(['AB', 'AO', np.nan]), mapeamento_situacao_tcr)
+assert not any(str(categoria).startswith('Status Desconhecido') for categoria in conhecidos.cat.categories)
+assert conhecidos.isna().tolist() == [False, False, True]
@@ -0,0 +1,40 @@
+import numpy as np
+import pandas as pd
+
+from consultas_duckdb import DUCKDB_DISPONIVEL, status_etapas_duckdb
+from etapas import contagem_status_etapas
+from fatos_pedidos import IndiceFiliais, montar_fatos_pedidos, pedidos_das_filiais
+from senior import ler_e_processar_timeline
+
+# Paridade do gráfico "Status por Etapa" entre o SQL do DuckDB (MOTOR_CONSULTA=duckdb)
+# e o caminho em pandas do dashboard (etapas.contagem_status_etapas), sobre os mesmos pedidos
+if not DUCKDB_DISPONIVEL:
+    print("DuckDB não está instalado (pip install duckdb); teste ignorado")
+    raise SystemExit(0)
+
+dia = ler_e_processar_timeline('response.xml')
+
+# Segundo dia com parte dos pedidos repetidos e timestamps apagados, para que a primeira
+# ocorrência de cada pedido no período faça diferença
+rng = np.random.default_rng(0)
+segundo = dia.sample(frac=0.6, random_state=0).reset_index(drop=True)
+for coluna in ['TIMESTAMP REMESSA', 'TIMESTAMP ITEM', 'TIMESTAMP TITULO']:
+    segundo.loc[rng.random(len(segundo)) < 0.3, coluna] = pd.NaT
+
+fatos = montar_fatos_pedidos(pd.concat([dia, segundo], ignore_index=True))
+indice = IndiceFiliais(fatos)
+
+casos = {
+    'todas as filiais': indice.filiais,
+    'uma filial': indice.filiais[:1],
+    'duas filiais': indice.filiais[1:3],
+    'nenhuma filial': [],
+}
+print("Paridade de status por etapa (DuckDB x pandas):")
+for nome, filiais in casos.items():
+    df_trabalho = pedidos_das_filiais(fatos, filiais, indice=indice)
+    esperado = contagem_status_etapas(df_trabalho)[0]
+    obtido = status_etapas_duckdb(df_trabalho)
+    igual = obtido.equals(esperado)
+    print(f"{nome}: {'OK' if igual else 'DIVERGENTE'}")
+    assert igual, f"{nome}:\n{obtido}\n!=\n{esperado}"
@@ -0,0 +1,102 @@
+import pandas as pd
+import numpy as np
+
+from fatos_pedidos import (
+    DURACOES_ETAPAS, STATUS_ETAPAS, IndiceFiliais, montar_fatos_pedidos, pedidos_das_filiais,
+)
+from senior import ler_e_processar_timeline
+
+# Retorno real com pedidos repetidos em outra filial e linhas sem filial, para que a primeira
+# ocorrência de cada pedido e o descarte das linhas sem filial façam diferença
+df = ler_e_processar_timeline('response.xml')
+rng = np.random.default_rng(0)
+filiais_retorno = df['FILIAL'].dropna().unique().tolist()
+repetidos = df.sample(frac=0.1, random_state=0).assign(FILIAL=lambda d: rng.choice(filiais_retorno, len(d)))
+sem_filial = df.sample(frac=0.02, random_state=1).assign(FILIAL=pd.NA)
+df = pd.concat([df, repetidos, sem_filial], ignore_index=True)
+
+fatos = montar_fatos_pedidos(df)
+# Colunas do retorno, comparadas com as linhas brutas
+colunas_retorno = list(df.columns)
+
+casos = {
+    'uma linha por FILIAL/PEDIDO': (
+        not fatos.duplicated(subset=['FILIAL', 'PEDIDO']).any() and fatos['FILIAL'].notna().all()
+    ),
+    'colunas do retorno preservadas': fatos[colunas_retorno].equals(
+        df[df['FILIAL'].notna()].drop_duplicates(subset=['FILIAL', 'PEDIDO'], keep='first')[colunas_retorno]
+    ),
+    'status das etapas': all(
+        ((fatos[coluna] == 'Concluído') == fatos[timestamp].notna()).all()
+        for coluna, timestamp in STATUS_ETAPAS.items()
+    ),
+    'durações em horas': all(
+        np.allclose(
+            fatos[coluna].to_numpy(dtype=float),
+            fatos.apply(lambda row: (row[fim] - row[inicio]).total_seconds() / 3600, axis=1).to_numpy(dtype=float),
+            equal_nan=True,
+        )
+        for coluna, (inicio, fim) in DURACOES_ETAPAS.items()
+    ),
+}
+
+# Seleção por filial a partir dos fatos igual ao filtro sobre as linhas brutas
+for nome, filiais in {
+    'todas as filiais': filiais_retorno,
+    'uma filial': filiais_retorno[:1],
+    'duas filiais': filiais_retorno[1:3],
+    'nenhuma filial': [],
+}.items():
+    esperado = df[df['FILIAL'].isin(filiais)].drop_duplicates(subset=['PEDIDO'], keep='first')
+    obtido = pedidos_das_filiais(fatos, filiais)
+    casos[f'pedidos_das_filiais ({nome})'] = obtido[colunas_retorno].equals(esperado[colunas_retorno])
+
+# Planilha Excel: sem a descrição, a situação do pedido é decodificada na montagem
+planilha = montar_fatos_pedidos(df.drop(columns=['SITUACAO DO PEDIDO_DESCRICAO']))
+casos['descrição da situação (planilha)'] = planilha['SITUACAO DO PEDIDO_DESCRICAO'].astype(object).equals(
+    fatos['SITUACAO DO PEDIDO_DESCRICAO'].astype(object)
+)
+
+casos['retorno vazio'] = montar_fatos_pedidos(pd.DataFrame()).empty
+
+print("Tabela de fatos dos pedidos (fatos_pedidos):")
+for nome, igual in casos.items():
+    print(f"{nome}: {'OK' if igual else 'DIVERGENTE'}")
+    assert igual, f"{nome} difere do cálculo sobre as linhas brutas"
+
+
+# Índice de filiais: posições guardadas no lugar do filtro sobre a coluna FILIAL
+indice = IndiceFiliais(fatos)
+
+
+def posicoes_esperadas(filiais):
+    return np.flatnonzero(fatos['FILIAL'].isin(filiais).to_numpy())
+
+
+casos_indice = {
+    'filiais na ordem do retorno': indice.filiais == fatos['FILIAL'].unique().tolist(),
+    'todas as filiais: sem seleção': indice.selecao(indice.filiais) is None,
+    'nenhuma filial': len(indice.selecao([])) == 0,
+    'uma filial': np.array_equal(indice.selecao(indice.filiais[:1]), posicoes_esperadas(indice.filiais[:1])),
+    'filiais repetidas, fora de ordem e inexistentes': np.array_equal(
+        indice.selecao([indice.filiais[2], indice.filiais[0], indice.filiais[2], -1]),
+        posicoes_esperadas(indice.filiais[:1] + indice.filiais[2:3]),
+    ),
+    'pedidos repetidos entre filiais': not indice.pedidos_unicos,
+    # Tabela vazia: a seleção é a tabela inteira
+    'tabela vazia': IndiceFiliais(pd.DataFrame()).selecao([1]) is None,
+}
+for nome, filiais in {
+    'todas as filiais': indice.filiais,
+    'uma filial': indice.filiais[:1],
+    'duas filiais': indice.filiais[1:3],
+    'nenhuma filial': [],
+}.items():
+    casos_indice[f'pedidos_das_filiais com índice ({nome})'] = pedidos_das_filiais(
+        fatos, filiais, indice=indice
+    ).equals(pedidos_das_filiais(fatos, filiais))
+
+print("Índice de filiais (IndiceFiliais.selecao):")
+for nome, igual in casos_indice.items():
+    print(f"{nome}: {'OK' if igual else 'DIVERGENTE'}")
+    assert igual, f"{nome} difere do filtro pela coluna FILIAL"
@@ -0,0 +1,58 @@
+import pandas as pd
+import numpy as np
+
+from linhas_base import calcular_linhas_base
+
+# Pedidos de três filiais (e sem filial) em dois dias, com durações ausentes, zero e negativas
+# e inícios fora de ordem entre os dias
+rng = np.random.default_rng(0)
+quantidade = 400
+inicio = pd.Timestamp('2025-06-19') + pd.to_timedelta(rng.integers(0, 48 * 60, quantidade), unit='min')
+duracao = rng.normal(5, 4, quantidade).round(1)
+duracao[rng.random(quantidade) < 0.1] = np.nan
+duracao[rng.random(quantidade) < 0.05] = 0.0
+fatos = pd.DataFrame({
+    'FILIAL': pd.Series(rng.choice([1, 2, 3], quantidade), dtype='Int64').mask(rng.random(quantidade) < 0.05),
+    'TIMESTAMP PEDIDO': inicio,
+    'DURACAO_PEDIDO_REMESSA_HORAS': duracao,
+    'DATA CONSULTA': np.where(rng.random(quantidade) < 0.5, '19/06/2025', '20/06/2025'),
+}, index=range(1000, 1000 + quantidade))
+janela = 3
+
+
+# Referência linha a linha: média das últimas `janela` durações válidas da filial, na ordem do
+# início (empates na ordem das linhas), incluindo o próprio pedido
+def media_movel_linha_a_linha(fatos):
+    resultado = pd.Series(np.nan, index=fatos.index)
+    validos = fatos[fatos['DURACAO_PEDIDO_REMESSA_HORAS'].gt(0) & fatos['FILIAL'].notna()]
+    for _, grupo in validos.groupby('FILIAL'):
+        grupo = grupo.sort_values('TIMESTAMP PEDIDO', kind='stable')
+        anteriores = []
+        for indice, valor in grupo['DURACAO_PEDIDO_REMESSA_HORAS'].items():
+            anteriores = (anteriores + [valor])[-janela:]
+            resultado[indice] = sum(anteriores) / len(anteriores)
+    return resultado
+
+
+obtido = calcular_linhas_base(
+    fatos, {'DURACAO_PEDIDO_REMESSA_HORAS': ('TIMESTAMP PEDIDO', 'TIMESTAMP REMESSA')}, janela=janela
+)
+assert list(obtido) == ['DURACAO_PEDIDO_REMESSA_HORAS_MEDIA_MOVEL'], list(obtido)
+obtido = obtido['DURACAO_PEDIDO_REMESSA_HORAS_MEDIA_MOVEL']
+esperado = media_movel_linha_a_linha(fatos)
+
+print("Média móvel de referência por filial (linhas_base):")
+igual = np.allclose(obtido.to_numpy(), esperado.to_numpy(), equal_nan=True) and obtido.index.equals(fatos.index)
+print(f"paridade com a versão linha a linha: {'OK' if igual else 'DIVERGENTE'}")
+assert igual, pd.DataFrame({'obtido': obtido, 'esperado': esperado})
+
+# Durações inválidas e linhas sem filial ficam sem média e fora das janelas
+invalidas = ~(fatos['DURACAO_PEDIDO_REMESSA_HORAS'] > 0) | fatos['FILIAL'].isna()
+sem_media = obtido[invalidas].isna().all() and obtido[~invalidas].notna().all()
+print(f"durações <= 0, nulas e sem filial fora da média: {'OK' if sem_media else 'DIVERGENTE'}")
+assert sem_media
+
+# Sem a coluna de início não há média
+assert calcular_linhas_base(fatos.drop(columns=['TIMESTAMP PEDIDO']), {
+    'DURACAO_PEDIDO_REMESSA_HORAS': ('TIMESTAMP PEDIDO', 'TIMESTAMP REMESSA')
+}) == {}
@@ -2,6 +2,8 @@ import pandas as pd
 import numpy as np
 from datetime import datetime
 
+from timestamps import criar_timestamps
+
 # Simular dados XML como aparecem no response.xml
 test_data = [
     {
@@ -41,6 +43,7 @@ mapeamento_nomes = {
 }
 
 df = df.rename(columns=mapeamento_nomes)
+df_vetorizado = df.copy()
 
 print("Dados originais:")
 print(df)
@@ -104,4 +107,14 @@ for col in ['TIMESTAMP PEDIDO', 'TIMESTAMP REMESSA', 'TIMESTAMP ITEM', 'TIMESTAM
         print(f"{col}: {df[col].dtype}")
         print(f"  Valores: {df[col].tolist()}")
         print(f"  Nulos: {df[col].isna().sum()}")
-        print()
\ No newline at end of file
+        print()
+
+print("\n" + "="*50 + "\n")
+print("Paridade com a versão vetorizada (timestamps.criar_timestamps):")
+df_vetorizado = criar_timestamps(df_vetorizado, timestamp_map)
+for col in timestamp_map.values():
+    if col in df.columns:
+        esperado = df[col].astype('datetime64[ns]')
+        obtido = df_vetorizado[col]
+        print(f"{col}: {'OK' if obtido.equals(esperado) else 'DIVERGENTE'}")
+        assert obtido.equals(esperado), f"{col} difere da versão linha a linha"
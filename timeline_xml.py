@@ -0,0 +1,163 @@
+import io
+import xml.etree.ElementTree as ET
+
+import numpy as np
+import pandas as pd
+
+# Namespaces usados na resposta SOAP do webservice timeline
+namespaces = {
+    'S': "http://schemas.xmlsoap.org/soap/envelope/",
+    'ns2': "http://services.senior.com.br",
+    'xsi': "http://www.w3.org/2001/XMLSchema-instance"
+}
+
+TAG_TIMELINE_RESPONSE = f"{{{namespaces['ns2']}}}timelineResponse"
+
+# Esquema conhecido do retorno: tag do XML -> nome da coluna no DataFrame
+mapeamento_nomes = {
+    'CFilial': 'FILIAL',
+    'CPedido': 'PEDIDO',
+    'CDataEmissaoPedido': 'DATA EMISSAO PEDIDO',
+    'CHoraEmissaoPedido': 'HORA EMISSAO PEDIDO',
+    'CDataAssRemessa': 'DATA ASS REMESSA',
+    'CHoraAssRemessa': 'HORA ASS REMESSA',
+    'CDataPrepItem': 'DATA PREPARACAO DO ITEM',
+    'CHoraPrepItem': 'HORA PREPARACAO DO ITEM',
+    'CDataGerNF': 'DATA GERACAO NF',
+    'CHoraGerNF': 'HORA GERACAO NF',
+    'CDataGerTCR': 'DATA GERACAO DO REGISTRO',
+    'CHoraGerTCR': 'HORA GERACAO DO REGISTRO',
+    'CSituacaoPedido': 'SITUACAO DO PEDIDO',
+    'CPedidoBloqueado': 'PEDIDO BLOQUEADO',
+    'CUsuarioBloqPedido': 'USUARIO BLOQ PEDIDO',
+    'CDataBloqueio': 'DATA DO BLOQUEIO',
+    'CObservacaoPedido': 'OBSERVACAO DO PEDIDO',
+    'CNumeroNF': 'N° NOTA FISCAL',
+    'CInicioFaturamento': 'INICIO FATURAMENTO',
+    'CFimFaturamento': 'FIM FATURAMENTO',
+    'CCodigoProduto': 'CODIGO PRODUTO',
+    'CSituacaoPFA': 'SITUACAO PFA',
+    'CBloqPFA': 'BLOQUEIO PFA',
+    'CSituacaoFAT': 'SITUACAO FAT',
+    'CSituacaoCarga': 'SITUACAO CARGA',
+    'CSituacaoNFV': 'SITUACAO NFV',
+    'CNFVBloqueio': 'NFV BLOQUEIO',
+    'CDataGeracaoNF': 'DATA GERACAO DA NOTA FISCAL',
+    'CHoraGeracaoNF': 'HORA GERACAO DA NOTA FISCAL',
+    'CNumeroTitulo': 'N° TITULO',
+    'CVencOrigTitulo': 'VENCIMENTO ORIGINAL DO TITULO',
+    'CSituacaoTitulo': 'SITUACAO DO TITULO'
+}
+
+CAPACIDADE_INICIAL = 1024
+
+
+class AcumuladorColunar:
+    """Acumula os campos dos retornos diretamente em buffers por coluna.
+
+    As colunas do esquema conhecido (`mapeamento_nomes`) têm buffers pré-alocados;
+    tags fora do esquema ganham um buffer próprio quando aparecem pela primeira vez.
+    Posições não preenchidas permanecem None, sem necessidade de completar linha a linha.
+    """
+
+    def __init__(self, esquema=None, capacidade=CAPACIDADE_INICIAL):
+        self.esquema = mapeamento_nomes if esquema is None else esquema
+        self.capacidade = max(int(capacidade), 1)
+        self.total_linhas = 0
+        self.buffers = {
+            tag: np.full(self.capacidade, None, dtype=object) for tag in self.esquema
+        }
+        # Tags observadas na ordem da primeira ocorrência (define a ordem das colunas)
+        self.tags_vistas = []
+        self._vistas = set()
+
+    def _crescer(self):
+        nova_capacidade = self.capacidade * 2
+        for tag, buffer in self.buffers.items():
+            novo = np.full(nova_capacidade, None, dtype=object)
+            novo[:self.capacidade] = buffer
+            self.buffers[tag] = novo
+        self.capacidade = nova_capacidade
+
+    def buffer_da_tag(self, tag):
+        """Retorna o buffer da tag, registrando-a na primeira ocorrência."""
+        if tag not in self._vistas:
+            self._vistas.add(tag)
+            self.tags_vistas.append(tag)
+            if tag not in self.buffers:
+                self.buffers[tag] = np.full(self.capacidade, None, dtype=object)
+        return self.buffers[tag]
+
+    def nova_linha(self):
+        """Reserva a próxima linha e devolve o seu índice."""
+        if self.total_linhas == self.capacidade:
+            self._crescer()
+        linha = self.total_linhas
+        self.total_linhas += 1
+        return linha
+
+    def para_dataframe(self):
+        """Monta o DataFrame com as colunas observadas, já renomeadas pelo esquema."""
+        if not self.total_linhas:
+            return pd.DataFrame()
+        n = self.total_linhas
+        return pd.DataFrame({
+            self.esquema.get(tag, tag): self.buffers[tag][:n] for tag in self.tags_vistas
+        })
+
+
+def ler_timeline_xml(fonte, esquema=None):
+    """Lê os elementos retorno da resposta timeline de forma incremental e monta o DataFrame.
+
+    `fonte` pode ser um caminho, um objeto de arquivo binário ou os bytes da resposta.
+    Os elementos são descartados à medida que são lidos, então o pico de memória
+    acompanha o tamanho do DataFrame final e não da árvore XML completa.
+    As colunas do esquema já saem com os nomes de `mapeamento_nomes`.
+    """
+    if isinstance(fonte, (bytes, bytearray)):
+        fonte = io.BytesIO(fonte)
+
+    acumulador = AcumuladorColunar(esquema)
+    # Cache tag bruta do XML -> buffer, evitando o split do namespace a cada campo
+    buffers_por_tag = {}
+    pilha = []
+    elemento_result = None
+    profundidade_retorno = None
+    linha = -1
+
+    for evento, elem in ET.iterparse(fonte, events=('start', 'end')):
+        if evento == 'start':
+            if profundidade_retorno is None and elem.tag == 'retorno' and len(pilha) >= 2 \
+                    and pilha[-1] == 'result' and pilha[-2] == TAG_TIMELINE_RESPONSE:
+                profundidade_retorno = len(pilha)
+                capacidade = acumulador.capacidade
+                linha = acumulador.nova_linha()
+                if acumulador.capacidade != capacidade:
+                    # Os buffers foram realocados ao crescer
+                    buffers_por_tag.clear()
+            elif elem.tag == 'result' and pilha and pilha[-1] == TAG_TIMELINE_RESPONSE:
+                elemento_result = elem
+            pilha.append(elem.tag)
+            continue
+
+        pilha.pop()
+        if profundidade_retorno is None:
+            continue
+
+        profundidade = len(pilha)
+        if profundidade == profundidade_retorno + 1:
+            # Campo do retorno. Elementos xsi:nil="true" não têm conteúdo, então
+            # elem.text já é None e dispensa a consulta ao atributo nil.
+            buffer = buffers_por_tag.get(elem.tag)
+            if buffer is None:
+                buffer = buffers_por_tag[elem.tag] = acumulador.buffer_da_tag(elem.tag.split('}')[-1])
+            buffer[linha] = elem.text
+        elif profundidade == profundidade_retorno:
+            # Fim do retorno: liberar os elementos já processados
+            profundidade_retorno = None
+            elem.clear()
+            if elemento_result is not None:
+                elemento_result.clear()
+
+    return acumulador.para_dataframe()
+
@@ -0,0 +1,95 @@
+import numpy as np
+import pandas as pd
+
+FORMATO_COM_SEGUNDOS = '%d/%m/%Y %H:%M:%S'
+FORMATO_SEM_SEGUNDOS = '%d/%m/%Y %H:%M'
+
+# Valores que o webservice usa para indicar data/hora não preenchida
+DATAS_INVALIDAS = ['31/12/1900', '', ' ', 'nan']
+HORAS_INVALIDAS = [':', '00:00', '00:00:00', '', ' ', 'nan']
+
+
+def combinar_strings_vetorizado(datas, horas):
+    """Combina colunas de data (DD/MM/AAAA) e hora em um timestamp, de forma vetorizada.
+
+    Equivalente a aplicar `combinar_strings` linha a linha: tenta o formato com segundos,
+    depois sem segundos, e devolve NaT para valores nulos, hora ":" ou datas de 1900.
+    """
+    validos = datas.notna() & horas.notna()
+    validos &= horas.astype(str).str.strip() != ':'
+
+    resultado = pd.Series(pd.NaT, index=datas.index, dtype='datetime64[ns]')
+    if not validos.any():
+        return resultado
+
+    combinado = datas[validos].astype(str) + ' ' + horas[validos].astype(str)
+    convertido = pd.to_datetime(combinado, format=FORMATO_COM_SEGUNDOS, errors='coerce')
+
+    # Segunda passada apenas para o que não casou com o formato com segundos
+    sem_segundos = convertido.isna()
+    if sem_segundos.any():
+        convertido[sem_segundos] = pd.to_datetime(
+            combinado[sem_segundos], format=FORMATO_SEM_SEGUNDOS, errors='coerce'
+        )
+
+    resultado = convertido.reindex(datas.index).astype('datetime64[ns]')
+    # Substituir datas de 1900 por NaT
+    resultado[resultado.dt.year == 1900] = pd.NaT
+    return resultado
+
+
+def combinar_strings_memoizado(datas, horas):
+    """Versão de `combinar_strings_vetorizado` que converte cada par (data, hora) distinto uma única vez.
+
+    As colunas são fatoradas em códigos inteiros; apenas os pares distintos são convertidos
+    e o resultado é propagado de volta pelos códigos. Em cargas de várias semanas o custo
+    passa a depender da quantidade de valores distintos e não da quantidade de linhas.
+    """
+    codigos_data, datas_unicas = pd.factorize(datas)
+    codigos_hora, horas_unicas = pd.factorize(horas)
+
+    valores = np.full(len(datas), np.datetime64('NaT'), dtype='datetime64[ns]')
+    # Código -1 indica valor nulo
+    validos = (codigos_data >= 0) & (codigos_hora >= 0)
+    if validos.any():
+        total_horas = len(horas_unicas)
+        pares = codigos_data[validos].astype(np.int64) * total_horas + codigos_hora[validos]
+        codigos_par, pares_unicos = pd.factorize(pares)
+
+        datas_pares = pd.Series(np.asarray(datas_unicas, dtype=object)[pares_unicos // total_horas])
+        horas_pares = pd.Series(np.asarray(horas_unicas, dtype=object)[pares_unicos % total_horas])
+        convertidos = combinar_strings_vetorizado(datas_pares, horas_pares).to_numpy()
+
+        valores[validos] = convertidos[codigos_par]
+
+    return pd.Series(valores, index=datas.index)
+
+
+def criar_timestamps(df, timestamp_map):
+    """Cria as colunas TIMESTAMP a partir dos pares (data, hora) de `timestamp_map`.
+
+    As colunas de data e hora são normalizadas no próprio DataFrame, trocando os
+    valores sentinela do webservice por NaN.
+    """
+    for (data_col, hora_col), ts_col in timestamp_map.items():
+        if data_col in df.columns and hora_col in df.columns:
+            # Substituir valores problemáticos nas strings
+            df[data_col] = df[data_col].replace(DATAS_INVALIDAS, np.nan)
+            df[hora_col] = df[hora_col].replace(HORAS_INVALIDAS, np.nan)
+
+            df[ts_col] = combinar_strings_memoizado(df[data_col], df[hora_col])
+    return df
+
+
+def hora_desde_meia_noite(horas):
+    """Converte uma coluna datetime de horas (data base 1900-01-01) em timedelta desde a meia-noite."""
+    return horas - horas.dt.normalize()
+
+
+def combinar_data_hora_vetorizado(datas, horas):
+    """Combina uma coluna datetime de datas com um timedelta de horas, sem conversão linha a linha.
+
+    Equivalente a `combinar_data_hora`: usa apenas ano, mês e dia da data e resulta em NaT
+    quando a data ou a hora forem nulas.
+    """
+    return (datas.dt.normalize() + horas).astype('datetime64[ns]')
@@ -0,0 +1,81 @@
+import io
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Timeouts padrão em segundos: (conexão, leitura). Podem ser ajustados pelo .env
+TIMEOUT_CONEXAO_PADRAO = 10
+TIMEOUT_LEITURA_PADRAO = 120
+
+TAMANHO_MINIMO_POOL = 8
+TAMANHO_BLOCO_LEITURA = 64 * 1024
+
+_sessao = None
+_trava_sessao = threading.Lock()
+
+
+def timeout_padrao():
+    """Timeout (conexão, leitura) usado quando a chamada não informa um"""
+    return (
+        float(os.getenv('HTTP_TIMEOUT_CONEXAO', TIMEOUT_CONEXAO_PADRAO)),
+        float(os.getenv('HTTP_TIMEOUT_LEITURA', TIMEOUT_LEITURA_PADRAO)),
+    )
+
+
+def obter_sessao():
+    """Sessão HTTP compartilhada, com pool de conexões keep-alive e compressão negociada.
+
+    A mesma sessão atende os webservices Senior e WMW, evitando um novo handshake
+    TCP + TLS a cada requisição.
+    """
+    global _sessao
+    with _trava_sessao:
+        if _sessao is None:
+            tamanho_pool = max(TAMANHO_MINIMO_POOL, int(os.getenv('SENIOR_MAX_CONEXOES', 4)))
+            sessao = requests.Session()
+            adaptador = HTTPAdapter(pool_connections=tamanho_pool, pool_maxsize=tamanho_pool)
+            sessao.mount('https://', adaptador)
+            sessao.mount('http://', adaptador)
+            sessao.headers.update({
+                'Accept-Encoding': 'gzip, deflate',
+                'Connection': 'keep-alive',
+            })
+            _sessao = sessao
+        return _sessao
+
+
+def post(url, timeout=None, **kwargs):
+    """requests.post pela sessão compartilhada, com timeout padrão de conexão/leitura"""
+    return obter_sessao().post(url, timeout=timeout or timeout_padrao(), **kwargs)
+
+
+class CorpoEmFluxo(io.RawIOBase):
+    """Arquivo somente leitura sobre o corpo de uma resposta com stream=True.
+
+    Entrega os bytes já descomprimidos à medida que chegam, permitindo que o XML seja
+    processado durante o download. Se `copia` for informado, cada bloco lido também é
+    escrito nele (ex.: para gravar a resposta bruta em cache sem mantê-la inteira em memória).
+    """
+
+    def __init__(self, response, copia=None, tamanho_bloco=TAMANHO_BLOCO_LEITURA):
+        self._blocos = response.iter_content(chunk_size=tamanho_bloco)
+        self._copia = copia
+        self._pendente = memoryview(b'')
+
+    def readable(self):
+        return True
+
+    def readinto(self, destino):
+        while not self._pendente:
+            bloco = next(self._blocos, None)
+            if bloco is None:
+                return 0
+            if self._copia is not None:
+                self._copia.write(bloco)
+            self._pendente = memoryview(bloco)
+        n = min(len(destino), len(self._pendente))
+        destino[:n] = self._pendente[:n]
+        self._pendente = self._pendente[n:]
+        return n